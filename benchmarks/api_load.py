@@ -0,0 +1,196 @@
+"""Load test of the JSON API (wish_api.py) against the Streamlit page.
+
+Starts the API in a child process on a seeded SQLite store, then drives it
+from N concurrent keep-alive connections for a fixed time per scenario:
+
+  get            GET /wish/{id} on random wishes
+  get_304        the same with If-None-Match, as a polling client sends it
+  support        POST /wish/{id}/support with a fresh supporter each time
+  get_no_reuse   GET with a new connection per request (no keep-alive)
+  streamlit      one scripted run of the shared-wish page per request, via
+                 AppTest (needs streamlit; skips the browser and websocket,
+                 so it flatters the Streamlit path)
+
+    python benchmarks/api_load.py --wishes 10000 --connections 32 --seconds 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import ROOT, seed_store, summarize, wish_ids_for  # noqa: E402
+
+SCENARIOS = ('get', 'get_304', 'support', 'get_no_reuse', 'streamlit')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path, port):
+    # All load comes from one client: rate limits off, this measures the server (see benchmarks/flood.py)
+    env = dict(os.environ, WISH_STORE_PATH=db_path, WISH_STORE_BACKEND='sqlite',
+               WISH_RATE_CLIENT='0', WISH_RATE_WISH='0', WISH_RATE_TOTAL='0')
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'wish_api.py'), '--port', str(port)],
+        env=env, cwd=os.path.dirname(db_path), stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("wish api did not start")
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head[9:12])
+    length = 0
+    etag = None
+    for line in head.decode('latin-1').split('\r\n')[1:]:
+        name, _, value = line.partition(':')
+        name = name.lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'etag':
+            etag = value.strip()
+    body = await reader.readexactly(length) if length else b''
+    return status, etag, body
+
+
+def _request(method, path, headers=(), body=b''):
+    lines = [f"{method} {path} HTTP/1.1", "Host: bench"]
+    lines.extend(headers)
+    if body:
+        lines.extend(["Content-Type: application/json", f"Content-Length: {len(body)}"])
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+async def _worker(scenario, port, wish_ids, until, rng, worker_id, samples, statuses):
+    etags = {}
+    reader = writer = None
+    count = 0
+    while time.perf_counter() < until:
+        if writer is None:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        wish_id = rng.choice(wish_ids)
+        if scenario == 'support':
+            count += 1
+            body = json.dumps({'supporter_id': f"load_{worker_id}_{count}"}).encode()
+            data = _request('POST', f"/wish/{wish_id}/support", body=body)
+        elif scenario == 'get_304' and wish_id in etags:
+            data = _request('GET', f"/wish/{wish_id}", [f"If-None-Match: {etags[wish_id]}"])
+        else:
+            data = _request('GET', f"/wish/{wish_id}")
+        t0 = time.perf_counter()
+        writer.write(data)
+        await writer.drain()
+        status, etag, _ = await _read_response(reader)
+        samples.append(time.perf_counter() - t0)
+        statuses[status] = statuses.get(status, 0) + 1
+        if etag:
+            etags[wish_id] = etag
+        if scenario == 'get_no_reuse':
+            writer.close()
+            await writer.wait_closed()
+            writer = None
+    if writer is not None:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_http(scenario, port, wish_ids, connections, seconds):
+    samples = []
+    statuses = {}
+    if scenario == 'get_304':
+        # Polling clients already hold an ETag for the wishes they watch
+        wish_ids = wish_ids[:connections * 4]
+        warm_until = time.perf_counter() + min(1.0, seconds)
+        await asyncio.gather(*(
+            _worker('get', port, wish_ids, warm_until, random.Random(i), i, [], {}) for i in range(connections)
+        ))
+    until = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(scenario, port, wish_ids, until, random.Random(i), i, samples, statuses)
+        for i in range(connections)
+    ))
+    result = summarize(samples, time.perf_counter() - started)
+    result['statuses'] = {str(k): v for k, v in sorted(statuses.items())}
+    return result
+
+
+def run_streamlit(db_path, wish_ids, seconds):
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+    os.environ['WISH_STORE_PATH'] = db_path
+    rng = random.Random(0)
+    samples = []
+    until = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < until:
+        at = AppTest.from_file(os.path.join(ROOT, 'wish_evaluator.py'), default_timeout=120)
+        at.query_params['wish_id'] = rng.choice(wish_ids)
+        t0 = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wishes', type=int, default=10_000)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5.0, help="duration of each scenario")
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'wishes.db')
+        seed_store('sqlite', db_path, args.wishes).close()
+        wish_ids = wish_ids_for(args.wishes)
+        port = free_port()
+        server = start_server(db_path, port)
+        try:
+            for scenario in args.scenarios:
+                if scenario == 'streamlit':
+                    result = run_streamlit(db_path, wish_ids, args.seconds)
+                else:
+                    result = asyncio.run(run_http(scenario, port, wish_ids, args.connections, args.seconds))
+                results[scenario] = result
+                if result is None:
+                    print(f"{scenario:<14} skipped (streamlit not installed)")
+                    continue
+                print(f"{scenario:<14} {result['ops_per_sec']:>10,.0f} req/s  "
+                      f"p50 {result['p50_us'] / 1000:8.2f} ms  p99 {result['p99_us'] / 1000:8.2f} ms  "
+                      f"{result.get('statuses', '')}")
+        finally:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
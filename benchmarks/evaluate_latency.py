@@ -0,0 +1,94 @@
+"""End-to-end latency of the "Evaluate My Wish" flow.
+
+Renders the create page with streamlit's AppTest, types a wish, clicks the
+evaluate button and times the script run that handles the click. Point
+--app at an older copy of the page to compare before/after:
+
+    git show <rev>:wish_evaluator.py > /tmp/wish_evaluator_before.py
+    python benchmarks/evaluate_latency.py --app /tmp/wish_evaluator_before.py
+    python benchmarks/evaluate_latency.py
+
+Without streamlit only the headless stages (scoring, persistence) are timed.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WISH = "I wish to travel the world and learn to master the guitar in 2026"
+
+
+def time_app(app, repeat):
+    from streamlit.testing.v1 import AppTest
+
+    samples = []
+    for _ in range(repeat):
+        at = AppTest.from_file(app, default_timeout=60)
+        at.run()
+        at.text_area(key="wish_input").input(WISH)
+        at.button(key="evaluate_wish").click()
+        started = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - started)
+        if at.exception:
+            raise SystemExit(str(at.exception))
+    return samples
+
+
+def time_stages(repeat):
+    from wish_model import evaluate_wish
+    from wish_store import open_store
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = open_store('sqlite', os.path.join(tmp, 'wishes.db'))
+        scoring, persistence = [], []
+        for i in range(repeat):
+            started = time.perf_counter()
+            label, score = evaluate_wish(WISH)
+            scored = time.perf_counter()
+            store.create_or_update(f"bench_{i}", WISH, 60.0 + score * 20)
+            persistence.append(time.perf_counter() - scored)
+            scoring.append(scored - started)
+    return scoring, persistence
+
+
+def _report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{name:12s} median {statistics.median(samples) * 1000:9.2f} ms   p95 {p95 * 1000:9.2f} ms   n={len(samples)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the evaluate-wish flow.")
+    parser.add_argument('--app', default=os.path.join(ROOT, 'wish_evaluator.py'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    scoring, persistence = time_stages(max(args.repeat, 100))
+    _report('scoring', scoring)
+    _report('persistence', persistence)
+
+    try:
+        import streamlit  # noqa: F401
+    except ImportError:
+        print("end-to-end  skipped: streamlit is not installed")
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['WISH_STORE_PATH'] = os.path.join(tmp, 'wishes.db')
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            _report('end-to-end', time_app(os.path.abspath(os.path.join(cwd, args.app)), args.repeat))
+        finally:
+            os.chdir(cwd)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Support floods against the rate limits: storage writes must stay flat.
+
+Floods wish_core.update_wish_probability from more and more threads while a
+few legitimate clients click now and then, and counts the supports that got
+past wish_ratelimit to storage:
+
+  bot        one client opening new sessions (a fresh supporter ID per click), one wish
+  swarm      a new client per click, all on one wish
+  botnet     a new client per click, on random wishes
+  unlimited  the botnet with no limits, for comparison
+
+Storage writes per second must not grow with the flood: bot and swarm stay
+within burst + rate * seconds of the limit that binds them, and every
+legitimate click is still accepted in every limited run. Also checks that
+the limiter's key count stays at WISH_RATE_MAX_KEYS however many clients
+came.
+
+The botnet is only capped by the total limit, which is off by default
+because it refuses legitimate clicks along with the flood. With
+--total-rate the botnet run is checked against it instead, and the
+legitimate clicks it refused are reported rather than failed.
+
+    python benchmarks/flood.py --threads 1 4 16 --seconds 2
+    python benchmarks/flood.py --scenarios botnet --total-rate 500/1
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import seed_store, wish_ids_for  # noqa: E402
+from wish_ratelimit import MAX_KEYS, RATE_CLIENT, RATE_TOTAL, RATE_WISH, SupportLimiter, parse_rate  # noqa: E402
+
+SCENARIOS = ('bot', 'swarm', 'botnet', 'unlimited')
+# scenario -> the limit that caps it
+BINDING = {'bot': 'client', 'swarm': 'wish', 'botnet': 'total'}
+LEGIT_CLIENTS = 20
+LEGIT_CLICKS = 3
+
+
+def run(wish_core, scenario, threads, seconds, wish_ids):
+    """Flood for `seconds`; returns offered and stored click counts for bots and legit clients."""
+    target = wish_ids[0]
+    others = wish_ids[1:]
+    clients = itertools.count()
+    counts = {'offered': 0, 'stored': 0, 'legit': 0, 'legit_stored': 0}
+    lock = threading.Lock()
+    until = time.perf_counter() + seconds
+
+    def bot(worker):
+        rng = random.Random(worker)
+        offered = stored = 0
+        while time.perf_counter() < until:
+            n = next(clients)
+            if scenario == 'bot':
+                wish_id, client = target, 'bot'
+            elif scenario == 'swarm':
+                wish_id, client = target, f"swarm{n}"
+            else:
+                wish_id, client = rng.choice(wish_ids), f"botnet{n}"
+            offered += 1
+            try:
+                wish_core.update_wish_probability(wish_id, 1.0, f"supporter_{n}_{worker}",
+                                                  client=None if scenario == 'unlimited' else client)
+                stored += 1
+            except wish_core.RateLimited:
+                pass
+        with lock:
+            counts['offered'] += offered
+            counts['stored'] += stored
+
+    def legit():
+        rng = random.Random('legit')
+        clicks = [(c, rng.choice(others)) for c in range(LEGIT_CLIENTS) for _ in range(LEGIT_CLICKS)]
+        for client, wish_id in clicks:
+            time.sleep(seconds / (len(clicks) + 1))
+            try:
+                wish_core.update_wish_probability(wish_id, 1.0, f"legit_{client}_{wish_id}", client=f"legit{client}")
+                counts['legit_stored'] += 1
+            except wish_core.RateLimited:
+                pass
+            counts['legit'] += 1
+
+    wish_core.get_support_limiter().clear()
+    pool = [threading.Thread(target=bot, args=(w,)) for w in range(threads)] + [threading.Thread(target=legit)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    counts['elapsed'] = time.perf_counter() - started
+    counts['limiter'] = wish_core.get_support_limiter().stats()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16], help="flood thread counts")
+    parser.add_argument('--seconds', type=float, default=2.0, help="duration of each run")
+    parser.add_argument('--wishes', type=int, default=1000)
+    parser.add_argument('--client-rate', default=RATE_CLIENT)
+    parser.add_argument('--wish-rate', default=RATE_WISH)
+    parser.add_argument('--total-rate', default=RATE_TOTAL)
+    parser.add_argument('--max-keys', type=int, default=min(MAX_KEYS, 10_000))
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS)
+    args = parser.parse_args(argv)
+
+    rates = {'client': args.client_rate, 'wish': args.wish_rate, 'total': args.total_rate}
+    problems = []
+    notes = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'wishes.db')
+        wish_ids = wish_ids_for(args.wishes)
+        seed_store('sqlite', db_path, args.wishes).close()
+
+        # wish_core opens the process store from the environment on first use
+        os.environ.update(WISH_STORE_PATH=db_path, WISH_STORE_BACKEND='sqlite', WISH_WRITE_BEHIND='0',
+                          WISH_TTL_DAYS='0')
+        import wish_core
+        wish_core._support_limiter = SupportLimiter(args.client_rate, args.wish_rate, args.total_rate, args.max_keys)
+
+        print(f"limits: client {args.client_rate}, wish {args.wish_rate}, total {args.total_rate} "
+              f"(COUNT/SECONDS); {args.seconds:g}s per run")
+        peak_keys = {}
+        print(f"{'scenario':<10} {'threads':>7} {'offered/s':>12} {'stored/s':>10} {'bound/s':>9}  legit accepted")
+        for scenario in args.scenarios:
+            for threads in args.threads:
+                counts = run(wish_core, scenario, threads, args.seconds, wish_ids)
+                for scope, scope_stats in counts['limiter'].items():
+                    peak_keys[scope] = max(peak_keys.get(scope, 0), scope_stats['keys'])
+                elapsed = counts['elapsed']
+                stored = counts['stored']
+                bound = None
+                limit = parse_rate(rates[BINDING[scenario]]) if scenario in BINDING else None
+                if limit is not None:
+                    rate, burst = limit
+                    bound = burst + rate * elapsed
+                    # The total limit also admits the legitimate clicks
+                    if scenario == 'botnet':
+                        stored += counts['legit_stored']
+                    if stored > bound + 1:
+                        problems.append(f"{scenario} x{threads}: {stored} supports reached storage, "
+                                        f"limit allows {bound:.0f}")
+                refused = counts['legit'] - counts['legit_stored']
+                if refused and scenario == 'botnet' and limit is not None:
+                    notes.append(f"botnet x{threads}: the total limit refused {refused} legitimate clicks too")
+                elif refused and scenario != 'unlimited':
+                    problems.append(f"{scenario} x{threads}: {refused} legitimate clicks were refused")
+                print(f"{scenario:<10} {threads:>7} {counts['offered'] / elapsed:>12,.0f} {stored / elapsed:>10,.1f} "
+                      f"{bound / elapsed if bound else float('inf'):>9,.1f}  "
+                      f"{counts['legit_stored']}/{counts['legit']}")
+
+        print("limiter keys after a run, at most: " + ", ".join(f"{s} {n:,}" for s, n in peak_keys.items()))
+        for scope, keys in peak_keys.items():
+            if keys > args.max_keys:
+                problems.append(f"{scope} limiter held {keys:,} keys, above {args.max_keys:,}")
+
+    for note in notes:
+        print(f"note: {note}")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    print("OK" if not problems else f"FAIL: {len(problems)} problems")
+    return 0 if not problems else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
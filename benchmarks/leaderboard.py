@@ -0,0 +1,194 @@
+"""Top-K wishes: full load-and-sort vs. the store index vs. the Leaderboard.
+
+  json full sort     load_wishes + sort every record, what a page had to do before
+  sqlite full sort   read every row + sort in Python
+  store.top_wishes   one SQLite scan with a bounded sorter (the seed)
+  leaderboard.top    the in-memory bounded list kept current by wish_core
+
+Then hammers wish_core.update_wish_probability from several threads while
+another thread reads the leaderboard, and checks the board still matches a
+fresh store.top_wishes, times the refresh that merges another process's
+writes, and compares supports with and without the leaderboard upkeep.
+
+    python benchmarks/leaderboard.py --wishes 100000 --k 10 --threads 4
+"""
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import SEED, measure, seed_store, wish_ids_for  # noqa: E402
+from wish_store import LEADERBOARD_METRICS, load_wishes, open_store, save_wishes  # noqa: E402
+
+
+def randomize(path, wish_ids, rng):
+    """Give the seeded wishes spread-out supporter counts and probabilities."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN")
+    conn.executemany(
+        "UPDATE wishes SET supporters_count = ?, current_probability = ? WHERE wish_id = ?",
+        ((rng.randint(0, 50), round(rng.uniform(60.0, 99.9), 1), wish_id) for wish_id in wish_ids)
+    )
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def to_json(store, wish_ids, path):
+    """Same wishes in the JSON file format (supporter lists sized to the counts)."""
+    wishes_data = {}
+    for wish_id in wish_ids:
+        record = store.get(wish_id)
+        count = record.pop('supporters_count')
+        record['supporters'] = [f"{i:016x}" for i in range(count)]
+        wishes_data[wish_id] = record
+    save_wishes(wishes_data, path)
+
+
+def full_sort_json(path, metric, k):
+    wishes = load_wishes(path)
+    if metric == 'supporters':
+        ranked = sorted(wishes.items(), key=lambda item: (-len(item[1]['supporters']), item[0]))
+    else:
+        ranked = sorted(wishes.items(), key=lambda item: (-item[1]['current_probability'], item[0]))
+    return ranked[:k]
+
+
+def full_sort_sqlite(store, metric, k):
+    field = LEADERBOARD_METRICS[metric]
+    rows = store._conn().execute(
+        f"SELECT wish_id, {field} FROM wishes"
+    ).fetchall()
+    return sorted(rows, key=lambda row: (-row[1], row[0]))[:k]
+
+
+def report(name, result):
+    print(f"{name:<28} p50 {result['p50_us']:12.1f} us  p99 {result['p99_us']:12.1f} us  "
+          f"{result['ops_per_sec']:>12,.1f} queries/s")
+
+
+_supporters = itertools.count()
+
+
+def support_rate(support, wish_ids, ops, repeat):
+    """Best supports/s through support(wish_id, increment, supporter_id), each by a new supporter."""
+    rng = random.Random(SEED)
+    targets = [rng.choice(wish_ids) for _ in range(ops)]
+    result = measure(support, lambda run: [(w, 1.0, f"rate_{next(_supporters)}") for w in targets], repeat)
+    return result['ops_per_sec']
+
+
+def matches_store(board, store):
+    """True if every board list equals a fresh store.top_wishes of the same size."""
+    for metric, field in LEADERBOARD_METRICS.items():
+        expected = [(w, r[field]) for w, r in store.top_wishes(metric, board.size)]
+        actual = [(e['wish_id'], e[field]) for e in board.top(metric, board.size)]
+        if expected != actual:
+            return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wishes', type=int, default=100_000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--supports', type=int, default=2000, help="supports per thread in the concurrency check")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(SEED)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'wishes.db')
+        json_path = os.path.join(tmp, 'wishes.json')
+        wish_ids = wish_ids_for(args.wishes)
+        store = seed_store('sqlite', db_path, args.wishes)
+        randomize(db_path, wish_ids, rng)
+        to_json(store, wish_ids, json_path)
+
+        # wish_core opens the process store from the environment on first use
+        os.environ.update(WISH_STORE_PATH=db_path, WISH_STORE_BACKEND='sqlite', WISH_WRITE_BEHIND='0', WISH_TTL_DAYS='0')
+        import wish_core
+
+        print(f"wishes={args.wishes:,} k={args.k}")
+        for metric in LEADERBOARD_METRICS:
+            once = [(metric, args.k)]
+            report(f"json full sort/{metric}",
+                   measure(lambda m, k: full_sort_json(json_path, m, k), lambda run: once, min(args.repeat, 3)))
+            report(f"sqlite full sort/{metric}",
+                   measure(lambda m, k: full_sort_sqlite(store, m, k), lambda run: once, args.repeat))
+            report(f"store.top_wishes/{metric}", measure(store.top_wishes, lambda run: once * 10, args.repeat))
+            wish_core.top_wishes(metric, args.k)
+            report(f"leaderboard.top/{metric}", measure(wish_core.top_wishes, lambda run: once * 1000, args.repeat))
+
+        # Concurrent supports through wish_core while the board is being read; no reseeds,
+        # so the final check sees only what the incremental updates produced
+        wish_core.get_leaderboard().refresh = 0
+        stop = threading.Event()
+        reads = [0]
+
+        def reader():
+            while not stop.is_set():
+                wish_core.top_wishes('supporters', args.k)
+                reads[0] += 1
+
+        def writer(worker):
+            worker_rng = random.Random(worker)
+            # Aim at a small hot set so the top of the board keeps changing
+            hot = wish_ids[:max(args.k * 5, 50)]
+            for i in range(args.supports):
+                wish_id = worker_rng.choice(hot) if i % 2 else worker_rng.choice(wish_ids)
+                wish_core.update_wish_probability(wish_id, worker_rng.uniform(1.0, 10.0), f"load_{worker}_{i}")
+
+        reader_thread = threading.Thread(target=reader)
+        reader_thread.start()
+        started = time.perf_counter()
+        writers = [threading.Thread(target=writer, args=(w,)) for w in range(args.threads)]
+        for thread in writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        reader_thread.join()
+
+        board = wish_core.get_leaderboard()
+        consistent = matches_store(board, store)
+        print(f"concurrent: {args.threads * args.supports:,} supports in {elapsed:.2f}s "
+              f"({args.threads * args.supports / elapsed:,.0f}/s) with {reads[0]:,} leaderboard reads; "
+              f"board matches store: {consistent}")
+
+        # Another process's writes reach the board through the next refresh
+        other = open_store('sqlite', db_path, write_behind=False, archive_ttl_days=0)
+        for i, wish_id in enumerate(wish_ids[-args.k:]):
+            for j in range(100):
+                other.add_support(wish_id, 1.0, f"other_{i}_{j}")
+        other.close()
+        started = time.perf_counter()
+        board.seed()
+        refresh = time.perf_counter() - started
+        refreshed = matches_store(board, store)
+        consistent = consistent and refreshed
+        print(f"refresh after another process's writes: {refresh * 1000:.1f} ms; board matches store: {refreshed}")
+
+        ops = min(2000, args.wishes)
+        rates = {'store': 0.0, 'core': 0.0}
+        # Alternate the two so cache warm-up does not favour either
+        for _ in range(2):
+            rates['store'] = max(rates['store'], support_rate(store.add_support, wish_ids, ops, args.repeat))
+            rates['core'] = max(rates['core'], support_rate(wish_core.update_wish_probability, wish_ids, ops,
+                                                            args.repeat))
+        print(f"supports: {rates['store']:,.0f}/s via store.add_support, {rates['core']:,.0f}/s via "
+              f"wish_core with the leaderboard kept current ({1 - rates['core'] / rates['store']:+.0%})")
+        store.close()
+    return 0 if consistent else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
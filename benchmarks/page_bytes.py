@@ -0,0 +1,118 @@
+"""Bytes the Streamlit page sends per render, before and after the static theme.
+
+Renders each page with streamlit.testing's AppTest and adds up what one
+rerun ships to the browser:
+
+  html     the markdown/HTML bodies (where the inline CSS used to be)
+  element  all element protos, i.e. the whole delta of a full rerun
+
+for three versions of the page:
+
+  before   wish_evaluator.py as it was before the theme moved to static/
+  inline   the current page with WISH_INLINE_THEME (no static serving)
+  static   the current page linking static/theme.css?v=<hash>
+
+and for the create, results and shared pages. The theme files themselves
+are downloaded once per version and then come from the browser cache.
+
+    python benchmarks/page_bytes.py
+    python benchmarks/page_bytes.py --baseline <git rev>
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import ROOT, seed_store, wish_ids_for  # noqa: E402
+
+PAGES = ('create', 'results', 'shared')
+WISH_TEXT = "I wish for a white Christmas"
+
+
+def baseline_revision():
+    """Parent of the commit that added wish_theme.py, or HEAD before it is committed."""
+    added = subprocess.run(
+        ['git', 'log', '--format=%H', '--diff-filter=A', '--', 'wish_theme.py'],
+        cwd=ROOT, capture_output=True, text=True
+    ).stdout.split()
+    return f"{added[-1]}^" if added else 'HEAD'
+
+
+def _leaves(node):
+    for child in getattr(node, 'children', {}).values():
+        if hasattr(child, 'children'):
+            yield from _leaves(child)
+        else:
+            yield child
+
+
+def render(script, page, wish_id, static_serving):
+    """(html bytes, element bytes) of one full run of the page."""
+    from streamlit import config
+    from streamlit.testing.v1 import AppTest
+
+    config.set_option('server.enableStaticServing', static_serving)
+    at = AppTest.from_file(script, default_timeout=120)
+    if page == 'results':
+        at.session_state['show_wish_results'] = True
+        at.session_state['wish_id'] = wish_id
+        at.session_state['my_wish_text'] = WISH_TEXT
+    elif page == 'shared':
+        at.query_params['wish_id'] = wish_id
+        at.query_params['wish'] = WISH_TEXT
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{page} page failed: {at.exception[0].message}")
+    html = sum(len(markdown.value.encode()) for markdown in at.markdown)
+    element = sum(len(leaf.proto.SerializeToString()) for leaf in _leaves(at._tree) if leaf.proto is not None)
+    return html, element
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--baseline', default=None, help="git revision of the 'before' page")
+    args = parser.parse_args(argv)
+
+    try:
+        import streamlit  # noqa: F401
+    except ImportError:
+        print("streamlit is not installed")
+        return 1
+
+    baseline = args.baseline or baseline_revision()
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_store('sqlite', os.path.join(tmp, 'wishes.db'), 1).close()
+        os.environ.update(WISH_STORE_PATH=os.path.join(tmp, 'wishes.db'), WISH_STORE_BACKEND='sqlite')
+        wish_id = wish_ids_for(1)[0]
+
+        before = os.path.join(tmp, 'wish_evaluator_before.py')
+        with open(before, 'w') as f:
+            f.write(subprocess.run(['git', 'show', f"{baseline}:wish_evaluator.py"], cwd=ROOT,
+                                   capture_output=True, text=True, check=True).stdout)
+        current = os.path.join(ROOT, 'wish_evaluator.py')
+        variants = (('before', before, False), ('inline', current, False), ('static', current, True))
+
+        import wish_theme
+
+        results = {}
+        for name, script, static_serving in variants:
+            wish_theme.INLINE_THEME = not static_serving
+            for page in PAGES:
+                results[name, page] = render(script, page, wish_id, static_serving)
+
+    print(f"bytes per full render (before = {baseline})")
+    print(f"{'page':<8} {'variant':<7} {'html':>8} {'element':>9}  vs before")
+    for page in PAGES:
+        for name, _, _ in variants:
+            html, element = results[name, page]
+            print(f"{page:<8} {name:<7} {html:>8,} {element:>9,}  {element / results['before', page][1] - 1:+.0%}")
+    assets = {name: os.path.getsize(os.path.join(wish_theme.STATIC_DIR, name)) for name in wish_theme.THEME_FILES}
+    print("static assets, fetched once per version: " + ", ".join(f"{n} {b:,} B" for n, b in assets.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""Several app replicas on one store: do their caches converge, and how fast?
+
+Starts a wish_pubsub hub and REPLICAS worker processes that share one SQLite
+store through WISH_DATA_DIR. Each worker is a separate interpreter using
+wish_core exactly as the Streamlit page and the API do:
+
+  load         threads support random wishes and read them back through the
+               cache; every replica also races for the same "shared"
+               supporter IDs, of which exactly one click each must win
+  propagation  one replica at a time supports a wish while the others poll
+               get_wish_data until they see it; p50/p99 time to visibility,
+               and every probe must be seen within CONVERGE_TIMEOUT
+  converge     every replica's cached view must equal the store, and each
+               wish's supporters, luck and probability must add up to what
+               the replicas were told was accepted
+
+    python benchmarks/replicas.py --replicas 4 --threads 4 --supports 250
+    python benchmarks/replicas.py --no-pubsub      # caches check data_version instead
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import ROOT, seed_store, summarize, wish_ids_for  # noqa: E402
+from wish_store import MAX_PROBABILITY  # noqa: E402
+
+INITIAL_PROBABILITY = 70.0
+CONVERGE_TIMEOUT = 5.0
+# Wall clocks of different processes (CPUs) may disagree by this much
+CLOCK_SKEW = 0.001
+
+
+def start_hub(address, sock_path):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'wish_pubsub.py'), 'hub', '--address', address],
+        stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if os.path.exists(sock_path):
+            return proc
+        time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("pub/sub hub did not start")
+
+
+def _replica(replica, config, barrier, sent_at, results):
+    # A fresh interpreter (spawn): the wish modules read WISH_* from the inherited environment
+    import threading
+
+    import wish_core
+    from wish_pubsub import get_notifier
+    from wish_store import get_store
+
+    wish_ids = wish_ids_for(config['wishes'])
+    notifier = get_notifier()
+    if notifier is not None and not notifier.wait_connected(10):
+        raise RuntimeError(f"replica {replica} could not reach the hub")
+    for wish_id in wish_ids:
+        wish_core.get_wish_data(wish_id)
+
+    accepted = {}
+    shared_won = []
+    lock = threading.Lock()
+
+    def support(wish_id, increment, supporter_id):
+        success, _ = wish_core.update_wish_probability(wish_id, increment, supporter_id)
+        if success:
+            with lock:
+                count, luck = accepted.get(wish_id, (0, 0.0))
+                accepted[wish_id] = (count + 1, luck + increment)
+        return success
+
+    def load(thread_no):
+        rng = random.Random(f"{replica}-{thread_no}")
+        for i in range(config['supports']):
+            support(rng.choice(wish_ids), round(rng.uniform(0.1, 1.0), 1), f"r{replica}_{thread_no}_{i}")
+            wish_core.get_wish_data(rng.choice(wish_ids))
+            if i % 10 == 0:
+                shared = thread_no * config['supports'] + i
+                if support(wish_ids[shared % len(wish_ids)], 0.5, f"shared_{shared}"):
+                    with lock:
+                        shared_won.append(shared)
+
+    barrier.wait()
+    threads = [threading.Thread(target=load, args=(t,)) for t in range(config['threads'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store = get_store()
+    if hasattr(store, 'flush'):
+        store.flush()
+
+    # Propagation: replica (round % replicas) writes, everyone else waits to see it.
+    # The writer stores its send time in sent_at[round_no]; readers only look
+    # at it after the closing barrier, once it is certainly set.
+    latencies = []
+    for round_no in range(config['rounds']):
+        wish_id = wish_ids[round_no % len(wish_ids)]
+        before = store.get(wish_id)['supporters_count']
+        barrier.wait()
+        if round_no % config['replicas'] == replica:
+            sent_at[round_no] = time.time()
+            support(wish_id, 0.1, f"probe_{round_no}")
+            if hasattr(store, 'flush'):
+                store.flush()
+            barrier.wait()
+            continue
+        deadline = time.time() + CONVERGE_TIMEOUT
+        seen = None
+        while seen is None and time.time() < deadline:
+            if wish_core.get_wish_data(wish_id)['supporters_count'] > before:
+                seen = time.time()
+            else:
+                time.sleep(0.0002)
+        barrier.wait()
+        if seen is None:
+            latencies.append(None)
+            continue
+        latency = seen - sent_at[round_no]
+        latencies.append(max(0.0, latency) if latency > -CLOCK_SKEW else latency)
+
+    # Converge: the cached view must settle on what the store holds
+    started = time.perf_counter()
+    while True:
+        view = {wish_id: wish_core.get_wish_data(wish_id) for wish_id in wish_ids}
+        stale = [w for w in wish_ids if view[w] != store.get(w)]
+        if not stale or time.perf_counter() - started > CONVERGE_TIMEOUT:
+            break
+        time.sleep(0.01)
+    results.put({
+        'replica': replica,
+        'accepted': accepted,
+        'shared_won': shared_won,
+        'latencies': latencies,
+        'stale': len(stale),
+        'converge_s': time.perf_counter() - started,
+        'view': {w: (r['supporters_count'], r['total_luck_added'], r['current_probability']) for w, r in view.items()},
+        'cache': wish_core.get_wish_cache().stats(),
+    })
+    store.close()
+
+
+def check(results, store, wish_ids, shared_total, write_behind):
+    """List of problems in the replicas' final state; empty when everything adds up.
+
+    With write-behind each replica dedupes against its own buffer and the
+    store, so a shared supporter can be accepted by several replicas; the
+    store keeps the first flushed click and the others are subtracted here.
+    """
+    problems = []
+    totals = {}
+    for result in results:
+        for wish_id, (count, luck) in result['accepted'].items():
+            total_count, total_luck = totals.get(wish_id, (0, 0.0))
+            totals[wish_id] = (total_count + count, total_luck + luck)
+        if result['stale']:
+            problems.append(f"replica {result['replica']}: {result['stale']} cached wishes never caught up")
+        missed = [latency for latency in result['latencies'] if latency is None]
+        if missed:
+            problems.append(f"replica {result['replica']}: {len(missed)} probes not seen within {CONVERGE_TIMEOUT:g}s")
+        odd = [latency for latency in result['latencies']
+               if latency is not None and not 0 <= latency <= CONVERGE_TIMEOUT + CLOCK_SKEW]
+        if odd:
+            problems.append(f"replica {result['replica']}: {len(odd)} probe latencies out of range, e.g. {odd[0]:.3f}s")
+
+    won = [shared for result in results for shared in result['shared_won']]
+    if len(set(won)) != len(won):
+        if not write_behind:
+            problems.append(f"{len(won) - len(set(won))} shared supporters were accepted by more than one replica")
+        seen = set()
+        for shared in won:
+            if shared in seen:
+                wish_id = wish_ids[shared % len(wish_ids)]
+                count, luck = totals[wish_id]
+                totals[wish_id] = (count - 1, luck - 0.5)
+            seen.add(shared)
+    if len(set(won)) != shared_total:
+        problems.append(f"{shared_total - len(set(won))} shared supporters were accepted by no replica")
+
+    for wish_id in wish_ids:
+        record = store.get(wish_id)
+        count, luck = totals.get(wish_id, (0, 0.0))
+        expected = (count, luck, min(MAX_PROBABILITY, INITIAL_PROBABILITY + luck))
+        actual = (record['supporters_count'], record['total_luck_added'], record['current_probability'])
+        if actual[0] != expected[0] or any(abs(a - e) > 1e-6 for a, e in zip(actual[1:], expected[1:])):
+            problems.append(f"{wish_id}: store has {actual}, replicas accepted {expected}")
+        for result in results:
+            if result['view'][wish_id] != actual:
+                problems.append(f"{wish_id}: replica {result['replica']} sees {result['view'][wish_id]}, "
+                                f"store has {actual}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help="support threads per replica")
+    parser.add_argument('--supports', type=int, default=250, help="supports per thread")
+    parser.add_argument('--wishes', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=200, help="propagation probes")
+    parser.add_argument('--write-behind', action='store_true', help="buffer supports in each replica")
+    parser.add_argument('--no-pubsub', action='store_true', help="no hub; caches check data_version")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        wish_ids = wish_ids_for(args.wishes)
+        store = seed_store('sqlite', os.path.join(tmp, 'wishes_data.db'), args.wishes)
+        sock_path = os.path.join(tmp, 'pubsub.sock')
+        address = f"unix:{sock_path}"
+        hub = None if args.no_pubsub else start_hub(address, sock_path)
+
+        # Inherited by the spawned replicas; this process already has its store open
+        os.environ.update(
+            WISH_DATA_DIR=tmp, WISH_STORE_BACKEND='sqlite', WISH_PUBSUB='' if args.no_pubsub else address,
+            WISH_WRITE_BEHIND='1' if args.write_behind else '0', WISH_TTL_DAYS='0', WISH_LEADERBOARD_REFRESH='0'
+        )
+        os.environ.pop('WISH_STORE_PATH', None)
+        ctx = multiprocessing.get_context('spawn')
+        barrier = ctx.Barrier(args.replicas)
+        sent_at = ctx.Array('d', args.rounds, lock=False)
+        results_queue = ctx.Queue()
+        config = {'wishes': args.wishes, 'threads': args.threads, 'supports': args.supports,
+                  'rounds': args.rounds, 'replicas': args.replicas}
+        started = time.perf_counter()
+        procs = [ctx.Process(target=_replica, args=(r, config, barrier, sent_at, results_queue))
+                 for r in range(args.replicas)]
+        try:
+            for proc in procs:
+                proc.start()
+            results = [results_queue.get(timeout=600) for _ in procs]
+            for proc in procs:
+                proc.join()
+        finally:
+            for proc in procs:
+                if proc.is_alive():
+                    proc.kill()
+            if hub is not None:
+                hub.terminate()
+                hub.wait()
+        elapsed = time.perf_counter() - started
+        failed = [proc.exitcode for proc in procs if proc.exitcode != 0]
+
+        shared_total = len(range(0, args.supports, 10)) * args.threads
+        problems = check(results, store, wish_ids, shared_total, args.write_behind)
+        if failed:
+            problems.append(f"replica exit codes {failed}")
+        store.close()
+
+    mode = 'version checks' if args.no_pubsub else 'pub/sub'
+    if args.write_behind:
+        mode += ' + write-behind'
+    supports = args.replicas * args.threads * args.supports
+    print(f"{args.replicas} replicas, {mode}: {supports:,} supports + reads on {args.wishes} wishes "
+          f"in {elapsed:.2f}s")
+    latencies = [latency for result in results for latency in result['latencies'] if latency is not None]
+    if latencies:
+        lat = summarize(latencies, 1.0)
+        print(f"propagation to other replicas: p50 {lat['p50_us'] / 1000:.2f} ms  p99 {lat['p99_us'] / 1000:.2f} ms "
+              f"({len(latencies)} probes)")
+    for result in sorted(results, key=lambda r: r['replica']):
+        cache = result['cache']
+        print(f"replica {result['replica']}: cache hit rate {cache['hit_rate']:.1%} "
+              f"({cache['hits']:,} hits, {cache['misses']:,} misses); converged in {result['converge_s'] * 1000:.0f} ms")
+    for problem in problems[:20]:
+        print(f"FAIL: {problem}")
+    print("OK" if not problems else f"FAIL: {len(problems)} problems")
+    return 0 if not problems else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""File size and lookup latency: wishes.json vs. the binary snapshot.
+
+Builds a synthetic wishes file (each wish with a few supporters), converts it
+with wish_snapshot and times a single wish lookup both ways:
+
+  json cold       load_wishes + dict lookup, what one read costs after the file changed
+  json warm       dict lookup on an already parsed file (JsonWishStore's cache)
+  snapshot open   mmap + header read
+  snapshot get    WishSnapshot.get on random IDs (hits), and on unknown IDs
+  snapshot view   WishSnapshot.record_view, the zero-copy slice without decoding
+
+    python benchmarks/snapshot.py --wishes 1000000 --lookups 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import PHRASES, SEED, summarize  # noqa: E402
+from wish_ids import new_wish_id  # noqa: E402
+from wish_snapshot import WishSnapshot, json_to_snapshot  # noqa: E402
+from wish_store import load_wishes, save_wishes  # noqa: E402
+from wish_supporters import supporter_key_hex  # noqa: E402
+
+
+def make_wishes(count, rng):
+    now = time.time()
+    return {
+        new_wish_id(): {
+            'wish_text': f"{rng.choice(PHRASES)} #{i}", 'initial_probability': 70.0,
+            'current_probability': 70.0 + i % 30, 'total_luck_added': float(i % 30),
+            'supporters': [supporter_key_hex(f"s{i}_{j}") for j in range(rng.randint(0, 4))],
+            'created_at': now - i, 'last_updated': now, 'version': 1 + i % 5,
+        } for i in range(count)
+    }
+
+
+def time_lookups(fn, keys):
+    samples = []
+    started = time.perf_counter()
+    for key in keys:
+        t0 = time.perf_counter()
+        fn(key)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def report(name, result):
+    print(f"{name:<16} p50 {result['p50_us']:9.2f} us  p99 {result['p99_us']:9.2f} us  "
+          f"{result['ops_per_sec']:>12,.0f} lookups/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wishes', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=100_000)
+    parser.add_argument('--cold-runs', type=int, default=3, help="full parses timed for the json cold lookup")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(SEED)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'wishes.json')
+        snapshot_path = os.path.join(tmp, 'wishes.snap')
+
+        wishes = make_wishes(args.wishes, rng)
+        wish_ids = list(wishes)
+        started = time.perf_counter()
+        save_wishes(wishes, json_path)
+        json_write = time.perf_counter() - started
+        del wishes
+        started = time.perf_counter()
+        json_to_snapshot(json_path, snapshot_path)
+        convert = time.perf_counter() - started
+
+        json_size = os.path.getsize(json_path)
+        snapshot_size = os.path.getsize(snapshot_path)
+        print(f"wishes={len(wish_ids):,}")
+        print(f"json      {json_size:>14,} B  (save_wishes {json_write:.1f}s)")
+        print(f"snapshot  {snapshot_size:>14,} B  ({snapshot_size / json_size:.0%} of json; "
+              f"converted in {convert:.1f}s)")
+
+        keys = [rng.choice(wish_ids) for _ in range(args.lookups)]
+        misses = [new_wish_id() for _ in range(args.lookups)]
+
+        cold = []
+        for key in keys[:args.cold_runs]:
+            started = time.perf_counter()
+            load_wishes(json_path).get(key)
+            cold.append(time.perf_counter() - started)
+        parsed = load_wishes(json_path)
+        print(f"{'json cold':<16} best {min(cold) * 1000:9.1f} ms  (whole file parsed)")
+        report('json warm', time_lookups(parsed.get, keys))
+        del parsed
+
+        started = time.perf_counter()
+        snapshot = WishSnapshot(snapshot_path)
+        opened = time.perf_counter() - started
+        print(f"{'snapshot open':<16} {opened * 1e6:9.2f} us")
+        report('snapshot get', time_lookups(snapshot.get, keys))
+        report('snapshot miss', time_lookups(snapshot.get, misses))
+        report('snapshot view', time_lookups(lambda key: snapshot.record_view(key).release(), keys))
+        snapshot.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Cold-start benchmark for the wish app.
+
+Runs each page in a fresh interpreter and records wall time, peak RSS and
+which heavy optional modules ended up imported:
+
+    python benchmarks/startup.py --repeat 5 --json startup.json
+
+Pages:
+  core    import the storage/scoring/audio modules only (no Streamlit)
+  create  first render of the create-wish page (needs streamlit)
+  shared  first render of the shared-wish page (needs streamlit)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, 'wish_evaluator.py')
+HEAVY_MODULES = ('torch', 'transformers', 'gtts', 'pyperclip')
+
+_CHILD = r'''
+import json, resource, sys, time
+started = time.perf_counter()
+page = sys.argv[1]
+sys.path.insert(0, {root!r})
+if page == 'core':
+    import wish_audio, wish_core
+else:
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file({app!r}, default_timeout=120)
+    if page == 'shared':
+        at.query_params['wish_id'] = 'startup_bench'
+        at.query_params['wish'] = 'I wish for a white Christmas'
+    at.run()
+    if at.exception:
+        raise SystemExit(str(at.exception))
+elapsed = time.perf_counter() - started
+usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+peak_rss_mb = usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+print(json.dumps({{
+    'seconds': elapsed,
+    'peak_rss_mb': peak_rss_mb,
+    'heavy_modules': [m for m in {heavy!r} if m in sys.modules],
+}}))
+'''
+
+
+def run_page(page, workdir):
+    code = _CHILD.format(root=ROOT, app=APP, heavy=HEAVY_MODULES)
+    env = dict(os.environ, WISH_STORE_PATH=os.path.join(workdir, 'wishes.db'))
+    proc = subprocess.run([sys.executable, '-c', code, page], capture_output=True, text=True, cwd=workdir, env=env)
+    if proc.returncode != 0:
+        return None, (proc.stderr or proc.stdout).strip().splitlines()[-1:]
+    return json.loads(proc.stdout.strip().splitlines()[-1]), None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start time and peak RSS per page.")
+    parser.add_argument('--pages', nargs='+', default=['core', 'create', 'shared'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for page in args.pages:
+            runs = []
+            for _ in range(args.repeat):
+                run, error = run_page(page, workdir)
+                if error:
+                    print(f"{page:7s} skipped: {' '.join(error)}")
+                    break
+                runs.append(run)
+            if not runs:
+                continue
+            results[page] = {
+                'median_seconds': statistics.median(r['seconds'] for r in runs),
+                'max_peak_rss_mb': max(r['peak_rss_mb'] for r in runs),
+                'heavy_modules': sorted({m for r in runs for m in r['heavy_modules']}),
+                'runs': len(runs),
+            }
+            r = results[page]
+            print(f"{page:7s} {r['median_seconds'] * 1000:8.1f} ms  {r['max_peak_rss_mb']:7.1f} MB  "
+                  f"heavy: {', '.join(r['heavy_modules']) or 'none'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Stress check for concurrent support clicks.
+
+Fires parallel add_support calls from threads inside several processes at one
+wish and verifies that no increment or supporter is lost or double counted:
+
+    python benchmarks/stress_support.py --backend sqlite --processes 4 --threads 8 --per-thread 250
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wish_store import VersionConflict, open_store  # noqa: E402
+
+WISH_ID = "stress_wish"
+INCREMENT = 1.0
+
+
+def _worker(backend, path, proc_no, threads, per_thread, results):
+    store = open_store(backend, path)
+
+    def run(thread_no):
+        accepted = 0
+        for i in range(per_thread):
+            supporter = f"supporter_{proc_no}_{thread_no}_{i}"
+            ok, _ = store.add_support(WISH_ID, INCREMENT, supporter)
+            accepted += ok
+            # A repeated click by the same supporter must always be rejected
+            if i % 50 == 0:
+                dup_ok, _ = store.add_support(WISH_ID, INCREMENT, supporter)
+                assert not dup_ok, f"duplicate accepted for {supporter}"
+        results.put(accepted)
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+
+def check_cas(store):
+    """A stale expected_version must be refused."""
+    version = store.get(WISH_ID)['version']
+    store.add_support(WISH_ID, INCREMENT, "cas_first", expected_version=version)
+    try:
+        store.add_support(WISH_ID, INCREMENT, "cas_second", expected_version=version)
+    except VersionConflict:
+        return
+    raise AssertionError("stale compare-and-swap was accepted")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'json', 'events'])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--per-thread', type=int, default=250)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, {'json': 'wishes.json', 'events': 'wishes_events'}.get(args.backend, 'wishes.db'))
+        store = open_store(args.backend, path)
+        store.create_or_update(WISH_ID, "I wish for no lost updates", 0.0)
+
+        results = multiprocessing.Queue()
+        started = time.perf_counter()
+        procs = [
+            multiprocessing.Process(target=_worker, args=(args.backend, path, p, args.threads, args.per_thread, results))
+            for p in range(args.processes)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - started
+        failed = [p.exitcode for p in procs if p.exitcode != 0]
+        if failed:
+            print(f"FAIL: worker exit codes {failed}")
+            return 1
+
+        accepted = sum(results.get() for _ in range(args.processes * args.threads))
+        expected = args.processes * args.threads * args.per_thread
+        wish = store.get(WISH_ID)
+        print(f"{expected} supports in {elapsed:.2f}s ({expected / elapsed:.0f}/s) on {args.backend}")
+        print(f"accepted={accepted} supporters_count={wish['supporters_count']} "
+              f"total_luck_added={wish['total_luck_added']} version={wish['version']}")
+
+        ok = (
+            accepted == expected
+            and wish['supporters_count'] == expected
+            and wish['total_luck_added'] == expected * INCREMENT
+            and wish['version'] == expected + 1
+        )
+        check_cas(store)
+        print("OK" if ok else "FAIL: counts do not add up")
+        return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""Headless benchmark suite for the storage and scoring hot paths.
+
+Seeds synthetic stores of increasing size and times what the page does on
+each request, without Streamlit:
+
+  get_wish_data            WishCache.get, cold (each wish once) and warm (repeats)
+  create_or_update_wish    store.create_or_update of new wishes
+  update_wish_probability  store.add_support, single thread and N threads on one wish
+  evaluate_wish_sentiment  keyword scoring, one call at a time and via score_wishes
+  create_share_link        wish_core's link builder
+
+Results go to a JSON file; --compare checks them against an earlier run and
+exits non-zero when the best new repeat of an operation is more than
+--threshold below the slowest repeat seen in the baseline. Machines also
+drift between whole runs, so give --compare several baseline runs; the
+slowest repeat across all of them sets the floor.
+
+    for n in 1 2 3; do python benchmarks/suite.py --out bench$n.json; done
+    python benchmarks/suite.py --out new.json --compare bench1.json bench2.json bench3.json
+
+Stores are seeded straight through SQL (or one JSON write), so 1M-wish runs
+take seconds to set up; runs are seeded, so two runs measure the same work.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wish_cache import WishCache  # noqa: E402
+from wish_core import create_share_link  # noqa: E402
+from wish_sentiment import evaluate_wish_sentiment, score_wishes  # noqa: E402
+from wish_store import open_store, save_wishes  # noqa: E402
+
+SEED = 2026
+PHRASES = (
+    "I wish for health and happiness", "I hope for a white Christmas", "I want a new bike",
+    "I wish my family stays safe", "I wish to travel the world and learn the guitar",
+    "I hope to find a great new job", "I don't want to be stressed", "I wish for peace on earth",
+)
+
+
+# ---------------------------
+# Seeding
+# ---------------------------
+def wish_ids_for(size):
+    return [f"bench{i:07d}" for i in range(size)]
+
+
+def seed_store(backend, path, size):
+    """Create a store holding `size` wishes; returns it opened."""
+    rng = random.Random(SEED)
+    now = time.time()
+    if backend == 'json':
+        save_wishes({
+            wish_id: {
+                'wish_text': rng.choice(PHRASES), 'initial_probability': 70.0, 'current_probability': 70.0,
+                'supporters': [], 'total_luck_added': 0.0, 'created_at': now, 'last_updated': now, 'version': 1,
+            } for wish_id in wish_ids_for(size)
+        }, path)
+        return open_store('json', path, write_behind=False, archive_ttl_days=0)
+
+    store = open_store('sqlite', path, write_behind=False, archive_ttl_days=0)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO wish_texts (wish_text) VALUES (?)", [(p,) for p in PHRASES]
+    )
+    text_ids = [r[0] for r in conn.execute("SELECT text_id FROM wish_texts")]
+    conn.executemany(
+        "INSERT INTO wishes (wish_id, text_id, initial_probability, current_probability, created_at, last_updated)"
+        " VALUES (?, ?, 70.0, 70.0, ?, ?)",
+        ((wish_id, rng.choice(text_ids), now, now) for wish_id in wish_ids_for(size))
+    )
+    conn.execute("COMMIT")
+    conn.close()
+    return store
+
+
+# ---------------------------
+# Measurements
+# ---------------------------
+def measure(fn, make_args, repeat):
+    """Best of `repeat` runs of fn over make_args(run); returns ops/s, spread and latency percentiles."""
+    best = None
+    rates = []
+    for run in range(repeat):
+        args_list = make_args(run)
+        samples = []
+        # As timeit does: no collector pauses inside the timed loop
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for args in args_list:
+                t0 = time.perf_counter()
+                fn(*args)
+                samples.append(time.perf_counter() - t0)
+            result = summarize(samples, time.perf_counter() - started)
+        finally:
+            gc.enable()
+        rates.append(result['ops_per_sec'])
+        if best is None or result['ops_per_sec'] > best['ops_per_sec']:
+            best = result
+    return with_spread(best, rates)
+
+
+def with_spread(result, rates):
+    """Add how much the runs behind a best-of result disagreed."""
+    result['runs'] = len(rates)
+    result['min_ops_per_sec'] = min(rates)
+    result['median_ops_per_sec'] = statistics.median(rates)
+    # Share of the best rate that the slowest run fell short by
+    result['spread'] = 1 - min(rates) / max(rates) if max(rates) else 0.0
+    return result
+
+
+def summarize(samples, elapsed):
+    samples = sorted(samples)
+    return {
+        'ops': len(samples),
+        'ops_per_sec': len(samples) / elapsed if elapsed else 0.0,
+        'p50_us': samples[len(samples) // 2] * 1e6,
+        'p99_us': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+        'mean_us': statistics.fmean(samples) * 1e6,
+    }
+
+
+def bench_store(backend, size, ops, threads, repeat, tmp):
+    rng = random.Random(SEED + size)
+    path = os.path.join(tmp, f"bench_{size}.{'json' if backend == 'json' else 'db'}")
+    started = time.perf_counter()
+    store = seed_store(backend, path, size)
+    seed_seconds = time.perf_counter() - started
+    ids = wish_ids_for(size)
+    results = {}
+
+    samples = [[(rng.choice(ids),) for _ in range(ops)] for _ in range(repeat)]
+    # A fresh cache per run keeps "cold" cold; "warm" re-reads the same sample
+    caches = []
+
+    def cold_sample(run):
+        caches.append(WishCache(store, max_entries=ops))
+        return samples[run]
+
+    results['get_wish_data.cold'] = measure(lambda wish_id: caches[-1].get(wish_id), cold_sample, repeat)
+    warm = WishCache(store, max_entries=ops)
+    for (wish_id,) in samples[0]:
+        warm.get(wish_id)
+    results['get_wish_data.warm'] = measure(warm.get, lambda run: samples[0], repeat)
+    results['create_or_update_wish'] = measure(
+        store.create_or_update,
+        lambda run: [(f"new{run}_{i:07d}", rng.choice(PHRASES), 70.0) for i in range(ops)], repeat
+    )
+    results['update_wish_probability'] = measure(
+        store.add_support, lambda run: [(rng.choice(ids), 1.0, f"supporter_{run}_{i}") for i in range(ops)], repeat
+    )
+    runs = [contended(store, ids[run + 1], ops, threads) for run in range(repeat)]
+    results[f'update_wish_probability.contended_{threads}t'] = with_spread(
+        max(runs, key=lambda r: r['ops_per_sec']), [r['ops_per_sec'] for r in runs]
+    )
+    store.close()
+    for name in list(results):
+        results[name]['seed_seconds'] = seed_seconds
+    return results
+
+
+def contended(store, wish_id, ops, threads):
+    """All threads support the same wish, as on a viral shared link."""
+    per_thread = max(1, ops // threads)
+    thread_samples = [[] for _ in range(threads)]
+
+    def run(n):
+        for i in range(per_thread):
+            t0 = time.perf_counter()
+            store.add_support(wish_id, 1.0, f"contender_{n}_{i}")
+            thread_samples[n].append(time.perf_counter() - t0)
+
+    pool = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return summarize([s for samples in thread_samples for s in samples], time.perf_counter() - started)
+
+
+def bench_scoring(ops, repeat):
+    rng = random.Random(SEED)
+    texts = [f"{rng.choice(PHRASES)} number {i % 500}" for i in range(ops)]
+    args = [(t,) for t in texts]
+    results = {'evaluate_wish_sentiment': measure(evaluate_wish_sentiment, lambda run: args, repeat)}
+    rates = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = sum(1 for _ in score_wishes(texts))
+        rates.append(count / (time.perf_counter() - started))
+    results['evaluate_wish_sentiment.score_wishes'] = with_spread({'ops': len(texts), 'ops_per_sec': max(rates)}, rates)
+
+    link_args = [(f"bench{i:07d}", t, 75.5) for i, t in enumerate(texts)]
+    results['create_share_link'] = measure(create_share_link, lambda run: link_args, repeat)
+    return results
+
+
+def calibrate(loops=15):
+    """Ops/s of a fixed pure-Python workload (median of short loops), for --normalize."""
+    rates = []
+    for _ in range(loops):
+        started = time.perf_counter()
+        for i in range(5000):
+            json.dumps({'wish_id': f"cal{i}", 'p': i * 0.5}).encode().hex()
+        rates.append(5000 / (time.perf_counter() - started))
+    return statistics.median(rates)
+
+
+# ---------------------------
+# Reporting
+# ---------------------------
+def _git_rev():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def merge_baselines(baselines):
+    """One baseline from several runs: each key's median best rate and its slowest run of all."""
+    merged = {'meta': dict(baselines[0]['meta']), 'results': {}}
+    calibrations = [b['meta']['calibration'] for b in baselines if b['meta'].get('calibration')]
+    merged['meta']['calibration'] = statistics.median(calibrations) if calibrations else None
+    for key in baselines[0]['results']:
+        runs = [b['results'][key] for b in baselines if b['results'].get(key, {}).get('ops_per_sec')]
+        if not runs:
+            continue
+        merged['results'][key] = {
+            'ops_per_sec': statistics.median(r['ops_per_sec'] for r in runs),
+            'min_ops_per_sec': min(r.get('min_ops_per_sec', r['ops_per_sec']) for r in runs),
+        }
+    return merged
+
+
+def compare(current, baseline, threshold, normalize=False):
+    """Print old vs new ops/s; returns the keys that regressed.
+
+    A key regressed when even the best of its new repeats is more than
+    threshold below the slowest baseline repeat, i.e. beyond both the
+    threshold and the spread the baseline showed. With normalize, rates are
+    first scaled by the calibration ratio of the two runs, for comparing
+    results from different machines.
+    """
+    regressions = []
+    scale = 1.0
+    if normalize and current['meta'].get('calibration') and baseline['meta'].get('calibration'):
+        scale = baseline['meta']['calibration'] / current['meta']['calibration']
+        print(f"calibration: this machine ran {1 / scale:.2f}x the baseline speed; rates are normalised")
+    for key in sorted(current['results']):
+        old = baseline['results'].get(key)
+        if old is None or not old.get('ops_per_sec'):
+            continue
+        new_rate, old_rate = current['results'][key]['ops_per_sec'] * scale, old['ops_per_sec']
+        floor = old.get('min_ops_per_sec', old_rate) * (1 - threshold)
+        flag = ''
+        if new_rate < floor:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print(f"{key:60s} {old_rate:12,.0f} -> {new_rate:12,.0f} ops/s ({new_rate / old_rate - 1:+.0%}, "
+              f"floor {floor:,.0f}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000', help="comma separated store sizes, up to 1000000")
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'json'])
+    parser.add_argument('--ops', type=int, default=2000, help="operations per measurement")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=5, help="runs per measurement; the best one is kept")
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--compare', metavar='BASELINE', nargs='+', help="earlier results file(s) to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument('--normalize', action='store_true',
+                        help="scale rates by the machines' calibration ratio (baseline from another machine)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    report = {
+        'meta': {
+            'timestamp': time.time(), 'git_rev': _git_rev(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'sqlite': sqlite3.sqlite_version, 'backend': args.backend,
+            'ops': args.ops, 'threads': args.threads, 'repeat': args.repeat, 'sizes': sizes,
+            'calibration': calibrate(),
+        },
+        'results': {},
+    }
+    for name, result in bench_scoring(args.ops * 10, args.repeat).items():
+        report['results'][name] = result
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            for name, result in bench_store(args.backend, size, args.ops, args.threads, args.repeat, tmp).items():
+                report['results'][f"{args.backend}/{size}/{name}"] = result
+
+    for key, result in report['results'].items():
+        latency = f"p50 {result['p50_us']:8.1f} us  p99 {result['p99_us']:8.1f} us" if 'p50_us' in result else ''
+        print(f"{key:60s} {result['ops_per_sec']:12,.0f} ops/s  {latency}")
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.out}")
+
+    if args.compare:
+        baselines = []
+        for path in args.compare:
+            with open(path) as f:
+                baselines.append(json.load(f))
+        baseline = merge_baselines(baselines)
+        print(f"\ncompared with {', '.join(args.compare)} (rev {baseline['meta'].get('git_rev')}):")
+        if args.repeat < 3:
+            print(f"note: --repeat {args.repeat} cannot measure noise; results will be flaky")
+        regressions = compare(report, baseline, args.threshold, args.normalize)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
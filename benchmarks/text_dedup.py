@@ -0,0 +1,164 @@
+"""Dedup ratio and savings of interned wish texts on a synthetic corpus.
+
+Draws wishes from a Zipf-like mix of popular phrasings (with random case and
+spacing variations) plus a share of one-off wishes, then reports:
+
+  * dedup ratio: wishes per distinct text
+  * text bytes and database size: interned SQLite store vs. inline text
+  * memory: per-wish text copies vs. one shared string per distinct text
+  * scoring: keyword time with and without batch deduplication, and the
+    model calls saved by the sentiment memo (keyed by normalised text)
+
+    python benchmarks/text_dedup.py --wishes 200000 --popular 500 --unique-share 0.2
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wish_ids import new_wish_id  # noqa: E402
+from wish_sentiment import evaluate_wish_sentiment, score_wishes  # noqa: E402
+from wish_store import SqliteWishStore  # noqa: E402
+
+STARTERS = ("I wish for", "I hope for", "I want", "I wish I had")
+THINGS = (
+    "health and happiness", "a white Christmas", "peace on earth", "a new bike", "my family to be safe",
+    "a puppy", "snow", "world peace", "love", "a new job", "good grades", "more time with friends",
+)
+INLINE_SCHEMA = """
+CREATE TABLE wishes (
+    wish_id TEXT PRIMARY KEY, wish_text TEXT NOT NULL, initial_probability REAL NOT NULL,
+    current_probability REAL NOT NULL, total_luck_added REAL NOT NULL DEFAULT 0,
+    supporters_count INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL,
+    last_updated REAL NOT NULL, version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX wishes_last_updated ON wishes (last_updated);
+"""
+
+
+def make_corpus(count, popular, unique_share, seed=2024):
+    rng = random.Random(seed)
+    phrases = [f"{rng.choice(STARTERS)} {rng.choice(THINGS)}" + (f" #{i}" if i >= len(THINGS) * 2 else "")
+               for i in range(popular)]
+    weights = [1.0 / (rank + 1) for rank in range(popular)]
+    corpus = []
+    for i in range(count):
+        if rng.random() < unique_share:
+            corpus.append(f"I wish for {rng.choice(THINGS)} and gift number {i}")
+            continue
+        text = rng.choices(phrases, weights)[0]
+        if rng.random() < 0.2:
+            text = text.lower()
+        if rng.random() < 0.1:
+            text = text.replace(' ', '  ', 1)
+        corpus.append(text)
+    return corpus
+
+
+def db_size(path):
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+def bench_storage(corpus, tmp):
+    interned_path = os.path.join(tmp, 'interned.db')
+    store = SqliteWishStore(interned_path)
+    started = time.perf_counter()
+    for text in corpus:
+        store.create(new_wish_id(), text, 70.0)
+    interned_time = time.perf_counter() - started
+    stats = store.text_stats()
+    store._conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    inline_path = os.path.join(tmp, 'inline.db')
+    conn = sqlite3.connect(inline_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(INLINE_SCHEMA)
+    started = time.perf_counter()
+    now = time.time()
+    for text in corpus:
+        conn.execute(
+            "INSERT INTO wishes (wish_id, wish_text, initial_probability, current_probability, created_at,"
+            " last_updated) VALUES (?, ?, ?, ?, ?, ?)", (new_wish_id(), text, 70.0, 70.0, now, now)
+        )
+    inline_time = time.perf_counter() - started
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return stats, db_size(interned_path), db_size(inline_path), interned_time, inline_time
+
+
+def bench_memory(corpus):
+    """Records holding their own text copy vs. sharing one string per distinct text."""
+    tracemalloc.start()
+    copies = [''.join(list(text)) for text in corpus]
+    inline_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del copies
+
+    tracemalloc.start()
+    texts = {}
+    shared = [texts.setdefault(text, text) for text in corpus]
+    interned_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del shared, texts
+    return inline_bytes, interned_bytes
+
+
+def bench_scoring(corpus, tmp):
+    started = time.perf_counter()
+    for text in corpus:
+        evaluate_wish_sentiment(text)
+    plain = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in score_wishes(corpus):
+        pass
+    batched = time.perf_counter() - started
+
+    # The store memo is used for the model scorer; count the calls it saves
+    store = SqliteWishStore(os.path.join(tmp, 'memo.db'))
+    calls = 0
+    started = time.perf_counter()
+    for text in corpus:
+        if store.get_sentiment(text, 'model:bench') is None:
+            calls += 1
+            store.put_sentiment(text, 'model:bench', 'POSITIVE', 0.9)
+    memo = time.perf_counter() - started
+    return plain, batched, memo, calls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wishes', type=int, default=200_000)
+    parser.add_argument('--popular', type=int, default=500, help="distinct popular phrasings")
+    parser.add_argument('--unique-share', type=float, default=0.2, help="share of one-off wishes")
+    args = parser.parse_args(argv)
+
+    corpus = make_corpus(args.wishes, args.popular, args.unique_share)
+    with tempfile.TemporaryDirectory() as tmp:
+        stats, interned_size, inline_size, interned_time, inline_time = bench_storage(corpus, tmp)
+        inline_mem, interned_mem = bench_memory(corpus)
+        plain, batched, memo, calls = bench_scoring(corpus, tmp)
+
+    print(f"wishes={stats['wishes']} distinct_texts={stats['distinct_texts']} "
+          f"dedup_ratio={stats['wishes'] / max(1, stats['distinct_texts']):.1f}x")
+    print(f"text bytes: {stats['text_bytes_referenced']:,} referenced, {stats['text_bytes_stored']:,} stored "
+          f"({1 - stats['text_bytes_stored'] / max(1, stats['text_bytes_referenced']):.0%} saved)")
+    print(f"database: {inline_size:,} B inline vs {interned_size:,} B interned "
+          f"({1 - interned_size / max(1, inline_size):.0%} saved); "
+          f"insert {inline_time:.2f}s inline vs {interned_time:.2f}s interned")
+    print(f"memory: {inline_mem:,} B per-wish copies vs {interned_mem:,} B shared "
+          f"({1 - interned_mem / max(1, inline_mem):.0%} saved)")
+    print(f"keyword scoring: {plain:.2f}s one by one, {batched:.2f}s via score_wishes (deduplicated)")
+    print(f"model memo: {calls} of {len(corpus)} wishes need the model "
+          f"({1 - calls / len(corpus):.0%} saved), {memo / len(corpus) * 1e6:.0f} us per memo round trip")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
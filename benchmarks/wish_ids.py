@@ -0,0 +1,118 @@
+"""Collision and throughput check for time-ordered wish IDs.
+
+Generates IDs in several processes, checks they never repeat and stay
+strictly increasing within each process, then times inserts through
+WishStore.create:
+
+    python benchmarks/wish_ids.py --count 20000000 --processes 4 --inserts 20000
+
+Processes draw their random bits independently, so two of them can produce
+the same ID; WishStore.create refuses the second and the caller draws again.
+Such collisions are reported as the retry rate they cause, not as failures.
+Each process streams its IDs to a file; since every file is already sorted,
+a streaming merge finds them in constant memory.
+"""
+import argparse
+import heapq
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wish_ids import ID_LENGTH, new_wish_id  # noqa: E402
+from wish_store import open_store  # noqa: E402
+
+
+def _generate(count, path, results):
+    """Write count IDs to path; report (elapsed, duplicates, out_of_order, bad_length)."""
+    duplicates = out_of_order = bad_length = 0
+    previous = ''
+    elapsed = 0.0
+    with open(path, 'w') as f:
+        for _ in range(0, count, 100_000):
+            started = time.perf_counter()
+            ids = [new_wish_id() for _ in range(min(100_000, count))]
+            elapsed += time.perf_counter() - started
+            for wish_id in ids:
+                duplicates += wish_id == previous
+                out_of_order += wish_id < previous
+                bad_length += len(wish_id) != ID_LENGTH
+                previous = wish_id
+            f.write('\n'.join(ids) + '\n')
+            count -= len(ids)
+    results.put((elapsed, duplicates, out_of_order, bad_length))
+
+
+def count_collisions(paths):
+    """Merge the sorted per-process files and count IDs drawn by more than one process."""
+    files = [open(path) for path in paths]
+    try:
+        collisions = 0
+        previous = None
+        for wish_id in heapq.merge(*files):
+            collisions += wish_id == previous
+            previous = wish_id
+        return collisions
+    finally:
+        for f in files:
+            f.close()
+
+
+def bench_inserts(backend, count):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, {'json': 'wishes.json', 'events': 'wishes_events'}.get(backend, 'wishes.db'))
+        store = open_store(backend, path)
+        started = time.perf_counter()
+        created = 0
+        for i in range(count):
+            created += store.create(new_wish_id(), f"I wish for present #{i}", 50.0) is not None
+        elapsed = time.perf_counter() - started
+        dup = store.create(store.wish_ids_between(0, time.time() + 1, limit=1)[0], "dup", 50.0)
+        in_range = len(store.wish_ids_between(0, time.time() + 1))
+        store.close()
+    return created, elapsed, dup is None, in_range
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=20_000_000, help="IDs generated in total")
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--inserts', type=int, default=20_000)
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'json', 'events'])
+    args = parser.parse_args(argv)
+
+    per = args.count // args.processes
+    results = multiprocessing.Queue()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"ids_{p}.txt") for p in range(args.processes)]
+        procs = [multiprocessing.Process(target=_generate, args=(per, path, results)) for path in paths]
+        for p in procs:
+            p.start()
+        outputs = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        collisions = count_collisions(paths)
+
+    total = per * args.processes
+    rate = sum(per / o[0] for o in outputs)
+    duplicates = sum(o[1] for o in outputs)
+    out_of_order = sum(o[2] for o in outputs)
+    bad_length = sum(o[3] for o in outputs)
+    print(f"{total} IDs from {args.processes} processes, {rate:,.0f} IDs/s")
+    print(f"within a process: duplicates={duplicates} out_of_order={out_of_order} bad_length={bad_length}")
+    print(f"across processes: collisions={collisions}, i.e. create retries {collisions / total:.2e} per ID")
+
+    created, elapsed, dup_refused, in_range = bench_inserts(args.backend, args.inserts)
+    print(f"{created} inserts in {elapsed:.2f}s ({created / elapsed:,.0f}/s) on {args.backend}; "
+          f"duplicate refused={dup_refused} range scan={in_range}")
+
+    ok = not duplicates and not out_of_order and not bad_length and dup_refused and in_range == created
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""Small JSON HTTP API for reading and supporting wishes.
+
+Share-link traffic is mostly "look at the probability, click once"; this
+serves exactly that without the Streamlit page:
+
+    GET  /wish/{id}            the wish record as JSON, with an ETag
+    POST /wish/{id}/support    body {"supporter_id": "..."}; adds random luck
+    GET  /leaderboard          top wishes; ?metric=supporters|probability&limit=10
+    GET  /metrics              Prometheus text from wish_metrics (WISH_METRICS_PAGE=1)
+    GET  /static/{name}        the page theme files, see wish_theme
+
+Responses carry ``ETag: "<version>"``, so a client polling with
+``If-None-Match`` gets a bodyless 304 until the wish changes. Supports over
+the wish_ratelimit limits get 429 with Retry-After; clients are told apart
+by peer address and User-Agent (the first X-Forwarded-For hop instead of
+the peer when WISH_API_TRUST_FORWARDED=1, behind a proxy; without an
+address only the wish and total limits apply). Connections are kept alive
+(HTTP/1.1 default) and closed after WISH_API_KEEPALIVE idle seconds.
+Anything that may reach the store runs in a thread pool, off the event
+loop: reads (a cache miss, or seeding the leaderboard, which scans the
+store) in one pool, and supports, which may wait on a database lock, in
+another, so slow writes never hold reads up.
+
+    python wish_api.py --host 0.0.0.0 --port 8502
+"""
+import asyncio
+import json
+import math
+import os
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from wish_core import (
+    RateLimited, client_address, client_key, get_random_increment, get_wish_data, top_wishes, update_wish_probability,
+)
+from wish_leaderboard import LEADERBOARD_SIZE
+from wish_metrics import REGISTRY, inc, timed
+from wish_store import LEADERBOARD_METRICS
+from wish_theme import THEME_FILES, read_asset, theme_version
+
+API_HOST = os.environ.get('WISH_API_HOST', '127.0.0.1')
+API_PORT = int(os.environ.get('WISH_API_PORT', '8502'))
+KEEPALIVE_SECONDS = float(os.environ.get('WISH_API_KEEPALIVE', '15'))
+WRITE_THREADS = int(os.environ.get('WISH_API_WRITE_THREADS', '4'))
+READ_THREADS = int(os.environ.get('WISH_API_READ_THREADS', '8'))
+TRUST_FORWARDED = os.environ.get('WISH_API_TRUST_FORWARDED', '') not in ('', '0')
+# Same switch as the page's ?metrics: internals stay private unless asked for
+METRICS_PAGE = os.environ.get('WISH_METRICS_PAGE', '') not in ('', '0')
+MAX_HEADER_BYTES = 8192
+MAX_BODY_BYTES = 4096
+MAX_SUPPORTER_ID = 200
+ASSET_TYPES = {'.css': 'text/css; charset=utf-8', '.svg': 'image/svg+xml'}
+
+_REASONS = {
+    200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    411: 'Length Required', 413: 'Payload Too Large', 429: 'Too Many Requests', 431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error',
+}
+
+
+class _BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def etag_for(record):
+    return f'"{record.get("version", 0)}"'
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    # Weak comparison, as If-None-Match requires
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+def _json_body(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+class WishApi:
+    """Routes requests to wish_core; one instance per server."""
+
+    def __init__(self, write_threads=WRITE_THREADS, read_threads=READ_THREADS):
+        self._writes = ThreadPoolExecutor(max_workers=write_threads, thread_name_prefix="wish-api-write")
+        self._reads = ThreadPoolExecutor(max_workers=read_threads, thread_name_prefix="wish-api-read")
+
+    async def handle(self, method, path, headers, body, peer=None):
+        """Return (status, extra_headers, body_bytes) for one request from peer (an IP address)."""
+        path, _, query = path.partition('?')
+        parts = path.strip('/').split('/')
+        if parts == ['leaderboard']:
+            if method != 'GET':
+                return 405, {'Allow': 'GET'}, b''
+            return await self.leaderboard(urllib.parse.parse_qs(query))
+        if METRICS_PAGE and parts == ['metrics']:
+            if method != 'GET':
+                return 405, {'Allow': 'GET'}, b''
+            return 200, {'Content-Type': 'text/plain; version=0.0.4'}, REGISTRY.render_prometheus().encode()
+        if len(parts) == 2 and parts[0] == 'static' and parts[1] in THEME_FILES:
+            if method != 'GET':
+                return 405, {'Allow': 'GET'}, b''
+            return self.static_asset(parts[1], urllib.parse.parse_qs(query), headers)
+        if len(parts) == 2 and parts[0] == 'wish' and parts[1]:
+            if method != 'GET':
+                return 405, {'Allow': 'GET'}, b''
+            return await self.get_wish(parts[1], headers)
+        if len(parts) == 3 and parts[0] == 'wish' and parts[1] and parts[2] == 'support':
+            if method != 'POST':
+                return 405, {'Allow': 'POST'}, b''
+            return await self.support_wish(parts[1], body, client_key(
+                client_address(peer, headers.get('x-forwarded-for'), TRUST_FORWARDED), headers.get('user-agent')
+            ))
+        return 404, {}, _json_body({'error': 'not found'})
+
+    async def get_wish(self, wish_id, headers):
+        record = await asyncio.get_running_loop().run_in_executor(self._reads, get_wish_data, wish_id)
+        if record is None:
+            return 404, {}, _json_body({'error': 'wish not found'})
+        etag = etag_for(record)
+        if _etag_matches(headers.get('if-none-match'), etag):
+            return 304, {'ETag': etag}, b''
+        record['wish_id'] = wish_id
+        return 200, {'ETag': etag}, _json_body(record)
+
+    def static_asset(self, name, params, headers):
+        version = theme_version()
+        extra = {'ETag': f'"{version}"', 'Content-Type': ASSET_TYPES[os.path.splitext(name)[1]]}
+        # A versioned URL never changes content: let browsers keep it
+        if params.get('v', [None])[0] == version:
+            extra['Cache-Control'] = 'public, max-age=31536000, immutable'
+        if _etag_matches(headers.get('if-none-match'), extra['ETag']):
+            return 304, extra, b''
+        return 200, extra, read_asset(name)
+
+    async def leaderboard(self, params):
+        metric = params.get('metric', ['supporters'])[0]
+        if metric not in LEADERBOARD_METRICS:
+            raise _BadRequest(400, f"metric must be one of {', '.join(LEADERBOARD_METRICS)}")
+        try:
+            limit = int(params.get('limit', ['10'])[0])
+        except ValueError:
+            raise _BadRequest(400, "limit must be an integer")
+        if not 1 <= limit <= LEADERBOARD_SIZE:
+            raise _BadRequest(400, f"limit must be between 1 and {LEADERBOARD_SIZE}")
+        wishes = await asyncio.get_running_loop().run_in_executor(self._reads, top_wishes, metric, limit)
+        return 200, {}, _json_body({'metric': metric, 'wishes': wishes})
+
+    async def support_wish(self, wish_id, body, client=None):
+        try:
+            supporter_id = json.loads(body or b'{}').get('supporter_id')
+        except (ValueError, AttributeError):
+            raise _BadRequest(400, "body must be a JSON object")
+        if not isinstance(supporter_id, str) or not supporter_id or len(supporter_id) > MAX_SUPPORTER_ID:
+            raise _BadRequest(400, "supporter_id is required")
+
+        increment = get_random_increment()
+        loop = asyncio.get_running_loop()
+        try:
+            success, probability = await loop.run_in_executor(
+                self._writes, update_wish_probability, wish_id, increment, supporter_id, client
+            )
+        except RateLimited as e:
+            return 429, {'Retry-After': str(math.ceil(e.retry_after))}, _json_body({'error': str(e)})
+        if probability is None:
+            return 404, {}, _json_body({'error': 'wish not found'})
+        return 200, {}, _json_body({
+            'wish_id': wish_id,
+            'accepted': success,
+            'increment': increment if success else 0.0,
+            'current_probability': probability,
+        })
+
+    def close(self):
+        self._reads.shutdown(wait=True)
+        self._writes.shutdown(wait=True)
+
+
+# ---------------------------
+# HTTP/1.1 connection handling
+# ---------------------------
+async def _read_request(reader):
+    """(method, path, version, headers, body), or None when the client closed."""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_SECONDS)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise _BadRequest(431, "request header too large")
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, path, version = lines[0].split(' ')
+    except ValueError:
+        raise _BadRequest(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    body = b''
+    if 'transfer-encoding' in headers:
+        raise _BadRequest(411, "chunked bodies are not supported")
+    if 'content-length' in headers:
+        try:
+            length = int(headers['content-length'])
+        except ValueError:
+            raise _BadRequest(400, "bad Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise _BadRequest(413, "body too large")
+        if length:
+            body = await reader.readexactly(length)
+    return method, path, version, headers, body
+
+
+def _response(status, headers, body, keep_alive):
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+    headers.setdefault('Content-Type', 'application/json')
+    headers.setdefault('Cache-Control', 'no-cache')
+    headers['Content-Length'] = str(len(body))
+    headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+def _route_label(path):
+    parts = path.split('?', 1)[0].strip('/').split('/')
+    if parts[0] == 'wish':
+        return 'support' if parts[-1] == 'support' and len(parts) == 3 else 'get'
+    return parts[0] or 'root'
+
+
+async def serve_connection(api, reader, writer):
+    peername = writer.get_extra_info('peername')
+    peer = peername[0] if isinstance(peername, tuple) else peername
+    try:
+        while True:
+            keep_alive = False
+            route = 'invalid'
+            try:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, version, headers, body = request
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                route = _route_label(path)
+                with timed('wish_api_request_seconds', route=route):
+                    status, extra, payload = await api.handle(method, path, headers, body, peer)
+            except _BadRequest as e:
+                status, extra, payload = e.status, {}, _json_body({'error': str(e)})
+            except Exception as e:
+                print(f"wish api error: {e}")
+                status, extra, payload = 500, {}, _json_body({'error': 'internal error'})
+            inc('wish_api_requests_total', route=route, status=str(status))
+            writer.write(_response(status, extra, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve(host=API_HOST, port=API_PORT, api=None, ready=None):
+    """Run the API until cancelled; ready (an asyncio.Event) is set once listening."""
+    api = api or WishApi()
+    server = await asyncio.start_server(
+        lambda reader, writer: serve_connection(api, reader, writer), host, port, limit=MAX_HEADER_BYTES
+    )
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        api.close()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the wish JSON API.")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    args = parser.parse_args(argv)
+    print(f"wish api listening on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
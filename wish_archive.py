@@ -0,0 +1,308 @@
+"""Retention: move idle wishes to compressed cold storage.
+
+Wishes whose ``last_updated`` is older than a TTL are exported from the hot
+store, appended to gzip JSONL files named after the month they were last
+updated (``wishes_archive/2024-12.jsonl.gz``) and then deleted from the hot
+store. Each write appends one gzip member of at most MEMBER_RECORDS wishes,
+so the files stay readable with plain ``zcat`` while a lookup only has to
+decompress one small member. An SQLite index maps wish_id to its member.
+
+ArchivingStore wraps a store so that archived wishes are still readable
+through ``get`` and are restored to the hot store when someone supports
+them again. Run a sweep from cron with::
+
+    python wish_archive.py --ttl-days 90
+"""
+import base64
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from wish_store import DATA_DIR, WishStore, locked_file
+from wish_supporters import BloomFilter, supporter_key, supporter_key_hex
+
+ARCHIVE_DIR = os.environ.get('WISH_ARCHIVE_DIR', os.path.join(DATA_DIR, 'wishes_archive'))
+TTL_DAYS = float(os.environ.get('WISH_TTL_DAYS', '0') or 0)
+ARCHIVE_INTERVAL = float(os.environ.get('WISH_ARCHIVE_INTERVAL', '3600'))
+MEMBER_RECORDS = 256
+DAY = 86400.0
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived (
+    wish_id TEXT PRIMARY KEY,
+    month TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    archived_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class WishArchive:
+    """Append-only gzip JSONL files by month, plus an index of where each wish is."""
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, 'index.db')
+        self._local = threading.local()
+        self._conn().executescript(_INDEX_SCHEMA)
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _file(self, month):
+        return os.path.join(self.root, f"{month}.jsonl.gz")
+
+    def write(self, records):
+        """Append exported records ({wish_id: record}); returns {wish_id: (month, offset)} of each."""
+        by_month = {}
+        for wish_id, record in records.items():
+            month = time.strftime('%Y-%m', time.gmtime(record['last_updated']))
+            by_month.setdefault(month, []).append((wish_id, record))
+
+        locations = []
+        for month, items in sorted(by_month.items()):
+            path = self._file(month)
+            for start in range(0, len(items), MEMBER_RECORDS):
+                chunk = items[start:start + MEMBER_RECORDS]
+                data = gzip.compress(''.join(
+                    json.dumps(dict(record, wish_id=wish_id), separators=(',', ':')) + '\n'
+                    for wish_id, record in chunk
+                ).encode())
+                with locked_file(path):
+                    with open(path, 'ab') as f:
+                        offset = f.seek(0, os.SEEK_END)
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                now = time.time()
+                locations.extend((wish_id, month, offset, len(data), now) for wish_id, _ in chunk)
+
+        # Index only after the data is on disk: a crash leaves unindexed bytes, never a dangling entry
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO archived (wish_id, month, offset, length, archived_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(wish_id) DO UPDATE SET month = excluded.month, offset = excluded.offset,"
+                " length = excluded.length, archived_at = excluded.archived_at",
+                locations
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return {wish_id: (month, offset) for wish_id, month, offset, _, _ in locations}
+
+    def _locate(self, wish_id):
+        return self._conn().execute(
+            "SELECT month, offset, length FROM archived WHERE wish_id = ?", (wish_id,)
+        ).fetchone()
+
+    def lookup(self, wish_id):
+        """(record, location) of an archived wish, or (None, None)."""
+        location = self._locate(wish_id)
+        if location is None:
+            return None, None
+        month, offset, length = location
+        try:
+            with open(self._file(month), 'rb') as f:
+                f.seek(offset)
+                member = gzip.decompress(f.read(length))
+        except Exception as e:
+            print(f"archive read error: {e}")
+            return None, None
+        for line in member.splitlines():
+            record = json.loads(line)
+            if record.pop('wish_id') == wish_id:
+                return record, location
+        return None, None
+
+    def get_record(self, wish_id):
+        """Exported record of an archived wish, or None."""
+        return self.lookup(wish_id)[0]
+
+    def contains(self, wish_id):
+        return self._locate(wish_id) is not None
+
+    def forget(self, wish_id, location=None):
+        """Drop wish_id from the index (only if still at location, when given)."""
+        if location is None:
+            self._conn().execute("DELETE FROM archived WHERE wish_id = ?", (wish_id,))
+        else:
+            self._conn().execute(
+                "DELETE FROM archived WHERE wish_id = ? AND month = ? AND offset = ?",
+                (wish_id, location[0], location[1])
+            )
+
+    def stats(self):
+        files = [name for name in os.listdir(self.root) if name.endswith('.jsonl.gz')]
+        return {
+            'archived_wishes': self._conn().execute("SELECT COUNT(*) FROM archived").fetchone()[0],
+            'files': len(files),
+            'bytes': sum(os.path.getsize(os.path.join(self.root, name)) for name in files),
+        }
+
+
+def archive_idle_wishes(store, archive, ttl_seconds, now=None, batch_size=500):
+    """Move wishes idle for longer than ttl_seconds from store to archive; returns how many moved."""
+    cutoff = (time.time() if now is None else now) - ttl_seconds
+    moved = 0
+    while True:
+        wish_ids = store.idle_wish_ids(cutoff, limit=batch_size)
+        if not wish_ids:
+            return moved
+        records = store.export_wishes(wish_ids)
+        written = archive.write(records)
+        # Wishes supported since the export keep their newer hot copy. A wish
+        # that is gone was archived by a concurrent sweep, whose index entry
+        # (or ours, with the same record) must stay.
+        deleted = set(store.delete_wishes({wish_id: r['version'] for wish_id, r in records.items()}))
+        for wish_id in records:
+            if wish_id not in deleted and store.get(wish_id) is not None:
+                archive.forget(wish_id, written[wish_id])
+        moved += len(deleted)
+        if not deleted:
+            return moved
+
+
+def _public_record(record):
+    return {k: v for k, v in record.items() if k not in ('supporters', 'supporter_bloom')}
+
+
+class ArchivingStore(WishStore):
+    """Serves archived wishes from cold storage and restores them on write."""
+
+    def __init__(self, store, archive=None, ttl_days=TTL_DAYS, interval=ARCHIVE_INTERVAL):
+        self.store = store
+        self.archive = archive or WishArchive()
+        self.ttl_seconds = float(ttl_days) * DAY
+        self._stop = threading.Event()
+        if self.ttl_seconds > 0 and interval and interval > 0:
+            threading.Thread(
+                target=self._sweep_loop, args=(interval,), name="wish-archiver", daemon=True
+            ).start()
+
+    def _restore(self, wish_id):
+        """Bring an archived wish back to the hot store; False if it is not archived."""
+        record, location = self.archive.lookup(wish_id)
+        if record is None:
+            return False
+        self.store.restore_wish(wish_id, record)
+        self.archive.forget(wish_id, location)
+        return True
+
+    def get(self, wish_id):
+        record = self.store.get(wish_id)
+        if record is not None:
+            return record
+        record = self.archive.get_record(wish_id)
+        return _public_record(record) if record is not None else None
+
+    def create_or_update(self, wish_id, wish_text, initial_probability):
+        if self.store.get(wish_id) is None:
+            self._restore(wish_id)
+        return self.store.create_or_update(wish_id, wish_text, initial_probability)
+
+    def create(self, wish_id, wish_text, initial_probability):
+        if self.archive.contains(wish_id):
+            return None
+        return self.store.create(wish_id, wish_text, initial_probability)
+
+    def wish_ids_between(self, start_time, end_time, limit=None):
+        return self.store.wish_ids_between(start_time, end_time, limit)
+
+    def top_wishes(self, metric, limit):
+        # Archived wishes have been idle for the whole TTL; the ranking covers the hot store
+        return self.store.top_wishes(metric, limit)
+
+    def updated_wishes(self, since):
+        return self.store.updated_wishes(since)
+
+    def add_support(self, wish_id, increment, supporter_id, expected_version=None):
+        success, probability = self.store.add_support(wish_id, increment, supporter_id, expected_version)
+        if not success and probability is None and self._restore(wish_id):
+            return self.store.add_support(wish_id, increment, supporter_id, expected_version)
+        return success, probability
+
+    def add_support_batch(self, wish_id, supports):
+        accepted = self.store.add_support_batch(wish_id, supports)
+        if not accepted and self._restore(wish_id):
+            return self.store.add_support_batch(wish_id, supports)
+        return accepted
+
+    def has_supporter(self, wish_id, supporter_id):
+        if self.store.get(wish_id) is not None:
+            return self.store.has_supporter(wish_id, supporter_id)
+        record = self.archive.get_record(wish_id)
+        if record is None:
+            return False
+        bloom = record.get('supporter_bloom')
+        if bloom is not None:
+            bits = base64.b64decode(bloom['bits'])
+            if supporter_key(supporter_id) in BloomFilter(bloom['capacity'], bloom['error_rate'], bits):
+                return True
+        return supporter_key_hex(supporter_id) in record.get('supporters', [])
+
+    def get_sentiment(self, wish_text, scorer):
+        return self.store.get_sentiment(wish_text, scorer)
+
+    def put_sentiment(self, wish_text, scorer, label, score):
+        self.store.put_sentiment(wish_text, scorer, label, score)
+
+    def data_version(self):
+        # Archiving and restoring both change the hot store, so its version covers them
+        return self.store.data_version()
+
+    def archive_idle(self, now=None):
+        """Run one retention sweep; returns how many wishes moved to the archive."""
+        return archive_idle_wishes(self.store, self.archive, self.ttl_seconds, now)
+
+    def _sweep_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.archive_idle()
+            except Exception as e:
+                print(f"archive sweep error: {e}")
+
+    def close(self):
+        self._stop.set()
+        self.store.close()
+
+
+def main(argv=None):
+    import argparse
+
+    from wish_store import open_store
+
+    parser = argparse.ArgumentParser(description="Move idle wishes to the cold archive.")
+    parser.add_argument('--ttl-days', type=float, default=TTL_DAYS or 90.0)
+    parser.add_argument('--backend', default=None, help="sqlite, json or events (default: WISH_STORE_BACKEND)")
+    parser.add_argument('--path', default=None, help="store path (default: WISH_STORE_PATH)")
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR)
+    args = parser.parse_args(argv)
+
+    store = open_store(args.backend, args.path, write_behind=False, archive_ttl_days=0)
+    archive = WishArchive(args.archive_dir)
+    started = time.perf_counter()
+    moved = archive_idle_wishes(store, archive, args.ttl_days * DAY)
+    store.close()
+    print(f"archived {moved} wishes idle for more than {args.ttl_days:g} days "
+          f"in {time.perf_counter() - started:.2f}s; archive now {archive.stats()}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+"""Pre-rendered greeting audio for the shared-wish page.
+
+Audio is keyed by (message, language) and synthesised at most once per
+deployment: rendered files live in ``assets/audio`` and are held in memory
+after the first read. Page renders only ever read; a missing file is rendered
+in a background thread (or ahead of time with ``python wish_audio.py``).
+"""
+import functools
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+from wish_metrics import inc, timed
+
+SHARED_GREETING = "Merry Xmas! I just made a wish for 2026. Please share your luck and help make my wish come true!"
+
+AUDIO_DIR = os.environ.get('WISH_AUDIO_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'audio'))
+# Served when nothing has been rendered yet, e.g. offline deployments; the committed one is half a second of silence
+AUDIO_STUB = os.environ.get('WISH_AUDIO_STUB', os.path.join(AUDIO_DIR, 'stub.mp3'))
+
+_FORMATS = {'.mp3': 'audio/mp3', '.wav': 'audio/wav', '.ogg': 'audio/ogg'}
+
+# Seconds to wait before retrying a failed background render
+RETRY_AFTER = 300
+
+_memory = {}
+_pending = set()
+_failed_at = {}
+_lock = threading.Lock()
+
+
+def audio_path(message, lang='en'):
+    """On-disk location of the rendered audio for (message, lang)."""
+    key = hashlib.sha256(f"{lang}\0{message}".encode()).hexdigest()[:16]
+    return os.path.join(AUDIO_DIR, f"{lang}_{key}.mp3")
+
+
+def synthesize(message, lang='en'):
+    """Render message with gTTS (network call); returns mp3 bytes."""
+    # Imported here so page renders never pay for gTTS and its requests stack
+    from gtts import gTTS
+
+    audio_bytes = BytesIO()
+    with timed('wish_tts_synthesize_seconds', lang=lang):
+        gTTS(text=message, lang=lang).write_to_fp(audio_bytes)
+    return audio_bytes.getvalue()
+
+
+def render_audio(message, lang='en'):
+    """Synthesise and store the audio for (message, lang); returns the bytes."""
+    data = synthesize(message, lang)
+    path = audio_path(message, lang)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.audio_', dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    inc('wish_tts_written_bytes_total', len(data))
+    with _lock:
+        _memory[(message, lang)] = (data, 'audio/mp3')
+    return data
+
+
+def _render_in_background(message, lang):
+    with _lock:
+        if (message, lang) in _pending:
+            return
+        if time.time() - _failed_at.get((message, lang), 0) < RETRY_AFTER:
+            return
+        _pending.add((message, lang))
+
+    def run():
+        try:
+            render_audio(message, lang)
+        except Exception as e:
+            inc('wish_tts_errors_total')
+            print(f"render_audio error: {e}")
+            with _lock:
+                _failed_at[(message, lang)] = time.time()
+        finally:
+            with _lock:
+                _pending.discard((message, lang))
+
+    threading.Thread(target=run, name="wish-audio-render", daemon=True).start()
+
+
+@functools.lru_cache(maxsize=None)
+def _read_stub(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read(), _FORMATS.get(os.path.splitext(path)[1].lower(), 'audio/mp3')
+
+
+def get_greeting_audio(message=SHARED_GREETING, lang='en', render_missing=True, stub=True):
+    """Return (audio_bytes, format) without synthesising on the caller's thread.
+
+    Looks in memory, then on disk, then falls back to the stub file unless
+    stub is False. Returns (None, None) when no audio is available yet.
+    """
+    with _lock:
+        cached = _memory.get((message, lang))
+    if cached is not None:
+        inc('wish_audio_cache_requests_total', result='hit')
+        return cached
+
+    with timed('wish_audio_load_seconds'):
+        path = audio_path(message, lang)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                cached = (f.read(), 'audio/mp3')
+            with _lock:
+                _memory[(message, lang)] = cached
+            inc('wish_audio_cache_requests_total', result='disk')
+            inc('wish_audio_read_bytes_total', len(cached[0]))
+            return cached
+
+        if render_missing:
+            _render_in_background(message, lang)
+        inc('wish_audio_cache_requests_total', result='miss')
+        return (_read_stub(AUDIO_STUB) if stub else None) or (None, None)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-render greeting audio into assets/audio.")
+    parser.add_argument('message', nargs='?', default=SHARED_GREETING)
+    parser.add_argument('--lang', default='en')
+    args = parser.parse_args(argv)
+    try:
+        data = render_audio(args.message, args.lang)
+    except Exception as e:
+        print(f"render_audio error: {e}", file=sys.stderr)
+        return 1
+    print(f"{audio_path(args.message, args.lang)} ({len(data)} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Process-wide read cache for wish records."""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from wish_metrics import inc
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('WISH_CACHE_SIZE', '1024'))
+# Seconds an entry validated only by change notifications is trusted; 0 for no limit
+NOTIFIED_MAX_AGE = float(os.environ.get('WISH_CACHE_NOTIFIED_MAX_AGE', '60'))
+
+
+class WishCache:
+    """LRU of wish records, revalidated against the store's data version.
+
+    A lookup costs one ``store.data_version()`` call (a stat for the JSON
+    store, a single-row read for SQLite); the record itself is only re-read
+    when the version moved since it was cached. A cache that follows a
+    wish_pubsub Notifier skips that call while the notifier is connected and
+    drops entries as change notifications arrive instead; as a backstop for
+    notifications that never arrive, such entries are re-read after at most
+    ``notified_max_age`` seconds.
+    """
+
+    def __init__(self, store, max_entries=DEFAULT_MAX_ENTRIES, notified_max_age=NOTIFIED_MAX_AGE):
+        self.store = store
+        self.max_entries = max(1, int(max_entries))
+        self.notified_max_age = float(notified_max_age)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._notifier = None
+        # Bumped by every invalidation, so a read that raced one is not cached
+        self._invalidations = 0
+
+    def follow(self, notifier):
+        """Trust notifier's change notifications instead of checking the data version."""
+        notifier.subscribe(lambda wish_id, version: self.invalidate(wish_id))
+        self._notifier = notifier
+
+    def _version(self):
+        notifier = self._notifier
+        if notifier is not None and notifier.connected:
+            if self.notified_max_age > 0:
+                return ('notified', notifier.generation, int(time.monotonic() // self.notified_max_age))
+            return ('notified', notifier.generation)
+        return self.store.data_version()
+
+    def get(self, wish_id):
+        """Return a copy of the wish record, or None."""
+        version = self._version()
+        if version is None:
+            # Nothing to validate against: read through
+            inc('wish_cache_requests_total', result='bypass')
+            return self.store.get(wish_id)
+        with self._lock:
+            entry = self._entries.get(wish_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(wish_id)
+                self.hits += 1
+                inc('wish_cache_requests_total', result='hit')
+                return dict(entry[1]) if entry[1] is not None else None
+            self.misses += 1
+            invalidations = self._invalidations
+        inc('wish_cache_requests_total', result='miss')
+
+        record = self.store.get(wish_id)
+        with self._lock:
+            if invalidations != self._invalidations:
+                return dict(record) if record is not None else None
+            self._entries[wish_id] = (version, record)
+            self._entries.move_to_end(wish_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return dict(record) if record is not None else None
+
+    def invalidate(self, wish_id=None):
+        """Drop one entry, or everything when wish_id is None."""
+        with self._lock:
+            self._invalidations += 1
+            if wish_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(wish_id, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
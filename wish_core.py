@@ -0,0 +1,174 @@
+"""Wish logic shared by every front end.
+
+Storage helpers, scoring, IDs and share links, with no Streamlit and no work
+at import time: the store is opened on first use. The Streamlit page, the
+HTTP API, workers and benchmarks all import this module.
+"""
+import random
+import threading
+import urllib.parse
+
+from wish_cache import WishCache
+from wish_ids import new_wish_id
+from wish_leaderboard import Leaderboard
+from wish_metrics import inc, timed
+from wish_model import evaluate_wish
+from wish_pubsub import get_notifier
+from wish_ratelimit import (  # noqa: F401  (re-exported)
+    RateLimited, SupportLimiter, client_address, client_fingerprint, client_key,
+)
+from wish_sentiment import evaluate_wish_sentiment  # noqa: F401  (re-exported)
+from wish_store import MAX_PROBABILITY, get_store
+
+SHARE_BASE_URL = "https://2026christmas-yourwish-mywish-elena.streamlit.app"
+
+_wish_cache = None
+_leaderboard = None
+_support_limiter = None
+_singleton_lock = threading.Lock()
+
+
+# ---------------------------
+# Storage helpers
+# ---------------------------
+def get_wish_cache():
+    """Wish read cache shared by everything in this process."""
+    global _wish_cache
+    if _wish_cache is None:
+        with _singleton_lock:
+            if _wish_cache is None:
+                cache = WishCache(get_store())
+                notifier = get_notifier()
+                if notifier is not None:
+                    cache.follow(notifier)
+                _wish_cache = cache
+    return _wish_cache
+
+
+def get_leaderboard():
+    """Top-wish lists shared by everything in this process."""
+    global _leaderboard
+    if _leaderboard is None:
+        with _singleton_lock:
+            if _leaderboard is None:
+                board = Leaderboard(get_store())
+                notifier = get_notifier()
+                if notifier is not None:
+                    # Other replicas' writes; anything missed while disconnected comes with the next refresh
+                    notifier.subscribe(lambda wish_id, version: wish_id and board.touch(wish_id))
+                _leaderboard = board
+    return _leaderboard
+
+
+def get_support_limiter():
+    """Support rate limits shared by everything in this process."""
+    global _support_limiter
+    if _support_limiter is None:
+        with _singleton_lock:
+            if _support_limiter is None:
+                _support_limiter = SupportLimiter()
+    return _support_limiter
+
+
+def get_wish_data(wish_id):
+    """Get wish data."""
+    return get_wish_cache().get(wish_id)
+
+
+def create_or_update_wish(wish_id, wish_text, initial_probability):
+    """Create or update a wish in shared storage."""
+    wish_data = get_store().create_or_update(wish_id, wish_text, initial_probability)
+    get_leaderboard().update(wish_id, wish_data)
+    return wish_data
+
+
+def create_new_wish(wish_text, initial_probability, attempts=5):
+    """Store a new wish under a fresh unique ID; returns (wish_id, wish_data)."""
+    for _ in range(attempts):
+        wish_id = generate_wish_id(wish_text)
+        wish_data = get_store().create(wish_id, wish_text, initial_probability)
+        if wish_data is not None:
+            get_leaderboard().update(wish_id, wish_data)
+            return wish_id, wish_data
+    raise RuntimeError("could not allocate a unique wish ID")
+
+
+def update_wish_probability(wish_id, increment, supporter_id, client=None):
+    """Update wish probability in shared storage.
+
+    With client (a client_key) the support first passes the rate
+    limits and raises RateLimited, without touching storage, if over them.
+    """
+    if client is not None:
+        get_support_limiter().check(client, wish_id)
+    with timed('wish_support_seconds'):
+        success, probability = get_store().add_support(wish_id, increment, supporter_id)
+    inc('wish_supports_total', result='accepted' if success else 'rejected')
+    if success:
+        # Write-behind supports are announced only once flushed; show them here now
+        get_wish_cache().invalidate(wish_id)
+        get_leaderboard().touch(wish_id)
+    return success, probability
+
+
+def top_wishes(metric, limit=10):
+    """Leaderboard: the best ``limit`` wishes by 'supporters' or 'probability'."""
+    return get_leaderboard().top(metric, limit)
+
+
+# ---------------------------
+# Scoring
+# ---------------------------
+def score_wish(wish_text):
+    """(label, score) for a new wish, remembering model results in the store."""
+    return evaluate_wish(wish_text, memo=get_store())
+
+
+def initial_probability_for(score):
+    """Starting probability of a wish that scored POSITIVE."""
+    return float(60.0 + (score * 20))
+
+
+# ---------------------------
+# Utilities
+# ---------------------------
+def get_random_increment():
+    return round(random.uniform(1.0, 10.0), 1)
+
+
+def generate_wish_id(wish_text=None):
+    """Time-ordered ID; uniqueness is enforced when the wish is stored."""
+    return new_wish_id()
+
+
+def create_share_link(wish_id, wish_text, probability):
+    """Create shareable link."""
+    short_wish = wish_text[:80]
+    clean_wish = short_wish.replace('\n', ' ').replace('\r', ' ').replace('"', "'").replace('  ', ' ')
+    encoded_wish = urllib.parse.quote_plus(clean_wish)
+    prob_val = f"&prob={float(probability):.1f}"
+    full_url = f"{SHARE_BASE_URL}/?wish_id={wish_id}&wish={encoded_wish}{prob_val}"
+    return full_url.strip()
+
+
+def safe_decode_wish(encoded_wish):
+    """Safely decode wish text from URL param."""
+    try:
+        decoded = urllib.parse.unquote_plus(encoded_wish)
+        return decoded
+    except Exception:
+        try:
+            return urllib.parse.unquote(encoded_wish)
+        except Exception:
+            return encoded_wish
+
+
+def parse_probability(prob_param):
+    """Probability from a share link's ``prob`` parameter, or None if unusable."""
+    if not prob_param:
+        return None
+    try:
+        cleaned = str(prob_param).strip().rstrip('%').replace(',', '')
+        return max(0.0, min(MAX_PROBABILITY, float(cleaned)))
+    except Exception:
+        return None
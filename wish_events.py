@@ -0,0 +1,451 @@
+"""Sharded append-only event log store.
+
+Every change is one JSON line appended to the log of the wish's shard, so a
+support click is an O(1) append that never touches other shards:
+
+    {"e": "create", "w": wish_id, "text": ..., "p": initial_probability, "ts": ...}
+    {"e": "support", "w": wish_id, "s": supporter_hash, "inc": increment, "ts": ...}
+    {"e": "drop", "w": wish_id, "v": version}          (moved to the archive)
+    {"e": "restore", "w": wish_id, "r": exported_record}
+    {"e": "log", "id": log_id}                         (first line of a rotated log)
+
+Each process folds the logs into in-memory per-shard views, reading only
+bytes it has not seen yet. A background compactor periodically writes those
+views out as snapshots, so a restart replays only the tail of each log.
+Once a log grows past ROTATE_BYTES the compactor snapshots it and swaps in a
+fresh log; other processes notice the new file and reload the snapshot.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from wish_ids import is_time_ordered_id, wish_id_bounds
+from wish_store import DATA_DIR, MAX_PROBABILITY, VersionConflict, WishStore, locked_file, top_records
+from wish_supporters import supporter_key_hex
+
+EVENTS_DIR = os.path.join(DATA_DIR, "wishes_events")
+COMPACT_INTERVAL = float(os.environ.get('WISH_COMPACT_INTERVAL', '30'))
+ROTATE_BYTES = int(os.environ.get('WISH_LOG_ROTATE_BYTES', str(1 << 20)))
+
+
+def shard_of(wish_id, shard_chars=2):
+    """Shard name: hex prefix of the hashed wish id (256 shards by default)."""
+    return hashlib.blake2b(wish_id.encode(), digest_size=4).hexdigest()[:shard_chars]
+
+
+def fold_event(wishes, event):
+    """Apply one event to a shard's wish records; returns True if it changed them."""
+    if event['e'] == 'log':
+        return False
+    wish_id = event['w']
+    wish = wishes.get(wish_id)
+    if event['e'] == 'create':
+        if wish is None:
+            prob = float(event['p'])
+            wishes[wish_id] = {
+                'wish_text': event['text'],
+                'initial_probability': prob,
+                'current_probability': prob,
+                'total_luck_added': 0.0,
+                'supporters_count': 0,
+                'created_at': event['ts'],
+                'last_updated': event['ts'],
+                'version': 1,
+                'supporter_keys': set(),
+            }
+        else:
+            wish['wish_text'] = event['text']
+            wish['last_updated'] = event['ts']
+        return True
+    if event['e'] == 'support':
+        # Duplicates (e.g. from a crashed writer retrying) are dropped here
+        if wish is None or event['s'] in wish['supporter_keys']:
+            return False
+        wish['supporter_keys'].add(event['s'])
+        wish['current_probability'] = min(MAX_PROBABILITY, wish['current_probability'] + float(event['inc']))
+        wish['total_luck_added'] += float(event['inc'])
+        wish['supporters_count'] += 1
+        wish['last_updated'] = event['ts']
+        wish['version'] += 1
+        return True
+    if event['e'] == 'drop':
+        if wish is None or wish['version'] != event['v']:
+            return False
+        del wishes[wish_id]
+        return True
+    if event['e'] == 'restore':
+        if wish is not None:
+            return False
+        record = event['r']
+        wishes[wish_id] = {
+            'wish_text': record['wish_text'],
+            'initial_probability': float(record['initial_probability']),
+            'current_probability': float(record['current_probability']),
+            'total_luck_added': float(record['total_luck_added']),
+            'supporters_count': int(record['supporters_count']),
+            'created_at': record['created_at'],
+            'last_updated': record['last_updated'],
+            'version': int(record['version']),
+            'supporter_keys': set(record.get('supporters', [])),
+        }
+        return True
+    return False
+
+
+def _log_header(log_id):
+    return (json.dumps({'e': 'log', 'id': log_id}, separators=(',', ':')) + '\n').encode()
+
+
+_HEADER_LEN = len(_log_header('0' * 16))
+
+
+def _log_id(head):
+    """Id from the first bytes of a log, or None for a log that was never rotated."""
+    if len(head) < _HEADER_LEN:
+        return None
+    try:
+        event = json.loads(head[:_HEADER_LEN])
+    except ValueError:
+        return None
+    return event.get('id') if isinstance(event, dict) and event.get('e') == 'log' else None
+
+
+def _write_durably(path, data):
+    """Atomically replace path with data, fsynced before the rename."""
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class _ShardView:
+    """Materialised state of one shard: snapshot plus folded log tail."""
+
+    def __init__(self, log_path, snapshot_path):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.log_id = None
+        self.offset = 0
+        self.snapshot_offset = 0
+        self.wishes = {}
+
+    def _read_snapshot(self):
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"snapshot load error: {e}")
+            return None
+        for wish in data['wishes'].values():
+            wish['supporter_keys'] = set(wish['supporter_keys'])
+        return data
+
+    def _reload(self, log_id):
+        """Start over from the snapshot matching the log with log_id; False to retry later."""
+        data = self._read_snapshot()
+        wishes, offset = {}, 0
+        if data is not None:
+            if data.get('log') == log_id:
+                offset = data['offset']
+            elif data.get('prev') and data['prev'][0] == log_id:
+                # The snapshot was written just before this log was to be swapped out
+                offset = data['prev'][1]
+            elif self._current_log_id() != log_id:
+                return False
+            else:
+                print(f"snapshot {self.snapshot_path} does not match its log, replaying the whole log")
+            wishes = data['wishes']
+        self.wishes = wishes
+        self.offset = self.snapshot_offset = offset
+        self.log_id = log_id
+        self.loaded = True
+        return True
+
+    def _current_log_id(self):
+        try:
+            with open(self.log_path, 'rb') as f:
+                return _log_id(f.read(_HEADER_LEN))
+        except FileNotFoundError:
+            return None
+
+    def catch_up(self):
+        """Fold log bytes appended since the last call."""
+        with self.lock:
+            try:
+                f = open(self.log_path, 'rb')
+            except FileNotFoundError:
+                return
+            with f:
+                # Another id means the log was rotated, possibly by another process
+                log_id = _log_id(f.read(_HEADER_LEN))
+                if (not self.loaded or log_id != self.log_id) and not self._reload(log_id):
+                    return
+                size = os.fstat(f.fileno()).st_size
+                if size <= self.offset:
+                    return
+                f.seek(self.offset)
+                chunk = f.read(size - self.offset)
+            # Only complete lines; a writer may be mid-append
+            end = chunk.rfind(b'\n') + 1
+            for line in chunk[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError as e:
+                    print(f"event log error: skipping corrupt line in {self.log_path}: {e}")
+                    continue
+                fold_event(self.wishes, event)
+            self.offset += end
+
+    def compact(self, rotate_bytes=ROTATE_BYTES):
+        """Snapshot the view if it moved past the last snapshot.
+
+        Once the log holds rotate_bytes or more it is replaced by an empty
+        one, so the snapshot becomes the only copy of those events. Runs
+        under the shard's file lock, so nothing is appended meanwhile.
+        """
+        with locked_file(self.log_path):
+            self.catch_up()
+            with self.lock:
+                if self.offset == self.snapshot_offset:
+                    return False
+                data = {
+                    'log': self.log_id,
+                    'offset': self.offset,
+                    'wishes': {
+                        wish_id: dict(wish, supporter_keys=sorted(wish['supporter_keys']))
+                        for wish_id, wish in self.wishes.items()
+                    },
+                }
+            if not rotate_bytes or data['offset'] < rotate_bytes:
+                _write_durably(self.snapshot_path, json.dumps(data, separators=(',', ':')).encode())
+                with self.lock:
+                    self.snapshot_offset = data['offset']
+                return True
+
+            log_id = os.urandom(8).hex()
+            header = _log_header(log_id)
+            # Snapshot first: after a crash before the swap, 'prev' still matches the old log
+            data['prev'] = [data['log'], data['offset']]
+            data['log'], data['offset'] = log_id, len(header)
+            _write_durably(self.snapshot_path, json.dumps(data, separators=(',', ':')).encode())
+            _write_durably(self.log_path, header)
+            with self.lock:
+                self.log_id = log_id
+                self.offset = self.snapshot_offset = len(header)
+            return True
+
+
+class EventLogWishStore(WishStore):
+    """Wish store backed by sharded append-only event logs."""
+
+    def __init__(self, root=EVENTS_DIR, compact_interval=COMPACT_INTERVAL):
+        self.root = root
+        os.makedirs(os.path.join(root, 'log'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'snapshots'), exist_ok=True)
+        self._views = {}
+        self._views_lock = threading.Lock()
+        self._stop = threading.Event()
+        if compact_interval and compact_interval > 0:
+            threading.Thread(
+                target=self._compact_loop, args=(compact_interval,), name="wish-compactor", daemon=True
+            ).start()
+
+    def _view(self, wish_id):
+        return self._shard_view(shard_of(wish_id))
+
+    def _shard_view(self, shard):
+        view = self._views.get(shard)
+        if view is None:
+            with self._views_lock:
+                view = self._views.get(shard)
+                if view is None:
+                    view = _ShardView(
+                        os.path.join(self.root, 'log', f"{shard}.jsonl"),
+                        os.path.join(self.root, 'snapshots', f"{shard}.json"),
+                    )
+                    self._views[shard] = view
+        return view
+
+    def _append(self, view, event):
+        line = (json.dumps(event, separators=(',', ':')) + '\n').encode()
+        fd = os.open(view.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def get(self, wish_id):
+        view = self._view(wish_id)
+        view.catch_up()
+        with view.lock:
+            wish = view.wishes.get(wish_id)
+            return _public_record(wish) if wish else None
+
+    def create_or_update(self, wish_id, wish_text, initial_probability):
+        view = self._view(wish_id)
+        with locked_file(view.log_path):
+            self._append(view, {'e': 'create', 'w': wish_id, 'text': wish_text,
+                                'p': float(initial_probability), 'ts': time.time()})
+            view.catch_up()
+        return self.get(wish_id)
+
+    def create(self, wish_id, wish_text, initial_probability):
+        view = self._view(wish_id)
+        with locked_file(view.log_path):
+            view.catch_up()
+            with view.lock:
+                if wish_id in view.wishes:
+                    return None
+            self._append(view, {'e': 'create', 'w': wish_id, 'text': wish_text,
+                                'p': float(initial_probability), 'ts': time.time()})
+            view.catch_up()
+        return self.get(wish_id)
+
+    def _all_views(self):
+        """Every shard with a log on disk, caught up."""
+        views = []
+        for name in os.listdir(os.path.join(self.root, 'log')):
+            if name.endswith('.jsonl'):
+                view = self._shard_view(name[:-len('.jsonl')])
+                view.catch_up()
+                views.append(view)
+        return views
+
+    def wish_ids_between(self, start_time, end_time, limit=None):
+        # Shards are keyed by hash, not time, so every shard has to be looked at
+        lo, hi = wish_id_bounds(start_time, end_time)
+        ids = []
+        for view in self._all_views():
+            with view.lock:
+                ids.extend(w for w in view.wishes if is_time_ordered_id(w) and lo <= w <= hi)
+        ids.sort()
+        return ids[:limit] if limit is not None else ids
+
+    def idle_wish_ids(self, before, limit=None):
+        idle = []
+        for view in self._all_views():
+            with view.lock:
+                idle.extend((w['last_updated'], wish_id) for wish_id, w in view.wishes.items() if w['last_updated'] < before)
+        idle.sort()
+        return [wish_id for _, wish_id in idle[:limit]] if limit is not None else [wish_id for _, wish_id in idle]
+
+    def top_wishes(self, metric, limit):
+        best = []
+        for view in self._all_views():
+            with view.lock:
+                # Each shard's winners are copied under its lock, then ranked together
+                best.extend((w, _public_record(wish)) for w, wish in top_records(view.wishes.items(), metric, limit))
+        return top_records(best, metric, limit)
+
+    def updated_wishes(self, since):
+        updated = []
+        for view in self._all_views():
+            with view.lock:
+                updated.extend(
+                    (wish_id, _public_record(wish)) for wish_id, wish in view.wishes.items()
+                    if wish['last_updated'] >= since
+                )
+        return updated
+
+    def export_wishes(self, wish_ids):
+        records = {}
+        for wish_id in wish_ids:
+            view = self._view(wish_id)
+            view.catch_up()
+            with view.lock:
+                wish = view.wishes.get(wish_id)
+                if wish is not None:
+                    records[wish_id] = dict(_public_record(wish), supporters=sorted(wish['supporter_keys']))
+        return records
+
+    def delete_wishes(self, versions):
+        deleted = []
+        for wish_id, version in versions.items():
+            view = self._view(wish_id)
+            with locked_file(view.log_path):
+                view.catch_up()
+                with view.lock:
+                    wish = view.wishes.get(wish_id)
+                    if wish is None or wish['version'] != version:
+                        continue
+                self._append(view, {'e': 'drop', 'w': wish_id, 'v': version})
+                view.catch_up()
+                deleted.append(wish_id)
+        return deleted
+
+    def restore_wish(self, wish_id, record):
+        view = self._view(wish_id)
+        with locked_file(view.log_path):
+            view.catch_up()
+            with view.lock:
+                if wish_id in view.wishes:
+                    return False
+            record = {k: v for k, v in record.items() if k != 'supporter_bloom'}
+            self._append(view, {'e': 'restore', 'w': wish_id, 'r': record})
+            view.catch_up()
+        return True
+
+    def add_support(self, wish_id, increment, supporter_id, expected_version=None):
+        view = self._view(wish_id)
+        key = supporter_key_hex(supporter_id)
+        # The shard lock makes check-then-append atomic across processes
+        with locked_file(view.log_path):
+            view.catch_up()
+            with view.lock:
+                wish = view.wishes.get(wish_id)
+                if wish is None:
+                    return False, None
+                if expected_version is not None and wish['version'] != expected_version:
+                    raise VersionConflict(wish_id, expected_version, wish['version'])
+                if key in wish['supporter_keys']:
+                    return False, wish['current_probability']
+            self._append(view, {'e': 'support', 'w': wish_id, 's': key,
+                                'inc': float(increment), 'ts': time.time()})
+            view.catch_up()
+            with view.lock:
+                return True, view.wishes[wish_id]['current_probability']
+
+    def has_supporter(self, wish_id, supporter_id):
+        view = self._view(wish_id)
+        view.catch_up()
+        with view.lock:
+            wish = view.wishes.get(wish_id)
+            return bool(wish) and supporter_key_hex(supporter_id) in wish['supporter_keys']
+
+    def data_version(self):
+        # Appends from other processes are only seen by reading the shard,
+        # so per-record caching is left to the views themselves
+        return None
+
+    def compact(self):
+        """Fold every loaded shard and write its snapshot; returns shards written."""
+        written = 0
+        for view in list(self._views.values()):
+            try:
+                written += view.compact()
+            except Exception as e:
+                print(f"compaction error: {e}")
+        return written
+
+    def _compact_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.compact()
+
+    def close(self):
+        self._stop.set()
+        self.compact()
+
+
+def _public_record(wish):
+    return {k: v for k, v in wish.items() if k != 'supporter_keys'}
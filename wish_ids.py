@@ -0,0 +1,68 @@
+"""Time-ordered wish IDs.
+
+An ID is 80 bits: a 48-bit millisecond timestamp followed by 32 random
+bits, written as 16 Crockford base32 characters. IDs therefore sort by
+creation time, both as strings and in a store's primary-key index. Within
+one process IDs are strictly increasing (the random part is incremented
+inside a millisecond), so a process never repeats itself. Uniqueness across
+processes comes from the store: WishStore.create refuses an ID that already
+exists and the caller simply draws another one.
+"""
+import base64
+import os
+import threading
+import time
+
+ID_LENGTH = 16
+_RANDOM_BITS = 32
+_ALPHABET = b"0123456789abcdefghjkmnpqrstvwxyz"
+# base64's base32 alphabet is not in ASCII order; map it onto Crockford's, which is
+_TO_CROCKFORD = bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ234567", _ALPHABET)
+_FROM_CROCKFORD = bytes.maketrans(_ALPHABET, b"ABCDEFGHIJKLMNOPQRSTUVWXYZ234567")
+
+_lock = threading.Lock()
+_last = [0, 0]  # [millisecond, random part] of the previous ID
+
+
+def _encode(value):
+    return base64.b32encode(value.to_bytes(10, 'big')).translate(_TO_CROCKFORD).decode()
+
+
+def _decode(wish_id):
+    return int.from_bytes(base64.b32decode(wish_id.encode().translate(_FROM_CROCKFORD)), 'big')
+
+
+def new_wish_id(now=None):
+    """Return a new time-ordered wish ID."""
+    ms = int((time.time() if now is None else now) * 1000)
+    with _lock:
+        if ms <= _last[0]:
+            # Same (or earlier, if the clock stepped back) millisecond: keep order
+            ms, rand = _last[0], _last[1] + 1
+            if rand >> _RANDOM_BITS:
+                ms, rand = ms + 1, int.from_bytes(os.urandom(4), 'big') >> 1
+        else:
+            # Top bit clear leaves room to increment within the millisecond
+            rand = int.from_bytes(os.urandom(4), 'big') >> 1
+        _last[0], _last[1] = ms, rand
+    return _encode((ms << _RANDOM_BITS) | rand)
+
+
+def is_time_ordered_id(wish_id):
+    """Whether wish_id was produced by new_wish_id (older IDs are md5 prefixes)."""
+    return (
+        isinstance(wish_id, str) and len(wish_id) == ID_LENGTH
+        and all(c in _ALPHABET.decode() for c in wish_id)
+    )
+
+
+def wish_id_time(wish_id):
+    """Creation time (seconds) encoded in a time-ordered ID."""
+    return (_decode(wish_id) >> _RANDOM_BITS) / 1000.0
+
+
+def wish_id_bounds(start_time, end_time):
+    """Smallest and largest IDs created in [start_time, end_time]."""
+    lo = int(start_time * 1000) << _RANDOM_BITS
+    hi = (int(end_time * 1000) << _RANDOM_BITS) | ((1 << _RANDOM_BITS) - 1)
+    return _encode(lo), _encode(hi)
@@ -0,0 +1,139 @@
+"""Leaderboard of the most supported and most likely wishes.
+
+For each metric a Leaderboard keeps the best LEADERBOARD_SIZE wishes in a
+sorted list, so a top-K query is a slice of that list. It is seeded once
+from ``store.top_wishes`` and then maintained incrementally by wish_core:
+created wishes are placed straight away, supported wishes are marked dirty
+(a set insert, so the support path does no extra read) and re-read once each
+before the next query. Supporting a wish only ever raises its numbers, so a
+wish outside the bounded list can only enter it through a change the board
+hears about.
+
+Writes made by other processes are merged in at most LEADERBOARD_REFRESH
+seconds later from ``store.updated_wishes``, which reads only what changed
+(the last_updated index on SQLite). The same query replaces the per-wish
+re-reads when more than DIRTY_LIMIT wishes are dirty.
+"""
+import bisect
+import os
+import threading
+import time
+
+from wish_store import LEADERBOARD_METRICS
+
+LEADERBOARD_SIZE = int(os.environ.get('WISH_LEADERBOARD_SIZE', '100'))
+LEADERBOARD_REFRESH = float(os.environ.get('WISH_LEADERBOARD_REFRESH', '5'))
+DIRTY_LIMIT = 1000
+
+# Refreshes look this far behind the previous one, for clock skew and slow commits
+REFRESH_OVERLAP = 5.0
+
+_ENTRY_FIELDS = ('wish_text', 'current_probability', 'supporters_count', 'version')
+
+
+def _entry(wish_id, record):
+    entry = {field: record.get(field) for field in _ENTRY_FIELDS}
+    entry['wish_id'] = wish_id
+    return entry
+
+
+class Leaderboard:
+    """Bounded, always-sorted top lists per metric; safe to share between threads."""
+
+    def __init__(self, store, size=LEADERBOARD_SIZE, refresh=LEADERBOARD_REFRESH):
+        self.store = store
+        self.size = max(1, int(size))
+        self.refresh = refresh
+        # metric -> (sorted [(-value, wish_id)], {wish_id: ((-value, wish_id), entry)})
+        self._boards = {metric: ([], {}) for metric in LEADERBOARD_METRICS}
+        self._lock = threading.Lock()
+        self._seed_lock = threading.Lock()
+        self._dirty = set()
+        self._dirty_since = None
+        self._seeded_at = None
+        self._synced_to = None
+
+    @property
+    def active(self):
+        """True once the board has been seeded; until then changes are not tracked."""
+        return self._seeded_at is not None
+
+    def update(self, wish_id, record):
+        """Apply a wish's latest record to every metric's list."""
+        if record is not None and self.active:
+            self._apply([(wish_id, record)])
+
+    def touch(self, wish_id):
+        """Note that wish_id changed; it is re-read before the next query."""
+        if not self.active:
+            return
+        with self._lock:
+            if not self._dirty:
+                self._dirty_since = time.time()
+            self._dirty.add(wish_id)
+
+    def _apply(self, changed):
+        with self._lock:
+            for wish_id, record in changed:
+                if record is None:
+                    continue
+                entry = _entry(wish_id, record)
+                for metric in LEADERBOARD_METRICS:
+                    self._place(metric, wish_id, entry)
+
+    def _place(self, metric, wish_id, entry):
+        keys, entries = self._boards[metric]
+        key = (-float(entry[LEADERBOARD_METRICS[metric]] or 0), wish_id)
+        current = entries.get(wish_id)
+        if current is not None:
+            # Records read by different threads can arrive out of order
+            if (current[1]['version'] or 0) > (entry['version'] or 0):
+                return
+            del keys[bisect.bisect_left(keys, current[0])]
+            del entries[wish_id]
+        elif len(keys) >= self.size and key >= keys[-1]:
+            return
+        bisect.insort(keys, key)
+        entries[wish_id] = (key, entry)
+        if len(keys) > self.size:
+            del entries[keys.pop()[1]]
+
+    def _catch_up(self):
+        """Re-read the wishes touched since the last query."""
+        with self._lock:
+            dirty, since = self._dirty, self._dirty_since
+            self._dirty = set()
+        if len(dirty) > DIRTY_LIMIT:
+            self._apply(self.store.updated_wishes(since - REFRESH_OVERLAP))
+        elif dirty:
+            self._apply([(wish_id, self.store.get(wish_id)) for wish_id in dirty])
+
+    def seed(self, max_age=None):
+        """Merge in what the store knows: its top lists the first time, then what changed since.
+
+        With max_age, skip it if the last seed is at most that many seconds old.
+        """
+        with self._seed_lock:
+            if max_age is not None and self.active and time.monotonic() - self._seeded_at <= max_age:
+                return
+            synced_to = time.time()
+            if self._synced_to is None:
+                changed = [pair for metric in LEADERBOARD_METRICS for pair in self.store.top_wishes(metric, self.size)]
+            else:
+                changed = self.store.updated_wishes(self._synced_to - REFRESH_OVERLAP)
+            self._apply(changed)
+            self._seeded_at = time.monotonic()
+            self._synced_to = synced_to
+
+    def top(self, metric, limit=10):
+        """The best ``limit`` wishes by metric ('supporters' or 'probability'), best first."""
+        if metric not in LEADERBOARD_METRICS:
+            raise ValueError(f"unknown leaderboard metric: {metric}")
+        seeded_at = self._seeded_at
+        if seeded_at is None or (self.refresh > 0 and time.monotonic() - seeded_at > self.refresh):
+            self.seed(max_age=self.refresh if self.refresh > 0 else None)
+        if self._dirty:
+            self._catch_up()
+        keys, entries = self._boards[metric]
+        with self._lock:
+            return [dict(entries[wish_id][1]) for _, wish_id in keys[:limit]]
@@ -0,0 +1,306 @@
+"""In-process metrics for the storage, scoring and audio hot paths.
+
+Counters and latency histograms live in one process-wide registry and can
+be dumped as Prometheus text or JSON (with WISH_METRICS_PAGE=1 the app
+shows them at ``?metrics``, ``?metrics=json`` for JSON, and wish_api at
+``/metrics``). Set WISH_METRICS_FILE to also write the JSON dump when the
+process exits, which is handy for command-line runs.
+
+Per-request profiling is opt in: WISH_PROFILE=cprofile (or 1) profiles each
+instrumented request with cProfile, WISH_PROFILE=tracemalloc records the
+allocations it made. Profiles are written to WISH_PROFILE_DIR and the most
+recent summaries are kept for the metrics page.
+"""
+import atexit
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+PROFILE_MODE = os.environ.get('WISH_PROFILE', '').lower()
+PROFILE_DIR = os.environ.get('WISH_PROFILE_DIR', 'profiles')
+METRICS_FILE = os.environ.get('WISH_METRICS_FILE', '')
+
+# Upper bounds in seconds; wide enough for a sub-millisecond cache hit and a slow TTS call
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound holding the q-quantile (an estimate)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """Thread-safe counters and latency histograms keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self.profiles = deque(maxlen=20)
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def timed(self, name, **labels):
+        """Record the duration of the block in histogram ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.profiles.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """Plain-data copy of every metric (the JSON dump)."""
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    'name': name, 'labels': dict(labels), 'count': h.count, 'sum': h.total,
+                    'p50': h.quantile(0.5), 'p95': h.quantile(0.95), 'p99': h.quantile(0.99),
+                    'buckets': dict(zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'], h.counts)),
+                }
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+            profiles = list(self.profiles)
+        return {
+            'uptime_seconds': time.time() - self.started,
+            'counters': counters,
+            'histograms': histograms,
+            'cache_hit_rates': _hit_rates(counters),
+            'profiles': profiles,
+        }
+
+    def render_json(self):
+        return json.dumps(self.snapshot(), indent=2, default=str)
+
+    def render_prometheus(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h.counts), h.total, h.count)) for key, h in self._histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket in zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'], counts):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+def _hit_rates(counters):
+    """Hit rate per cache from the ``*_cache_requests_total`` counters."""
+    totals = {}
+    for counter in counters:
+        if counter['name'].endswith('_cache_requests_total'):
+            hits, total = totals.get(counter['name'], (0, 0))
+            hit = counter['labels'].get('result') == 'hit'
+            totals[counter['name']] = (hits + (counter['value'] if hit else 0), total + counter['value'])
+    return {name[:-len('_requests_total')]: hits / total for name, (hits, total) in totals.items() if total}
+
+
+REGISTRY = MetricsRegistry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timed = REGISTRY.timed
+
+
+# ---------------------------
+# Per-request profiling
+# ---------------------------
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+
+
+def _tracemalloc_acquire():
+    """Start tracing for the first concurrent profile; tracing started elsewhere is left alone."""
+    global _tracemalloc_users, _tracemalloc_started
+    import tracemalloc
+
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            _tracemalloc_started = True
+        _tracemalloc_users += 1
+
+
+def _tracemalloc_release():
+    """Stop tracing once the last profile that needed it is done."""
+    global _tracemalloc_users, _tracemalloc_started
+    import tracemalloc
+
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+
+@contextlib.contextmanager
+def profiled(label, mode=None):
+    """Profile the block when WISH_PROFILE is set; a no-op otherwise.
+
+    Profiling failures are logged and never reach the profiled code.
+    """
+    mode = PROFILE_MODE if mode is None else mode
+    if mode in ('', '0', 'off'):
+        yield
+        return
+    started = time.perf_counter()
+    if mode == 'tracemalloc':
+        import tracemalloc
+
+        before = None
+        try:
+            _tracemalloc_acquire()
+            try:
+                before = tracemalloc.take_snapshot()
+            except Exception:
+                _tracemalloc_release()
+                raise
+        except Exception as e:
+            print(f"profile error: {e}")
+        try:
+            yield
+        finally:
+            if before is not None:
+                try:
+                    top = tracemalloc.take_snapshot().compare_to(before, 'lineno')[:15]
+                    _record_profile(label, mode, started, '\n'.join(str(stat) for stat in top), None)
+                except Exception as e:
+                    print(f"profile error: {e}")
+                finally:
+                    _tracemalloc_release()
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except Exception as e:
+        # e.g. another thread is already profiling
+        print(f"profile error: {e}")
+        profiler = None
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            path = None
+            try:
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                path = os.path.join(PROFILE_DIR, f"{label}-{int(time.time() * 1000)}-{os.getpid()}.prof")
+                profiler.dump_stats(path)
+            except Exception as e:
+                print(f"profile write error: {e}")
+            try:
+                _record_profile(label, 'cprofile', started, _cprofile_summary(profiler), path)
+            except Exception as e:
+                print(f"profile error: {e}")
+
+
+def _cprofile_summary(profiler, limit=15):
+    import io
+    import pstats
+
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+def _record_profile(label, mode, started, summary, path):
+    REGISTRY.profiles.append({
+        'label': label,
+        'mode': mode,
+        'at': time.time(),
+        'seconds': time.perf_counter() - started,
+        'path': path,
+        'summary': summary,
+    })
+
+
+def write_metrics(path=None):
+    """Write the JSON dump to path (default WISH_METRICS_FILE)."""
+    path = path or METRICS_FILE
+    if not path:
+        return
+    try:
+        with open(path, 'w') as f:
+            f.write(REGISTRY.render_json())
+    except Exception as e:
+        print(f"metrics write error: {e}")
+
+
+if METRICS_FILE:
+    atexit.register(write_metrics)
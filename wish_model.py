@@ -0,0 +1,179 @@
+"""Optional transformer wish classifier.
+
+Set WISH_MODEL_DIR to a local sentiment model directory (a saved Hugging Face
+sequence-classification model) to score wishes with it. The score is the
+probability of the model's positive label, found in ``config.id2label`` (a
+label containing "pos") or named by WISH_MODEL_POSITIVE_LABEL; a model with
+neither is not used. The model is loaded once per process, from disk only,
+and runs on CPU. Concurrent requests are grouped into small batches, and
+results are cached by normalised wish text. Without a usable model every
+call falls back to the keyword scorer.
+
+torch and transformers are imported only when a model is actually loaded.
+"""
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from wish_metrics import inc, observe
+from wish_sentiment import evaluate_wish_sentiment
+from wish_texts import normalize_wish
+
+MODEL_DIR = os.environ.get('WISH_MODEL_DIR', '')
+MAX_BATCH = int(os.environ.get('WISH_MODEL_BATCH', '16'))
+MAX_WAIT_MS = float(os.environ.get('WISH_MODEL_WAIT_MS', '10'))
+CACHE_SIZE = int(os.environ.get('WISH_MODEL_CACHE', '4096'))
+POSITIVE_LABEL = os.environ.get('WISH_MODEL_POSITIVE_LABEL', '')
+
+
+def _label_for(score):
+    # Same thresholds as the keyword scorer
+    if score >= 0.6:
+        return 'POSITIVE'
+    elif score >= 0.4:
+        return 'NEUTRAL'
+    return 'NEGATIVE'
+
+
+def positive_label_of(id2label, configured=''):
+    """Name of the positive label among a model's labels; ValueError if it is ambiguous."""
+    labels = [str(name) for name in id2label.values()]
+    if configured:
+        if configured not in labels:
+            raise ValueError(f"positive label {configured!r} is not one of the model's labels {labels}")
+        return configured
+    positive = [name for name in labels if 'pos' in name.lower()]
+    if len(positive) != 1:
+        raise ValueError(f"cannot tell the positive label among {labels}; set WISH_MODEL_POSITIVE_LABEL")
+    return positive[0]
+
+
+class WishClassifier:
+    """Transformer classifier with dynamic micro-batching and an LRU."""
+
+    def __init__(self, model_dir, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, cache_size=CACHE_SIZE,
+                 positive_label=POSITIVE_LABEL):
+        os.environ.setdefault('HF_HUB_OFFLINE', '1')
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+        tokenizer = AutoTokenizer.from_pretrained(model_dir, local_files_only=True)
+        model = AutoModelForSequenceClassification.from_pretrained(model_dir, local_files_only=True)
+        self.positive_label = positive_label_of(model.config.id2label, positive_label)
+        # Memoised results are tagged with the scorer that produced them
+        self.name = f"model:{os.path.basename(os.path.normpath(model_dir))}"
+        self._pipeline = pipeline('text-classification', model=model, tokenizer=tokenizer, device=-1, top_k=None)
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.cache_size = int(cache_size)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        threading.Thread(target=self._serve, name="wish-model-batcher", daemon=True).start()
+
+    def classify(self, wish_text):
+        """Return (label, score) for one wish; blocks until its batch ran."""
+        from concurrent.futures import Future
+
+        key = normalize_wish(wish_text)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                inc('wish_model_cache_requests_total', result='hit')
+                return self._cache[key]
+        inc('wish_model_cache_requests_total', result='miss')
+        future = Future()
+        self._queue.put((key, future))
+        return future.result()
+
+    def _serve(self):
+        while True:
+            batch = [self._queue.get()]
+            # Collect whatever else arrives within the wait window
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self._queue.get(timeout=self.max_wait))
+            except queue.Empty:
+                pass
+            texts = list(dict.fromkeys(key for key, _ in batch))
+            try:
+                results = dict(zip(texts, (self._to_result(r) for r in self._pipeline(texts, truncation=True))))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._cache_lock:
+                for key, result in results.items():
+                    self._cache[key] = result
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            for key, future in batch:
+                future.set_result(results[key])
+
+    def _to_result(self, label_scores):
+        """Map the model's label distribution onto (label, score)."""
+        positive = 0.0
+        for item in label_scores:
+            if item['label'] == self.positive_label:
+                positive = float(item['score'])
+        score = max(0.1, min(0.95, positive))
+        return _label_for(score), score
+
+
+_classifier = None
+_classifier_failed = False
+_classifier_lock = threading.Lock()
+
+
+def get_classifier():
+    """Process-wide classifier, or None when no local model is configured."""
+    global _classifier, _classifier_failed
+    if _classifier is not None or _classifier_failed or not MODEL_DIR:
+        return _classifier
+    with _classifier_lock:
+        if _classifier is None and not _classifier_failed:
+            if not os.path.isdir(MODEL_DIR):
+                print(f"wish model error: {MODEL_DIR} is not a directory")
+                _classifier_failed = True
+                return None
+            try:
+                _classifier = WishClassifier(MODEL_DIR)
+            except Exception as e:
+                print(f"wish model error: {e}")
+                _classifier_failed = True
+    return _classifier
+
+
+def evaluate_wish(wish_text, memo=None):
+    """(label, score) from the model if available, else from the keywords.
+
+    memo is an optional store whose get_sentiment/put_sentiment remember
+    model results per wish text hash, so duplicate wishes are classified
+    once. Keyword scoring is cheaper than the lookup and is never memoised.
+    """
+    started = time.perf_counter()
+    scorer, result = _evaluate(wish_text, memo)
+    observe('wish_evaluate_seconds', time.perf_counter() - started, scorer=scorer)
+    return result
+
+
+def _evaluate(wish_text, memo):
+    """(scorer, (label, score)); scorer names what actually produced the result."""
+    classifier = get_classifier()
+    if classifier is None:
+        return 'keywords', evaluate_wish_sentiment(wish_text)
+    if memo is not None:
+        cached = memo.get_sentiment(wish_text, classifier.name)
+        if cached is not None:
+            return 'memo', cached
+    try:
+        result = classifier.classify(wish_text)
+    except Exception as e:
+        inc('wish_model_errors_total')
+        print(f"wish model error: {e}")
+        return 'keywords', evaluate_wish_sentiment(wish_text)
+    if memo is not None:
+        memo.put_sentiment(wish_text, classifier.name, *result)
+    return 'model', result
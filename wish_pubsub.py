@@ -0,0 +1,361 @@
+"""Change notifications between app replicas that share one store.
+
+Every replica points WISH_DATA_DIR (or WISH_STORE_PATH) at the same store
+and WISH_PUBSUB at one hub, a small fan-out server on a local socket:
+
+    python wish_pubsub.py hub --address unix:/run/wishes/pubsub.sock
+    WISH_PUBSUB=unix:/run/wishes/pubsub.sock streamlit run wish_evaluator.py
+
+Addresses are ``unix:PATH`` or ``tcp:HOST:PORT``. NotifyingStore publishes
+``{"w": wish_id, "v": version}`` after each committed write; the hub sends
+every line to all other connections, and each replica's Notifier hands it to
+its subscribers (the WishCache drops the entry, the Leaderboard marks it
+dirty). Delivery is best effort: a subscriber that falls too far behind is
+disconnected by the hub, and on every (re)connect subscribers are called
+with wish_id None, meaning "anything may have changed". Changes published
+while a replica is not connected are queued (up to PENDING_MAX wish IDs)
+and sent once it reconnects; if more were missed it sends one
+``{"w": null}`` instead, which tells every other replica to drop everything.
+"""
+import json
+import os
+import socket
+import threading
+import time
+
+from wish_metrics import inc
+from wish_store import WishStore
+
+PUBSUB_ADDRESS = os.environ.get('WISH_PUBSUB', '')
+DEFAULT_HUB_ADDRESS = 'tcp:127.0.0.1:8503'
+# Bytes a subscriber may have queued at the hub before it is cut off
+HUB_MAX_BUFFER = 1 << 20
+MAX_MESSAGE_BYTES = 4096
+SEND_TIMEOUT = 1.0
+RECONNECT_MAX_DELAY = 2.0
+# Wish IDs remembered while disconnected; beyond this, reconnect announces "all changed"
+PENDING_MAX = 1000
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def parse_address(address):
+    """(family, target) for 'unix:PATH' or 'tcp:HOST:PORT'."""
+    scheme, _, rest = address.partition(':')
+    if scheme == 'unix' and rest:
+        return socket.AF_UNIX, rest
+    if scheme == 'tcp':
+        host, _, port = rest.rpartition(':')
+        if host and port.isdigit():
+            return socket.AF_INET, (host, int(port))
+    raise ValueError(f"bad pub/sub address (want unix:PATH or tcp:HOST:PORT): {address}")
+
+
+def _message(wish_id, version):
+    return json.dumps({'w': wish_id, 'v': version}, separators=(',', ':')).encode() + b'\n'
+
+
+# ---------------------------
+# Replica side
+# ---------------------------
+class Notifier:
+    """One replica's connection to the hub; reconnects in the background."""
+
+    def __init__(self, address=PUBSUB_ADDRESS):
+        self.family, self.target = parse_address(address)
+        self.address = address
+        # Bumped on every connect: notifications from before it may have been missed
+        self.generation = 0
+        self.connected = False
+        self._sock = None
+        self._send_lock = threading.Lock()
+        # Unsent notifications, wish_id -> version; None in it means "all changed"
+        self._pending = {}
+        self._subscribers = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="wish-pubsub", daemon=True)
+        self._thread.start()
+
+    def subscribe(self, callback):
+        """Call callback(wish_id, version) for every change; wish_id None means all."""
+        self._subscribers.append(callback)
+
+    def _dispatch(self, wish_id, version):
+        for callback in list(self._subscribers):
+            try:
+                callback(wish_id, version)
+            except Exception as e:
+                print(f"pub/sub subscriber error: {e}")
+
+    def publish(self, wish_id, version=None):
+        """Tell this replica's subscribers and every other replica that wish_id changed."""
+        self._dispatch(wish_id, version)
+        with self._send_lock:
+            sock = self._sock
+            if sock is None:
+                self._queue(wish_id, version)
+                return
+            try:
+                sock.sendall(_message(wish_id, version))
+                inc('wish_pubsub_messages_total', direction='out')
+                return
+            except OSError as e:
+                self._queue(wish_id, version)
+                print(f"pub/sub publish error: {e}")
+        self._disconnect(sock)
+
+    def _queue(self, wish_id, version):
+        # Called with _send_lock held
+        inc('wish_pubsub_messages_total', direction='queued')
+        pending = self._pending
+        if None in pending:
+            return
+        pending[wish_id] = version
+        if len(pending) > PENDING_MAX:
+            pending.clear()
+            pending[None] = None
+
+    def _flush(self, sock):
+        """Send what was published while disconnected; called with _send_lock held."""
+        pending = self._pending
+        if not pending:
+            return
+        sock.sendall(b''.join(_message(wish_id, version) for wish_id, version in pending.items()))
+        inc('wish_pubsub_messages_total', len(pending), direction='out')
+        pending.clear()
+
+    def _connect(self):
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        sock.settimeout(SEND_TIMEOUT)
+        try:
+            sock.connect(self.target)
+            # The hub greets a connection once it is registered, so nothing published after this is missed
+            buffer = b''
+            while b'\n' not in buffer:
+                chunk = sock.recv(MAX_MESSAGE_BYTES)
+                if not chunk:
+                    raise ConnectionError("hub closed the connection")
+                buffer += chunk
+        except BaseException:
+            sock.close()
+            raise
+        return sock, buffer.partition(b'\n')[2]
+
+    def _disconnect(self, sock):
+        with self._send_lock:
+            if self._sock is sock:
+                self._sock = None
+                self.connected = False
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def _run(self):
+        delay = 0.05
+        while not self._stop.is_set():
+            try:
+                sock, buffer = self._connect()
+            except OSError:
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            with self._send_lock:
+                try:
+                    self._flush(sock)
+                except OSError:
+                    sock.close()
+                    self._stop.wait(delay)
+                    continue
+                self._sock = sock
+                self.generation += 1
+                self.connected = True
+            delay = 0.05
+            self._dispatch(None, None)
+            try:
+                self._read(sock, buffer)
+            except OSError:
+                pass
+            self._disconnect(sock)
+
+    def _read(self, sock, buffer):
+        while not self._stop.is_set():
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                inc('wish_pubsub_messages_total', direction='in')
+                self._dispatch(message.get('w'), message.get('v'))
+            if len(buffer) > MAX_MESSAGE_BYTES:
+                return
+            try:
+                chunk = sock.recv(65536)
+            except socket.timeout:
+                continue
+            if not chunk:
+                return
+            buffer += chunk
+
+    def wait_connected(self, timeout=None):
+        """Block until connected to the hub; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.connected:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        self._stop.set()
+        sock = self._sock
+        if sock is not None:
+            self._disconnect(sock)
+
+
+def get_notifier():
+    """Process-wide Notifier, or None when WISH_PUBSUB is not set."""
+    global _notifier
+    if not PUBSUB_ADDRESS:
+        return None
+    if _notifier is None:
+        with _notifier_lock:
+            if _notifier is None:
+                _notifier = Notifier(PUBSUB_ADDRESS)
+    return _notifier
+
+
+class NotifyingStore(WishStore):
+    """Publishes a change notification after every write to the wrapped store."""
+
+    def __init__(self, store, notifier):
+        self.store = store
+        self.notifier = notifier
+
+    def get(self, wish_id):
+        return self.store.get(wish_id)
+
+    def create_or_update(self, wish_id, wish_text, initial_probability):
+        record = self.store.create_or_update(wish_id, wish_text, initial_probability)
+        self.notifier.publish(wish_id, record.get('version') if record else None)
+        return record
+
+    def create(self, wish_id, wish_text, initial_probability):
+        record = self.store.create(wish_id, wish_text, initial_probability)
+        if record is not None:
+            self.notifier.publish(wish_id, record.get('version'))
+        return record
+
+    def wish_ids_between(self, start_time, end_time, limit=None):
+        return self.store.wish_ids_between(start_time, end_time, limit)
+
+    def top_wishes(self, metric, limit):
+        return self.store.top_wishes(metric, limit)
+
+    def updated_wishes(self, since):
+        return self.store.updated_wishes(since)
+
+    def add_support(self, wish_id, increment, supporter_id, expected_version=None):
+        success, probability = self.store.add_support(wish_id, increment, supporter_id, expected_version)
+        if success:
+            self.notifier.publish(wish_id)
+        return success, probability
+
+    def add_support_batch(self, wish_id, supports):
+        accepted = self.store.add_support_batch(wish_id, supports)
+        if accepted:
+            self.notifier.publish(wish_id)
+        return accepted
+
+    def has_supporter(self, wish_id, supporter_id):
+        return self.store.has_supporter(wish_id, supporter_id)
+
+    def get_sentiment(self, wish_text, scorer):
+        return self.store.get_sentiment(wish_text, scorer)
+
+    def put_sentiment(self, wish_text, scorer, label, score):
+        self.store.put_sentiment(wish_text, scorer, label, score)
+
+    def data_version(self):
+        return self.store.data_version()
+
+    def close(self):
+        self.store.close()
+
+
+# ---------------------------
+# Hub
+# ---------------------------
+async def run_hub(address=DEFAULT_HUB_ADDRESS, ready=None):
+    """Fan every line out to all other connections until cancelled."""
+    import asyncio
+
+    family, target = parse_address(address)
+    clients = set()
+
+    async def handle(reader, writer):
+        clients.add(writer)
+        try:
+            writer.write(b'{"hello":1}\n')
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                for other in list(clients):
+                    if other is writer:
+                        continue
+                    if other.transport.get_write_buffer_size() > HUB_MAX_BUFFER:
+                        # It will reconnect and start over; better than stalling everyone
+                        clients.discard(other)
+                        other.close()
+                        inc('wish_pubsub_messages_total', direction='dropped')
+                        continue
+                    other.write(line)
+        finally:
+            clients.discard(writer)
+            writer.close()
+
+    if family == socket.AF_UNIX:
+        if os.path.exists(target):
+            os.unlink(target)
+        server = await asyncio.start_unix_server(handle, target, limit=MAX_MESSAGE_BYTES)
+    else:
+        server = await asyncio.start_server(handle, *target, limit=MAX_MESSAGE_BYTES)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Wish change notifications between replicas.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    hub = sub.add_parser('hub', help="run the fan-out hub")
+    hub.add_argument('--address', default=PUBSUB_ADDRESS or DEFAULT_HUB_ADDRESS)
+    listen = sub.add_parser('listen', help="print notifications as they arrive")
+    listen.add_argument('--address', default=PUBSUB_ADDRESS or DEFAULT_HUB_ADDRESS)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'hub':
+            print(f"wish pub/sub hub on {args.address}")
+            asyncio.run(run_hub(args.address))
+        else:
+            notifier = Notifier(args.address)
+            notifier.subscribe(lambda wish_id, version: print(wish_id or '(reconnected)', version or '', flush=True))
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,189 @@
+"""Rate limits on support clicks, checked before they reach storage.
+
+A supporter ID is minted per session, so a bot that opens new sessions
+gets a fresh one every time; only the client behind them is stable. Each
+support spends a token from three buckets and is refused when any is empty
+(a refused support spends nothing):
+
+  client   per client fingerprint (IP and user agent), WISH_RATE_CLIENT
+  wish     per wish_id, whoever clicks, WISH_RATE_WISH
+  total    all supports in this process, WISH_RATE_TOTAL (off by default)
+
+A client whose IP address is unknown (no peer address, or only that of a
+proxy whose X-Forwarded-For is not trusted) gets the UNKNOWN_CLIENT key,
+which skips the client limit rather than lumping every such visitor into
+one bucket; the wish and total limits still apply.
+
+Rates are "COUNT/SECONDS" (that many supports per that many seconds, and up
+to COUNT at once); 0 turns a limit off. The fingerprint limit stops a single
+flooder and the wish limit a distributed flood on one wish. A flood where
+every click comes from a new client on a different wish gets past both; the
+total limit caps even that, but it cannot tell those clients from real ones
+and refuses everybody while it is exhausted, so it is only a circuit breaker
+for deployments that would rather do that than overload storage.
+
+Buckets live in memory, one lock per scope, so all threads of a worker
+share them. A bucket idle long enough to be full again is forgotten, and at
+most WISH_RATE_MAX_KEYS are kept per scope (least recently used dropped
+first), so memory stays bounded however many clients show up.
+"""
+import hashlib
+import ipaddress
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from wish_metrics import inc
+
+RATE_CLIENT = os.environ.get('WISH_RATE_CLIENT', '10/60')
+RATE_WISH = os.environ.get('WISH_RATE_WISH', '50/1')
+RATE_TOTAL = os.environ.get('WISH_RATE_TOTAL', '0')
+MAX_KEYS = int(os.environ.get('WISH_RATE_MAX_KEYS', '100000'))
+UNKNOWN_CLIENT = ''
+
+
+def parse_rate(rate):
+    """(tokens per second, burst) for "COUNT/SECONDS", or None when disabled."""
+    count, _, seconds = str(rate).strip().partition('/')
+    try:
+        count = float(count or 0)
+        seconds = float(seconds or 1)
+    except ValueError:
+        raise ValueError(f"bad rate (want COUNT/SECONDS): {rate}")
+    if count <= 0 or seconds <= 0:
+        return None
+    return count / seconds, count
+
+
+def client_fingerprint(*parts):
+    """Short stable key for a client from e.g. its IP address and user agent."""
+    raw = '\0'.join(str(part or '') for part in parts)
+    return hashlib.blake2b(raw.encode('utf-8', 'replace'), digest_size=8).hexdigest()
+
+
+def client_address(peer, forwarded_for=None, trust_forwarded=False):
+    """The client's IP address, or None when only a proxy's address (or none) is known."""
+    if trust_forwarded and forwarded_for:
+        return forwarded_for.split(',')[0].strip() or None
+    if not peer:
+        return None
+    if forwarded_for:
+        # A forwarded request from a local address came through a proxy we do not trust
+        try:
+            address = ipaddress.ip_address(peer)
+        except ValueError:
+            return peer
+        if address.is_private or address.is_loopback:
+            return None
+    return peer
+
+
+def client_key(address, user_agent):
+    """Rate-limit key for a client; UNKNOWN_CLIENT without an address."""
+    return client_fingerprint(address, user_agent) if address else UNKNOWN_CLIENT
+
+
+class RateLimited(Exception):
+    """A support was refused by a rate limit; retry_after is in seconds."""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(f"{scope} rate limit exceeded; retry in {retry_after:.1f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """Token buckets keyed by string, bounded by expiry and LRU eviction."""
+
+    def __init__(self, rate, burst, max_keys=MAX_KEYS, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_keys = max(1, int(max_keys))
+        self.clock = clock
+        # Time after which an untouched bucket is full again, i.e. no different from a new one
+        self._refill = self.burst / self.rate
+        # key -> (tokens, updated); least recently updated first
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def acquire(self, key):
+        """Take a token for key; returns 0.0 on success, else seconds until one is available."""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            tokens = self.burst if bucket is None else min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            wait = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                wait = (1.0 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            self._expire(now)
+        return wait
+
+    def refund(self, key):
+        """Give back a token taken by acquire, e.g. when another limit refused the request."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._buckets[key] = (min(self.burst, bucket[0] + 1.0), bucket[1])
+
+    def _expire(self, now):
+        buckets = self._buckets
+        while buckets:
+            key, (_, updated) = next(iter(buckets.items()))
+            if now - updated < self._refill:
+                break
+            del buckets[key]
+        while len(buckets) > self.max_keys:
+            buckets.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SupportLimiter:
+    """The client, wish and total limits on support clicks."""
+
+    def __init__(self, client=RATE_CLIENT, wish=RATE_WISH, total=RATE_TOTAL, max_keys=MAX_KEYS,
+                 clock=time.monotonic):
+        self.scopes = {}
+        self._warned_unknown = False
+        for scope, rate in (('client', client), ('wish', wish), ('total', total)):
+            parsed = parse_rate(rate)
+            if parsed is not None:
+                self.scopes[scope] = TokenBuckets(parsed[0], parsed[1], max_keys, clock)
+
+    def check(self, client, wish_id):
+        """Spend a token for this support from every limit, or from none and raise RateLimited."""
+        keys = {'client': client, 'wish': wish_id, 'total': ''}
+        spent = []
+        for scope, buckets in self.scopes.items():
+            key = keys[scope]
+            if scope == 'client' and client == UNKNOWN_CLIENT:
+                if not self._warned_unknown:
+                    self._warned_unknown = True
+                    print("rate limit warning: client address unknown, skipping the client limit "
+                          "(behind a proxy, set WISH_TRUST_FORWARDED / WISH_API_TRUST_FORWARDED)")
+                continue
+            wait = buckets.acquire(key)
+            if wait:
+                for spent_buckets, spent_key in spent:
+                    spent_buckets.refund(spent_key)
+                inc('wish_ratelimit_rejected_total', scope=scope)
+                raise RateLimited(scope, wait)
+            spent.append((buckets, key))
+
+    def clear(self):
+        for buckets in self.scopes.values():
+            buckets.clear()
+
+    def stats(self):
+        return {scope: {'keys': len(buckets), 'evictions': buckets.evictions} for scope, buckets in self.scopes.items()}
@@ -0,0 +1,262 @@
+"""Keyword-based wish scoring.
+
+The lexicon is compiled once at import into a single regular expression,
+so scoring a wish is one pass over its text.
+
+Files of wishes can be scored offline without the UI:
+
+    python wish_sentiment.py wishes.jsonl -o scored.jsonl --processes 4
+"""
+import itertools
+import os
+import re
+import sys
+import time
+from collections import deque
+
+# Positive keywords
+POSITIVE_KEYWORDS = (
+    'wish', 'hope', 'want', 'dream', 'would love', 'desire', 'aspire',
+    'achieve', 'accomplish', 'succeed', 'happy', 'joy', 'peace', 'love',
+    'learn', 'improve', 'grow', 'develop', 'better', 'health', 'travel',
+    'success', 'prosper', 'thrive', 'flourish', 'excel', 'master'
+)
+
+# Negative keywords (to avoid)
+NEGATIVE_KEYWORDS = (
+    'not', "don't", "won't", "can't", "cannot", "never", "no", "stop",
+    "quit", "avoid", "hate", "terrible", "awful", "bad", "worst"
+)
+
+# Wish starters
+WISH_STARTERS = ('i wish', 'i hope', 'i want', 'my dream', 'i would love', 'i aspire')
+
+
+_CATEGORIES = {}
+for _category, _keywords in (('starter', WISH_STARTERS), ('positive', POSITIVE_KEYWORDS),
+                             ('negative', NEGATIVE_KEYWORDS)):
+    for _keyword in _keywords:
+        _CATEGORIES.setdefault(_keyword, set()).add(_category)
+
+
+def _trie_regex(words):
+    """Regex for words shaped as a character trie, preferring longer matches."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+# A zero-width lookahead tried at every position finds the longest keyword
+# starting there; any other keyword starting at the same position is a
+# prefix of it, so overlapping matches ("no" inside "not") come from a table.
+_ALTERNATION = _trie_regex(_CATEGORIES)
+_PATTERN = re.compile(f'(?=({_ALTERNATION}))')
+_WORD_PATTERN = re.compile(rf'(?<!\w)(?=({_ALTERNATION})(?!\w))')
+_PREFIXES = {k: tuple(p for p in _CATEGORIES if k.startswith(p)) for k in _CATEGORIES}
+_WORD_CHAR = re.compile(r'\w')
+
+
+def match_keywords(text_lower, word_boundaries=False):
+    """Distinct lexicon keywords found in text_lower, by category.
+
+    By default a keyword counts wherever it occurs as a substring (so "no"
+    matches inside "know"), which is how wishes have always been scored.
+    With word_boundaries=True only whole-word occurrences count.
+    """
+    if word_boundaries:
+        keywords = set()
+        for match in _WORD_PATTERN.finditer(text_lower):
+            start = match.start()
+            for keyword in _PREFIXES[match.group(1)]:
+                # Shorter keywords at the same start must end on a boundary too
+                if not _WORD_CHAR.match(text_lower, start + len(keyword)):
+                    keywords.add(keyword)
+    else:
+        keywords = set()
+        for longest in set(_PATTERN.findall(text_lower)):
+            keywords.update(_PREFIXES[longest])
+
+    found = {'starter': set(), 'positive': set(), 'negative': set()}
+    for keyword in keywords:
+        for category in _CATEGORIES[keyword]:
+            found[category].add(keyword)
+    return found
+
+
+def evaluate_wish_sentiment(wish_text, word_boundaries=False):
+    """Simple sentiment analysis without transformers."""
+    found = match_keywords(wish_text.lower(), word_boundaries)
+
+    # Score calculation
+    score = 0.5  # Base score
+
+    # Check for wish starters
+    if found['starter']:
+        score += 0.3
+
+    # Check positive keywords
+    score += min(0.3, len(found['positive']) * 0.05)
+
+    # Check negative keywords
+    score -= min(0.3, len(found['negative']) * 0.05)
+
+    # Ensure score is between 0 and 1
+    score = max(0.1, min(0.95, score))
+
+    # Determine label
+    if score >= 0.6:
+        return 'POSITIVE', score
+    elif score >= 0.4:
+        return 'NEUTRAL', score
+    else:
+        return 'NEGATIVE', score
+
+
+# ---------------------------
+# Batch scoring
+# ---------------------------
+def _score_texts(texts, word_boundaries=False):
+    # Scores depend only on the lower-cased text; repeated wishes are scored once
+    memo = {}
+    results = []
+    for text in texts:
+        lowered = text.lower()
+        result = memo.get(lowered)
+        if result is None:
+            result = memo[lowered] = evaluate_wish_sentiment(lowered, word_boundaries)
+        results.append(result)
+    return results
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_wishes(wishes, chunk_size=1000, processes=None, key=None, word_boundaries=False):
+    """Score an iterable of wishes lazily; yields (wish, label, score) in order.
+
+    Input is consumed in chunks of chunk_size, so memory stays bounded for
+    arbitrarily large inputs. With processes > 1 chunks are scored in a
+    process pool, keeping at most two chunks per worker in flight. key
+    extracts the wish text from each item (default: the item itself).
+    """
+    key = key or (lambda wish: wish)
+    chunks = _chunked(wishes, chunk_size)
+
+    if not processes or processes <= 1:
+        for chunk in chunks:
+            for wish, (label, score) in zip(chunk, _score_texts([key(w) for w in chunk], word_boundaries)):
+                yield wish, label, score
+        return
+
+    # Imported here: multiprocessing is only needed for pooled runs
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append((chunk, pool.submit(_score_texts, [key(w) for w in chunk], word_boundaries)))
+            while len(in_flight) >= processes * 2:
+                done_chunk, future = in_flight.popleft()
+                for wish, (label, score) in zip(done_chunk, future.result()):
+                    yield wish, label, score
+        while in_flight:
+            done_chunk, future = in_flight.popleft()
+            for wish, (label, score) in zip(done_chunk, future.result()):
+                yield wish, label, score
+
+
+# ---------------------------
+# Command line
+# ---------------------------
+def _detect_format(path, default='jsonl'):
+    ext = os.path.splitext(path)[1].lower()
+    return {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl', '.ndjson': 'jsonl'}.get(ext, default)
+
+
+def _read_records(f, fmt, field):
+    import csv
+    import json
+
+    if fmt == 'csv':
+        yield from csv.DictReader(f)
+        return
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        yield record if isinstance(record, dict) else {field: record}
+
+
+def main(argv=None):
+    import argparse
+    import csv
+    import json
+
+    parser = argparse.ArgumentParser(description="Score a JSONL/CSV file of wishes.")
+    parser.add_argument('input', nargs='?', default='-', help="input file ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="output file ('-' for stdout)")
+    parser.add_argument('--input-format', choices=['jsonl', 'csv'])
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'])
+    parser.add_argument('--field', default='wish_text', help="record field holding the wish text")
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--word-boundaries', action='store_true', help="only match whole words")
+    args = parser.parse_args(argv)
+
+    in_fmt = args.input_format or _detect_format(args.input)
+    out_fmt = args.output_format or _detect_format(args.output, in_fmt)
+    fin = sys.stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8')
+    fout = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+
+    started = time.perf_counter()
+    count = 0
+    writer = None
+    try:
+        records = _read_records(fin, in_fmt, args.field)
+        scored = score_wishes(
+            records, chunk_size=args.chunk_size, processes=args.processes,
+            key=lambda record: str(record.get(args.field) or ''), word_boundaries=args.word_boundaries
+        )
+        for record, label, score in scored:
+            record = dict(record, label=label, score=round(score, 4))
+            if out_fmt == 'csv':
+                if writer is None:
+                    writer = csv.DictWriter(fout, fieldnames=list(record), extrasaction='ignore')
+                    writer.writeheader()
+                writer.writerow(record)
+            else:
+                fout.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"scored {count} wishes in {elapsed:.2f}s ({rate:,.0f} wishes/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
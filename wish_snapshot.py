@@ -0,0 +1,292 @@
+"""Read-only binary snapshot of the wishes file with an mmap'd index.
+
+The wishes file (``wishes_data.json``, WISHES_FILE) has to be parsed whole
+to answer one lookup. A snapshot holds the same records in a compact binary
+layout that is memory-mapped, so a lookup reads a few index entries and the
+one record it needs::
+
+    header    magic "WISHSNP1", record count (u64), index offset (u64)
+    records   u32 length + record, back to back
+    fanout    65537 x u32: first index slot of each top-16-bit hash bucket
+    index     count x (u64 hash of wish_id, u64 record offset), sorted
+
+A record is a fixed struct (probabilities, luck, timestamps, version and
+lengths) followed by the UTF-8 wish_id, the UTF-8 text and the supporter
+keys (8 raw bytes each, sorted so membership is a binary search). Hashes
+are 64-bit blake2b; colliding IDs sit next to each other in the index and
+are told apart by the wish_id stored in the record.
+
+Convert with::
+
+    python wish_snapshot.py to-snapshot wishes_data.json wishes.snap
+    python wish_snapshot.py to-json wishes.snap wishes_data.json
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+
+from wish_store import DATA_DIR, WISHES_FILE, load_wishes, save_wishes
+from wish_supporters import KEY_BYTES, is_supporter_key_hex, supporter_key_hex
+
+MAGIC = b'WISHSNP1'
+SNAPSHOT_FILE = os.environ.get('WISH_SNAPSHOT_PATH', os.path.join(DATA_DIR, 'wishes.snap'))
+
+_HEADER = struct.Struct('<8sQQ')
+_LENGTH = struct.Struct('<I')
+# initial, current, total luck, created_at, last_updated, version, supporters, id length, text length
+_RECORD = struct.Struct('<dddddIIHI')
+_ENTRY = struct.Struct('<QQ')
+_FANOUT_BITS = 16
+_FANOUT = struct.Struct(f'<{(1 << _FANOUT_BITS) + 1}I')
+_SLOT = struct.Struct('<I')
+
+
+def id_hash(wish_id):
+    return int.from_bytes(hashlib.blake2b(wish_id.encode(), digest_size=8).digest(), 'big')
+
+
+def _supporter_keys(supporters):
+    """Sorted raw keys from a JSON supporters list (hex keys or legacy raw IDs)."""
+    return sorted({
+        bytes.fromhex(s if is_supporter_key_hex(s) else supporter_key_hex(s)) for s in supporters
+    })
+
+
+def _encode(wish_id, record):
+    id_bytes = wish_id.encode()
+    text = record.get('wish_text', '').encode()
+    keys = _supporter_keys(record.get('supporters', []))
+    fixed = _RECORD.pack(
+        float(record.get('initial_probability', 0.0)), float(record.get('current_probability', 0.0)),
+        float(record.get('total_luck_added', 0.0)), float(record.get('created_at', 0.0)),
+        float(record.get('last_updated', 0.0)), int(record.get('version', 0)), len(keys), len(id_bytes), len(text)
+    )
+    return b''.join([fixed, id_bytes, text] + keys)
+
+
+def write_snapshot(records, path=SNAPSHOT_FILE):
+    """Write {wish_id: record} (the wishes.json shape) to path; returns the record count.
+
+    Writes to a temporary file and renames it into place, so readers never
+    see a half-written snapshot.
+    """
+    entries = []
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix='.snapshot_', dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, 0, 0))
+            offset = _HEADER.size
+            for wish_id, record in records.items():
+                data = _encode(wish_id, record)
+                f.write(_LENGTH.pack(len(data)))
+                f.write(data)
+                # One int per entry sorts 1M entries far cheaper than tuples
+                entries.append((id_hash(wish_id) << 64) | offset)
+                offset += _LENGTH.size + len(data)
+            entries.sort()
+
+            fanout = [0] * ((1 << _FANOUT_BITS) + 1)
+            for entry in entries:
+                fanout[(entry >> (128 - _FANOUT_BITS)) + 1] += 1
+            for bucket in range(1, len(fanout)):
+                fanout[bucket] += fanout[bucket - 1]
+            f.write(_FANOUT.pack(*fanout))
+
+            mask = (1 << 64) - 1
+            index = bytearray(_ENTRY.size * len(entries))
+            for slot, entry in enumerate(entries):
+                _ENTRY.pack_into(index, slot * _ENTRY.size, entry >> 64, entry & mask)
+            f.write(index)
+
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, len(entries), offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        tmp_path = None
+        return len(entries)
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class WishSnapshot:
+    """Memory-mapped snapshot reader; safe to share between threads.
+
+    Views returned by record_view point into the mapping and must be
+    released before close().
+    """
+
+    def __init__(self, path=SNAPSHOT_FILE):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, self.count, index_offset = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a wish snapshot")
+        self._fanout = index_offset
+        self._index = index_offset + _FANOUT.size
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, wish_id):
+        return self._find(wish_id) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _find(self, wish_id):
+        """(start, end) of the record bytes for wish_id, or None."""
+        h = id_hash(wish_id)
+        bucket = h >> (64 - _FANOUT_BITS)
+        lo = _SLOT.unpack_from(self._map, self._fanout + bucket * _SLOT.size)[0]
+        hi = _SLOT.unpack_from(self._map, self._fanout + (bucket + 1) * _SLOT.size)[0]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _ENTRY.unpack_from(self._map, self._index + mid * _ENTRY.size)[0] < h:
+                lo = mid + 1
+            else:
+                hi = mid
+        id_bytes = wish_id.encode()
+        while lo < self.count:
+            entry_hash, offset = _ENTRY.unpack_from(self._map, self._index + lo * _ENTRY.size)
+            if entry_hash != h:
+                return None
+            start = offset + _LENGTH.size
+            id_start = start + _RECORD.size
+            id_len = _RECORD.unpack_from(self._map, start)[7]
+            if self._view[id_start:id_start + id_len] == id_bytes:
+                return start, start + _LENGTH.unpack_from(self._map, offset)[0]
+            lo += 1
+        return None
+
+    def record_view(self, wish_id):
+        """Zero-copy memoryview of the encoded record, or None."""
+        span = self._find(wish_id)
+        return self._view[span[0]:span[1]] if span else None
+
+    def _decode(self, start, with_supporters):
+        (initial, current, luck, created_at, last_updated, version,
+         supporters, id_len, text_len) = _RECORD.unpack_from(self._map, start)
+        text_start = start + _RECORD.size + id_len
+        record = {
+            'wish_text': str(self._view[text_start:text_start + text_len], 'utf-8'),
+            'initial_probability': initial,
+            'current_probability': current,
+            'total_luck_added': luck,
+            'supporters_count': supporters,
+            'created_at': created_at,
+            'last_updated': last_updated,
+            'version': version,
+        }
+        if with_supporters:
+            keys_start = text_start + text_len
+            record['supporters'] = [
+                self._view[k:k + KEY_BYTES].hex() for k in range(keys_start, keys_start + supporters * KEY_BYTES,
+                                                                 KEY_BYTES)
+            ]
+        return record
+
+    def get(self, wish_id):
+        """The wish record in the store's public shape, or None."""
+        span = self._find(wish_id)
+        return self._decode(span[0], False) if span else None
+
+    def has_supporter(self, wish_id, supporter_id):
+        span = self._find(wish_id)
+        if span is None:
+            return False
+        start = span[0]
+        supporters, id_len, text_len = _RECORD.unpack_from(self._map, start)[6:]
+        keys_start = start + _RECORD.size + id_len + text_len
+        key = bytes.fromhex(supporter_key_hex(supporter_id))
+        lo, hi = 0, supporters
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at = keys_start + mid * KEY_BYTES
+            if self._map[at:at + KEY_BYTES] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        at = keys_start + lo * KEY_BYTES
+        return lo < supporters and self._map[at:at + KEY_BYTES] == key
+
+    def items(self):
+        """(wish_id, record with supporters) for every wish, in file order."""
+        offset = _HEADER.size
+        end = self._fanout
+        while offset < end:
+            start = offset + _LENGTH.size
+            id_len = _RECORD.unpack_from(self._map, start)[7]
+            id_start = start + _RECORD.size
+            yield str(self._view[id_start:id_start + id_len], 'utf-8'), self._decode(start, True)
+            offset = start + _LENGTH.unpack_from(self._map, offset)[0]
+
+    def close(self):
+        if self._map is not None:
+            self._view.release()
+            self._map.close()
+            self._map = None
+
+
+def json_to_snapshot(json_path=WISHES_FILE, snapshot_path=SNAPSHOT_FILE):
+    """Convert the wishes file to a snapshot; returns the record count."""
+    return write_snapshot(load_wishes(json_path), snapshot_path)
+
+
+def snapshot_to_json(snapshot_path=SNAPSHOT_FILE, json_path=WISHES_FILE):
+    """Convert a snapshot back to the wishes file format; returns the record count."""
+    with WishSnapshot(snapshot_path) as snapshot:
+        wishes_data = {}
+        for wish_id, record in snapshot.items():
+            del record['supporters_count']
+            wishes_data[wish_id] = record
+    if not save_wishes(wishes_data, json_path):
+        raise OSError(f"could not write {json_path}")
+    return len(wishes_data)
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Convert between wishes.json and the binary snapshot.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    to_snapshot = commands.add_parser('to-snapshot', help="wishes.json -> snapshot")
+    to_snapshot.add_argument('json_path', nargs='?', default=WISHES_FILE)
+    to_snapshot.add_argument('snapshot_path', nargs='?', default=SNAPSHOT_FILE)
+    to_json = commands.add_parser('to-json', help="snapshot -> wishes.json")
+    to_json.add_argument('snapshot_path', nargs='?', default=SNAPSHOT_FILE)
+    to_json.add_argument('json_path', nargs='?', default=WISHES_FILE)
+    get = commands.add_parser('get', help="print one wish from a snapshot")
+    get.add_argument('wish_id')
+    get.add_argument('snapshot_path', nargs='?', default=SNAPSHOT_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'to-snapshot':
+        count = json_to_snapshot(args.json_path, args.snapshot_path)
+        print(f"wrote {count} wishes to {args.snapshot_path} ({os.path.getsize(args.snapshot_path):,} bytes)")
+    elif args.command == 'to-json':
+        count = snapshot_to_json(args.snapshot_path, args.json_path)
+        print(f"wrote {count} wishes to {args.json_path} ({os.path.getsize(args.json_path):,} bytes)")
+    else:
+        with WishSnapshot(args.snapshot_path) as snapshot:
+            record = snapshot.get(args.wish_id)
+        if record is None:
+            print(f"{args.wish_id} not found")
+            return 1
+        print(json.dumps(record, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
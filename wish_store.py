@@ -0,0 +1,1010 @@
+"""Storage backends for the shared wish data."""
+import base64
+import contextlib
+import heapq
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from wish_ids import ID_LENGTH, is_time_ordered_id, wish_id_bounds
+from wish_metrics import inc, observe, timed
+from wish_supporters import (
+    BloomFilter,
+    bloom_geometry,
+    bloom_positions,
+    is_supporter_key_hex,
+    key_to_hex,
+    supporter_key,
+    supporter_key_hex,
+)
+from wish_texts import text_hash
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to an in-process lock only
+    fcntl = None
+
+# Default locations (shared across all users of one deployment). Replicas
+# share one store by pointing WISH_DATA_DIR at the same volume.
+DATA_DIR = os.environ.get('WISH_DATA_DIR', '')
+WISHES_FILE = os.path.join(DATA_DIR, "wishes_data.json")
+WISHES_DB = os.path.join(DATA_DIR, "wishes_data.db")
+
+MAX_PROBABILITY = 99.9
+
+# Leaderboard metric -> record field; see WishStore.top_wishes
+LEADERBOARD_METRICS = {'supporters': 'supporters_count', 'probability': 'current_probability'}
+
+# Wishes with at least this many supporters switch to a Bloom filter (0 = never)
+BLOOM_THRESHOLD = int(os.environ.get('WISH_BLOOM_THRESHOLD', '0'))
+BLOOM_CAPACITY = int(os.environ.get('WISH_BLOOM_CAPACITY', '1000000'))
+BLOOM_ERROR_RATE = float(os.environ.get('WISH_BLOOM_ERROR_RATE', '0.001'))
+
+
+# ---------------------------
+# JSON file helpers
+# ---------------------------
+def load_wishes(path=WISHES_FILE):
+    """Load wishes from file."""
+    try:
+        if os.path.exists(path):
+            with timed('wish_store_load_seconds'), open(path, 'r') as f:
+                data = json.load(f)
+                inc('wish_store_read_bytes_total', f.tell())
+                return data if isinstance(data, dict) else {}
+    except Exception as e:
+        inc('wish_store_errors_total', op='load')
+        print(f"load_wishes error: {e}")
+    return {}
+
+
+def save_wishes(wishes_data, path=WISHES_FILE):
+    """Save wishes to file.
+
+    Writes to a temporary file next to the target and renames it into place,
+    so a crash mid-write never leaves a truncated file behind.
+    """
+    tmp_path = None
+    try:
+        with timed('wish_store_save_seconds'):
+            fd, tmp_path = tempfile.mkstemp(prefix='.wishes_', dir=os.path.dirname(os.path.abspath(path)))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(wishes_data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+                inc('wish_store_written_bytes_total', f.tell())
+            os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        inc('wish_store_errors_total', op='save')
+        print(f"save_wishes error: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def locked_file(path):
+    """Exclusive lock around a read-modify-write of path.
+
+    Uses flock on a sidecar ``.lock`` file, which serialises both threads and
+    processes; where flock is unavailable only threads are serialised.
+    """
+    started = time.perf_counter()
+    if fcntl is None:
+        with _thread_locks_guard:
+            lock = _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+        with lock:
+            observe('wish_lock_wait_seconds', time.perf_counter() - started, lock='file')
+            yield
+        return
+    with open(path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        observe('wish_lock_wait_seconds', time.perf_counter() - started, lock='file')
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def new_wish_record(wish_text, initial_probability, now=None):
+    """Build a fresh wish record."""
+    now = time.time() if now is None else now
+    return {
+        'wish_text': wish_text,
+        'initial_probability': float(initial_probability),
+        'current_probability': float(initial_probability),
+        'supporters': [],
+        'total_luck_added': 0.0,
+        'created_at': now,
+        'last_updated': now,
+        'version': 1
+    }
+
+
+def top_records(items, metric, limit):
+    """Best ``limit`` of (wish_id, record) pairs by metric, in top_wishes order."""
+    field = LEADERBOARD_METRICS[metric]
+    return heapq.nsmallest(
+        int(limit), ((w, r) for w, r in items if r is not None), key=lambda item: (-item[1][field], item[0])
+    )
+
+
+# ---------------------------
+# Store interface
+# ---------------------------
+class VersionConflict(Exception):
+    """The wish changed since the version the caller read."""
+
+    def __init__(self, wish_id, expected_version, actual_version):
+        super().__init__(f"wish {wish_id}: expected version {expected_version}, found {actual_version}")
+        self.wish_id = wish_id
+        self.expected_version = expected_version
+        self.actual_version = actual_version
+
+
+class WishStore:
+    """Common interface of the wish storage backends.
+
+    Records returned by ``get`` carry the same fields as the original JSON
+    records, except that supporters are reported as ``supporters_count``.
+    """
+
+    def get(self, wish_id):
+        """Return the wish record or None."""
+        raise NotImplementedError
+
+    def create_or_update(self, wish_id, wish_text, initial_probability):
+        """Create a wish, or refresh the text of an existing one."""
+        raise NotImplementedError
+
+    def create(self, wish_id, wish_text, initial_probability):
+        """Insert a new wish; returns None if wish_id is already taken."""
+        raise NotImplementedError
+
+    def wish_ids_between(self, start_time, end_time, limit=None):
+        """Time-ordered wish IDs created in [start_time, end_time], oldest first."""
+        raise NotImplementedError
+
+    def add_support(self, wish_id, increment, supporter_id, expected_version=None):
+        """Add one supporter's luck; returns (success, probability).
+
+        The update is atomic. If expected_version is given, it is applied only
+        when the wish is still at that version (compare-and-swap), otherwise
+        VersionConflict is raised.
+        """
+        raise NotImplementedError
+
+    def add_support_batch(self, wish_id, supports):
+        """Apply several (supporter_id, increment) pairs; returns how many were accepted."""
+        return sum(1 for supporter_id, increment in supports if self.add_support(wish_id, increment, supporter_id)[0])
+
+    def has_supporter(self, wish_id, supporter_id):
+        """Whether supporter_id already supported the wish."""
+        raise NotImplementedError
+
+    def idle_wish_ids(self, before, limit=None):
+        """IDs of wishes last updated before the given time, least recent first."""
+        raise NotImplementedError
+
+    def export_wishes(self, wish_ids):
+        """Full records of the given wishes, keyed by wish_id.
+
+        Besides the public fields a record carries ``supporters`` (hex
+        supporter keys) and, for wishes that moved to a Bloom filter,
+        ``supporter_bloom``, so restore_wish can rebuild it exactly.
+        """
+        raise NotImplementedError
+
+    def delete_wishes(self, versions):
+        """Delete wishes still at the given {wish_id: version}; returns the deleted IDs."""
+        raise NotImplementedError
+
+    def restore_wish(self, wish_id, record):
+        """Insert an exported record unless wish_id exists; returns True if inserted."""
+        raise NotImplementedError
+
+    def get_sentiment(self, wish_text, scorer):
+        """Remembered (label, score) for this text from scorer, or None."""
+        return None
+
+    def put_sentiment(self, wish_text, scorer, label, score):
+        """Remember a sentiment result; stores without a text table ignore it."""
+        pass
+
+    def top_wishes(self, metric, limit):
+        """Best ``limit`` (wish_id, record) pairs by a LEADERBOARD_METRICS metric.
+
+        Highest value first; ties go to the smaller (older) wish ID.
+        """
+        raise NotImplementedError
+
+    def updated_wishes(self, since):
+        """(wish_id, record) of every wish changed at or after ``since``."""
+        raise NotImplementedError
+
+    def data_version(self):
+        """Cheap token that changes whenever any wish changes.
+
+        None means the store cannot offer one and reads must not be cached.
+        """
+        return None
+
+    def close(self):
+        pass
+
+
+class JsonWishStore(WishStore):
+    """Whole-file JSON store (the original format)."""
+
+    def __init__(self, path=WISHES_FILE):
+        self.path = path
+        # (data version, parsed file, wish_id -> set of its supporters, filled on demand)
+        self._parsed = (None, {}, {})
+
+    def data_version(self):
+        # save_wishes replaces the file, so the inode changes on every write
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _index(self):
+        """Parsed file contents, re-read only when the file changed."""
+        return self._load()[0]
+
+    def _load(self):
+        version = self.data_version()
+        cached_version, wishes_data, supporter_sets = self._parsed
+        if version is None or version != cached_version:
+            wishes_data, supporter_sets = load_wishes(self.path), {}
+            self._parsed = (version, wishes_data, supporter_sets)
+        return wishes_data, supporter_sets
+
+    def get(self, wish_id):
+        wish_data = self._index().get(wish_id)
+        return _public_record(wish_data) if wish_data else None
+
+    def create_or_update(self, wish_id, wish_text, initial_probability):
+        with locked_file(self.path):
+            wishes_data = load_wishes(self.path)
+            now = time.time()
+
+            if wish_id not in wishes_data:
+                wishes_data[wish_id] = new_wish_record(wish_text, initial_probability, now)
+            else:
+                # Update text and timestamp
+                wishes_data[wish_id]['wish_text'] = wish_text
+                wishes_data[wish_id]['last_updated'] = now
+
+            save_wishes(wishes_data, self.path)
+            return _public_record(wishes_data[wish_id])
+
+    def create(self, wish_id, wish_text, initial_probability):
+        with locked_file(self.path):
+            wishes_data = load_wishes(self.path)
+            if wish_id in wishes_data:
+                return None
+            wishes_data[wish_id] = new_wish_record(wish_text, initial_probability)
+            if not save_wishes(wishes_data, self.path):
+                return None
+            return _public_record(wishes_data[wish_id])
+
+    def wish_ids_between(self, start_time, end_time, limit=None):
+        lo, hi = wish_id_bounds(start_time, end_time)
+        ids = sorted(w for w in self._index() if is_time_ordered_id(w) and lo <= w <= hi)
+        return ids[:limit] if limit is not None else ids
+
+    def idle_wish_ids(self, before, limit=None):
+        idle = sorted(
+            (float(w.get('last_updated', 0.0)), wish_id) for wish_id, w in self._index().items()
+            if isinstance(w, dict) and float(w.get('last_updated', 0.0)) < before
+        )
+        return [wish_id for _, wish_id in idle[:limit]] if limit is not None else [wish_id for _, wish_id in idle]
+
+    def top_wishes(self, metric, limit):
+        field = LEADERBOARD_METRICS[metric]
+
+        def rank(item):
+            # Ranks the raw records; only the winners are copied
+            wish_id, w = item
+            value = len(w.get('supporters', [])) if field == 'supporters_count' else float(w.get(field, 0.0))
+            return -value, wish_id
+
+        wishes = (item for item in self._index().items() if isinstance(item[1], dict))
+        return [(wish_id, _public_record(w)) for wish_id, w in heapq.nsmallest(int(limit), wishes, key=rank)]
+
+    def updated_wishes(self, since):
+        return [
+            (wish_id, _public_record(w)) for wish_id, w in self._index().items()
+            if isinstance(w, dict) and float(w.get('last_updated', 0.0)) >= since
+        ]
+
+    def export_wishes(self, wish_ids):
+        wishes_data = self._index()
+        records = {}
+        for wish_id in wish_ids:
+            wish_data = wishes_data.get(wish_id)
+            if not wish_data:
+                continue
+            record = _public_record(wish_data)
+            record['supporters'] = [
+                s if is_supporter_key_hex(s) else supporter_key_hex(s) for s in wish_data.get('supporters', [])
+            ]
+            records[wish_id] = record
+        return records
+
+    def delete_wishes(self, versions):
+        with locked_file(self.path):
+            wishes_data = load_wishes(self.path)
+            deleted = [
+                wish_id for wish_id, version in versions.items()
+                if wish_id in wishes_data and wishes_data[wish_id].get('version', 0) == version
+            ]
+            for wish_id in deleted:
+                del wishes_data[wish_id]
+            if deleted and not save_wishes(wishes_data, self.path):
+                return []
+            return deleted
+
+    def restore_wish(self, wish_id, record):
+        with locked_file(self.path):
+            wishes_data = load_wishes(self.path)
+            if wish_id in wishes_data:
+                return False
+            wish_data = new_wish_record(record['wish_text'], record['initial_probability'], record['created_at'])
+            for field in ('current_probability', 'total_luck_added', 'last_updated', 'version'):
+                wish_data[field] = record[field]
+            # A Bloom filter cannot be expanded back into keys; the JSON store
+            # never creates one, so only exported key lists come back here
+            wish_data['supporters'] = list(record.get('supporters', []))
+            wishes_data[wish_id] = wish_data
+            return save_wishes(wishes_data, self.path)
+
+    def add_support(self, wish_id, increment, supporter_id, expected_version=None):
+        with locked_file(self.path):
+            return self._add_support(wish_id, increment, supporter_id, expected_version)
+
+    def add_support_batch(self, wish_id, supports):
+        with locked_file(self.path):
+            wishes_data = load_wishes(self.path)
+            if wish_id not in wishes_data:
+                return 0
+            seen = set(wishes_data[wish_id].get('supporters', []))
+            accepted = sum(
+                1 for supporter_id, increment in supports
+                if self._apply_support(wishes_data[wish_id], increment, supporter_id, seen)
+            )
+            if accepted and not save_wishes(wishes_data, self.path):
+                return 0
+            return accepted
+
+    def _add_support(self, wish_id, increment, supporter_id, expected_version):
+        wishes_data = load_wishes(self.path)
+
+        if wish_id not in wishes_data:
+            return False, None
+
+        wish_data = wishes_data[wish_id]
+
+        version = wish_data.get('version', 0)
+        if expected_version is not None and version != expected_version:
+            raise VersionConflict(wish_id, expected_version, version)
+
+        if not self._apply_support(wish_data, increment, supporter_id):
+            return False, wish_data.get('current_probability', 0.0)
+
+        if not save_wishes(wishes_data, self.path):
+            return False, None
+        return True, wish_data['current_probability']
+
+    @staticmethod
+    def _apply_support(wish_data, increment, supporter_id, seen=None):
+        """Add one supporter to a loaded record; False if already there.
+
+        seen is the set of the record's supporters, kept up to date here, for
+        callers adding several at once.
+        """
+        supporters = wish_data.setdefault('supporters', [])
+        if seen is None:
+            seen = set(supporters)
+
+        # Check if supporter already supported (legacy files hold raw ids)
+        key = supporter_key_hex(supporter_id)
+        if key in seen or supporter_id in seen:
+            return False
+
+        # Add supporter and update probability
+        supporters.append(key)
+        seen.add(key)
+        new_probability = min(MAX_PROBABILITY, float(wish_data.get('current_probability', 0.0)) + float(increment))
+        wish_data['current_probability'] = float(new_probability)
+        wish_data['total_luck_added'] = float(wish_data.get('total_luck_added', 0.0)) + float(increment)
+        wish_data['last_updated'] = time.time()
+        wish_data['version'] = wish_data.get('version', 0) + 1
+        return True
+
+    def has_supporter(self, wish_id, supporter_id):
+        wishes_data, supporter_sets = self._load()
+        supporters = supporter_sets.get(wish_id)
+        if supporters is None:
+            supporters = supporter_sets[wish_id] = set((wishes_data.get(wish_id) or {}).get('supporters', []))
+        return supporter_key_hex(supporter_id) in supporters or supporter_id in supporters
+
+
+def _public_record(wish_data):
+    """Copy a JSON record into the store's public record shape."""
+    record = {k: v for k, v in wish_data.items() if k != 'supporters'}
+    record['supporters_count'] = len(wish_data.get('supporters', []))
+    return record
+
+
+# ---------------------------
+# SQLite backend
+# ---------------------------
+_WISHES_TABLE = """
+CREATE TABLE IF NOT EXISTS wishes (
+    wish_id TEXT PRIMARY KEY,
+    text_id INTEGER NOT NULL,
+    initial_probability REAL NOT NULL,
+    current_probability REAL NOT NULL,
+    total_luck_added REAL NOT NULL DEFAULT 0,
+    supporters_count INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_updated REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1
+);
+"""
+
+# Each distinct wish text is stored once, looked up through its own unique
+# index, and wishes refer to it by a small integer id; refcount is kept by
+# triggers.
+_WISH_TEXTS_TABLE = """
+CREATE TABLE IF NOT EXISTS wish_texts (
+    text_id INTEGER PRIMARY KEY,
+    wish_text TEXT NOT NULL UNIQUE,
+    refcount INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# Remembered sentiment results, keyed by the normalised text_hash
+_TEXT_SENTIMENT_TABLE = """
+CREATE TABLE IF NOT EXISTS text_sentiment (
+    text_hash BLOB PRIMARY KEY,
+    scorer TEXT NOT NULL,
+    label TEXT NOT NULL,
+    score REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+_SCHEMA = _WISHES_TABLE + _WISH_TEXTS_TABLE + ";" + _TEXT_SENTIMENT_TABLE + """;
+CREATE INDEX IF NOT EXISTS wishes_last_updated ON wishes (last_updated);
+CREATE TRIGGER IF NOT EXISTS wishes_insert_text AFTER INSERT ON wishes
+BEGIN
+    UPDATE wish_texts SET refcount = refcount + 1 WHERE text_id = NEW.text_id;
+END;
+CREATE TRIGGER IF NOT EXISTS wishes_update_text AFTER UPDATE OF text_id ON wishes
+WHEN OLD.text_id != NEW.text_id
+BEGIN
+    UPDATE wish_texts SET refcount = refcount - 1 WHERE text_id = OLD.text_id;
+    UPDATE wish_texts SET refcount = refcount + 1 WHERE text_id = NEW.text_id;
+END;
+CREATE TRIGGER IF NOT EXISTS wishes_delete_text AFTER DELETE ON wishes
+BEGIN
+    UPDATE wish_texts SET refcount = refcount - 1 WHERE text_id = OLD.text_id;
+END;
+CREATE TABLE IF NOT EXISTS supporter_keys (
+    wish_id TEXT NOT NULL,
+    supporter_key INTEGER NOT NULL,
+    PRIMARY KEY (wish_id, supporter_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS supporter_blooms (
+    wish_id TEXT PRIMARY KEY,
+    capacity INTEGER NOT NULL,
+    error_rate REAL NOT NULL,
+    bits BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS store_version (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_version (id, version) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS wishes_insert_version AFTER INSERT ON wishes
+BEGIN
+    UPDATE store_version SET version = version + 1 WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS wishes_update_version AFTER UPDATE ON wishes
+BEGIN
+    UPDATE store_version SET version = version + 1 WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS wishes_delete_version AFTER DELETE ON wishes
+BEGIN
+    UPDATE store_version SET version = version + 1 WHERE id = 0;
+END;
+"""
+
+_WISH_COLUMNS = (
+    'wish_text', 'initial_probability', 'current_probability', 'total_luck_added',
+    'supporters_count', 'created_at', 'last_updated', 'version'
+)
+_WISH_FIELDS = "t.wish_text, " + ', '.join(f"w.{c}" for c in _WISH_COLUMNS[1:])
+_WISH_FROM = " FROM wishes w JOIN wish_texts t ON t.text_id = w.text_id"
+_WISH_SELECT = "SELECT " + _WISH_FIELDS + _WISH_FROM
+
+
+class SqliteWishStore(WishStore):
+    """SQLite (WAL) store with one indexed row per wish.
+
+    Every operation touches only the rows of the wish involved, so its cost
+    does not depend on how many wishes are stored. Supporters are kept as
+    8-byte keys in a side table; a wish reaching ``bloom_threshold``
+    supporters moves to a fixed-size Bloom filter instead.
+    """
+
+    def __init__(self, path=WISHES_DB, json_path=None, bloom_threshold=None):
+        self.path = path
+        self.bloom_threshold = BLOOM_THRESHOLD if bloom_threshold is None else bloom_threshold
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        if json_path:
+            self._migrate_json(json_path)
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _intern_text(self, conn, wish_text):
+        """Make sure wish_text has a wish_texts row; returns its text_id."""
+        row = conn.execute("SELECT text_id FROM wish_texts WHERE wish_text = ?", (wish_text,)).fetchone()
+        if row is not None:
+            return row[0]
+        return conn.execute("INSERT INTO wish_texts (wish_text) VALUES (?)", (wish_text,)).lastrowid
+
+    def _migrate_json(self, json_path):
+        """One-shot import of an existing JSON wish file."""
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+        wishes_data = load_wishes(json_path) if os.path.exists(json_path) else {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have finished the import while we waited
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                conn.execute("ROLLBACK")
+                return
+            for wish_id, wish_data in wishes_data.items():
+                if not isinstance(wish_data, dict):
+                    continue
+                supporters = list(dict.fromkeys(wish_data.get('supporters', [])))
+                prob = float(wish_data.get('initial_probability', wish_data.get('current_probability', 0.0)))
+                created = float(wish_data.get('created_at', time.time()))
+                conn.execute(
+                    "INSERT OR IGNORE INTO wishes (wish_id, text_id, initial_probability, current_probability,"
+                    " total_luck_added, supporters_count, created_at, last_updated, version)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (wish_id, self._intern_text(conn, wish_data.get('wish_text', '')), prob,
+                     float(wish_data.get('current_probability', prob)),
+                     float(wish_data.get('total_luck_added', 0.0)), len(supporters), created,
+                     float(wish_data.get('last_updated', created)), int(wish_data.get('version', 1)))
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO supporter_keys (wish_id, supporter_key) VALUES (?, ?)",
+                    ((wish_id, _json_supporter_key(s)) for s in supporters)
+                )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(len(wishes_data)),))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"json migration error: {e}")
+
+    @contextlib.contextmanager
+    def _immediate(self):
+        """Write transaction on this thread's connection."""
+        conn = self._conn()
+        _begin_immediate(conn)
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def get(self, wish_id):
+        row = self._conn().execute(f"{_WISH_SELECT} WHERE w.wish_id = ?", (wish_id,)).fetchone()
+        return dict(zip(_WISH_COLUMNS, row)) if row else None
+
+    def create_or_update(self, wish_id, wish_text, initial_probability):
+        now = time.time()
+        prob = float(initial_probability)
+        with self._immediate() as conn:
+            conn.execute(
+                "INSERT INTO wishes (wish_id, text_id, initial_probability, current_probability,"
+                " created_at, last_updated) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(wish_id) DO UPDATE SET text_id = excluded.text_id,"
+                " last_updated = excluded.last_updated",
+                (wish_id, self._intern_text(conn, wish_text), prob, prob, now, now)
+            )
+        return self.get(wish_id)
+
+    def create(self, wish_id, wish_text, initial_probability):
+        now = time.time()
+        prob = float(initial_probability)
+        with self._immediate() as conn:
+            # On a taken id the interned text is left at refcount 0 for prune_texts
+            inserted = conn.execute(
+                "INSERT INTO wishes (wish_id, text_id, initial_probability, current_probability,"
+                " created_at, last_updated) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(wish_id) DO NOTHING",
+                (wish_id, self._intern_text(conn, wish_text), prob, prob, now, now)
+            ).rowcount
+        return self.get(wish_id) if inserted else None
+
+    def get_sentiment(self, wish_text, scorer):
+        row = self._conn().execute(
+            "SELECT label, score FROM text_sentiment WHERE text_hash = ? AND scorer = ?",
+            (text_hash(wish_text), scorer)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put_sentiment(self, wish_text, scorer, label, score):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO text_sentiment (text_hash, scorer, label, score) VALUES (?, ?, ?, ?)",
+            (text_hash(wish_text), scorer, label, float(score))
+        )
+
+    def prune_texts(self):
+        """Drop texts no wish refers to (and their remembered sentiment); returns how many."""
+        with self._immediate() as conn:
+            conn.create_function('wish_text_hash', 1, text_hash, deterministic=True)
+            pruned = conn.execute("DELETE FROM wish_texts WHERE refcount <= 0").rowcount
+            conn.execute(
+                "DELETE FROM text_sentiment WHERE text_hash NOT IN (SELECT wish_text_hash(wish_text) FROM wish_texts)"
+            )
+            return pruned
+
+    def text_stats(self):
+        """Wish count, distinct texts and text bytes stored vs. referenced."""
+        row = self._conn().execute(
+            "SELECT COUNT(*), SUM(refcount), COALESCE(SUM(length(CAST(wish_text AS BLOB))), 0),"
+            " COALESCE(SUM(refcount * length(CAST(wish_text AS BLOB))), 0) FROM wish_texts WHERE refcount > 0"
+        ).fetchone()
+        return {
+            'wishes': row[1] or 0,
+            'distinct_texts': row[0],
+            'text_bytes_stored': row[2],
+            'text_bytes_referenced': row[3],
+        }
+
+    def wish_ids_between(self, start_time, end_time, limit=None):
+        # Time-ordered IDs make this a primary-key range scan
+        lo, hi = wish_id_bounds(start_time, end_time)
+        rows = self._conn().execute(
+            f"SELECT wish_id FROM wishes WHERE wish_id BETWEEN ? AND ? AND length(wish_id) = {ID_LENGTH}"
+            " ORDER BY wish_id LIMIT ?",
+            (lo, hi, -1 if limit is None else int(limit))
+        )
+        return [r[0] for r in rows]
+
+    def add_support(self, wish_id, increment, supporter_id, expected_version=None):
+        increment = float(increment)
+        conn = self._conn()
+        _begin_immediate(conn)
+        try:
+            row = conn.execute(
+                "SELECT current_probability, version, supporters_count FROM wishes WHERE wish_id = ?", (wish_id,)
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return False, None
+            if expected_version is not None and row[1] != expected_version:
+                conn.execute("ROLLBACK")
+                raise VersionConflict(wish_id, expected_version, row[1])
+            if not self._add_supporter_key(conn, wish_id, supporter_key(supporter_id), row[2]):
+                conn.execute("ROLLBACK")
+                return False, row[0]
+            new_probability = min(MAX_PROBABILITY, float(row[0]) + increment)
+            conn.execute(
+                "UPDATE wishes SET current_probability = ?, total_luck_added = total_luck_added + ?,"
+                " supporters_count = supporters_count + 1, last_updated = ?, version = version + 1"
+                " WHERE wish_id = ?",
+                (new_probability, increment, time.time(), wish_id)
+            )
+            conn.execute("COMMIT")
+            return True, new_probability
+        except VersionConflict:
+            raise
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def top_wishes(self, metric, limit):
+        # One scan with a bounded sorter; an index per metric would slow down every support.
+        # Only the winners are joined to their text.
+        column = LEADERBOARD_METRICS[metric]
+        rows = self._conn().execute(
+            f"SELECT {_WISH_FIELDS}, w.wish_id FROM"
+            f" (SELECT * FROM wishes ORDER BY {column} DESC, wish_id LIMIT ?) w"
+            " JOIN wish_texts t ON t.text_id = w.text_id"
+            f" ORDER BY w.{column} DESC, w.wish_id",
+            (int(limit),)
+        )
+        return [(row[-1], dict(zip(_WISH_COLUMNS, row))) for row in rows]
+
+    def updated_wishes(self, since):
+        rows = self._conn().execute(
+            f"SELECT {_WISH_FIELDS}, w.wish_id{_WISH_FROM} WHERE w.last_updated >= ?", (float(since),)
+        )
+        return [(row[-1], dict(zip(_WISH_COLUMNS, row))) for row in rows]
+
+    def data_version(self):
+        return self._conn().execute("SELECT version FROM store_version WHERE id = 0").fetchone()[0]
+
+    def add_support_batch(self, wish_id, supports):
+        conn = self._conn()
+        _begin_immediate(conn)
+        try:
+            row = conn.execute(
+                "SELECT current_probability, supporters_count FROM wishes WHERE wish_id = ?", (wish_id,)
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return 0
+            probability, count = float(row[0]), row[1]
+            accepted, total = 0, 0.0
+            for supporter_id, increment in supports:
+                if self._add_supporter_key(conn, wish_id, supporter_key(supporter_id), count + accepted):
+                    probability = min(MAX_PROBABILITY, probability + float(increment))
+                    total += float(increment)
+                    accepted += 1
+            if accepted:
+                conn.execute(
+                    "UPDATE wishes SET current_probability = ?, total_luck_added = total_luck_added + ?,"
+                    " supporters_count = supporters_count + ?, last_updated = ?, version = version + ?"
+                    " WHERE wish_id = ?",
+                    (probability, total, accepted, time.time(), accepted, wish_id)
+                )
+            conn.execute("COMMIT")
+            return accepted
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def _add_supporter_key(self, conn, wish_id, key, supporters_count):
+        """Record key for the wish inside the caller's transaction.
+
+        Returns False when the key is (or, for Bloom filters, may be) present.
+        """
+        bloom = conn.execute(
+            "SELECT rowid, capacity, error_rate FROM supporter_blooms WHERE wish_id = ?", (wish_id,)
+        ).fetchone()
+        if bloom is not None:
+            return _bloom_check_and_set(conn, bloom, key)
+
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO supporter_keys (wish_id, supporter_key) VALUES (?, ?)", (wish_id, key)
+        )
+        if cur.rowcount == 0:
+            return False
+        if self.bloom_threshold and supporters_count + 1 >= self.bloom_threshold:
+            # Fold the exact key set into a Bloom filter for this wish
+            bloom_filter = BloomFilter(BLOOM_CAPACITY, BLOOM_ERROR_RATE)
+            for (k,) in conn.execute("SELECT supporter_key FROM supporter_keys WHERE wish_id = ?", (wish_id,)):
+                bloom_filter.add(k)
+            conn.execute(
+                "INSERT INTO supporter_blooms (wish_id, capacity, error_rate, bits) VALUES (?, ?, ?, ?)",
+                (wish_id, bloom_filter.capacity, bloom_filter.error_rate, bytes(bloom_filter.bits))
+            )
+            conn.execute("DELETE FROM supporter_keys WHERE wish_id = ?", (wish_id,))
+        return True
+
+    def idle_wish_ids(self, before, limit=None):
+        rows = self._conn().execute(
+            "SELECT wish_id FROM wishes WHERE last_updated < ? ORDER BY last_updated LIMIT ?",
+            (float(before), -1 if limit is None else int(limit))
+        )
+        return [r[0] for r in rows]
+
+    def export_wishes(self, wish_ids):
+        conn = self._conn()
+        records = {}
+        for wish_id in wish_ids:
+            row = conn.execute(f"{_WISH_SELECT} WHERE w.wish_id = ?", (wish_id,)).fetchone()
+            if row is None:
+                continue
+            record = dict(zip(_WISH_COLUMNS, row))
+            record['supporters'] = [
+                key_to_hex(k) for (k,) in
+                conn.execute("SELECT supporter_key FROM supporter_keys WHERE wish_id = ?", (wish_id,))
+            ]
+            bloom = conn.execute(
+                "SELECT capacity, error_rate, bits FROM supporter_blooms WHERE wish_id = ?", (wish_id,)
+            ).fetchone()
+            if bloom is not None:
+                record['supporter_bloom'] = {
+                    'capacity': bloom[0], 'error_rate': bloom[1], 'bits': base64.b64encode(bloom[2]).decode()
+                }
+            records[wish_id] = record
+        return records
+
+    def delete_wishes(self, versions):
+        deleted = []
+        with self._immediate() as conn:
+            for wish_id, version in versions.items():
+                if conn.execute("DELETE FROM wishes WHERE wish_id = ? AND version = ?", (wish_id, version)).rowcount:
+                    conn.execute("DELETE FROM supporter_keys WHERE wish_id = ?", (wish_id,))
+                    conn.execute("DELETE FROM supporter_blooms WHERE wish_id = ?", (wish_id,))
+                    deleted.append(wish_id)
+        return deleted
+
+    def restore_wish(self, wish_id, record):
+        with self._immediate() as conn:
+            if conn.execute("SELECT 1 FROM wishes WHERE wish_id = ?", (wish_id,)).fetchone():
+                return False
+            conn.execute(
+                "INSERT INTO wishes (wish_id, text_id, initial_probability, current_probability,"
+                " total_luck_added, supporters_count, created_at, last_updated, version)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (wish_id, self._intern_text(conn, record['wish_text']), record['initial_probability'],
+                 record['current_probability'], record['total_luck_added'], record['supporters_count'],
+                 record['created_at'], record['last_updated'], record['version'])
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO supporter_keys (wish_id, supporter_key) VALUES (?, ?)",
+                ((wish_id, _json_supporter_key(k)) for k in record.get('supporters', []))
+            )
+            bloom = record.get('supporter_bloom')
+            if bloom is not None:
+                conn.execute(
+                    "INSERT INTO supporter_blooms (wish_id, capacity, error_rate, bits) VALUES (?, ?, ?, ?)",
+                    (wish_id, bloom['capacity'], bloom['error_rate'], base64.b64decode(bloom['bits']))
+                )
+        return True
+
+    def has_supporter(self, wish_id, supporter_id):
+        conn = self._conn()
+        key = supporter_key(supporter_id)
+        bloom = conn.execute(
+            "SELECT rowid, capacity, error_rate FROM supporter_blooms WHERE wish_id = ?", (wish_id,)
+        ).fetchone()
+        if bloom is not None:
+            return not _bloom_check_and_set(conn, bloom, key, add=False)
+        return conn.execute(
+            "SELECT 1 FROM supporter_keys WHERE wish_id = ? AND supporter_key = ?", (wish_id, key)
+        ).fetchone() is not None
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _begin_immediate(conn):
+    """Start a write transaction, recording how long the write lock took."""
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    observe('wish_lock_wait_seconds', time.perf_counter() - started, lock='sqlite')
+
+
+def _json_supporter_key(value):
+    """Supporter key for an entry of a JSON supporters list."""
+    if is_supporter_key_hex(value):
+        return int.from_bytes(bytes.fromhex(value), 'big', signed=True)
+    return supporter_key(value)
+
+
+def _bloom_check_and_set(conn, bloom, key, add=True):
+    """Test (and set) key in a stored Bloom filter, touching only its bytes.
+
+    Returns True when the key was absent. Reads and writes go through
+    incremental blob I/O where available, so a large filter is never loaded
+    whole.
+    """
+    rowid, capacity, error_rate = bloom
+    nbytes, num_hashes = bloom_geometry(capacity, error_rate)
+    masks = {}
+    for p in bloom_positions(key, nbytes * 8, num_hashes):
+        masks[p >> 3] = masks.get(p >> 3, 0) | (1 << (p & 7))
+
+    if hasattr(conn, 'blobopen'):
+        with conn.blobopen('supporter_blooms', 'bits', rowid, readonly=not add) as blob:
+            current = {}
+            for offset in masks:
+                blob.seek(offset)
+                current[offset] = blob.read(1)[0]
+            if all(current[o] & m == m for o, m in masks.items()):
+                return False
+            if add:
+                for offset, mask in masks.items():
+                    blob.seek(offset)
+                    blob.write(bytes([current[offset] | mask]))
+            return True
+
+    bits = bytearray(conn.execute("SELECT bits FROM supporter_blooms WHERE rowid = ?", (rowid,)).fetchone()[0])
+    if all(bits[o] & m == m for o, m in masks.items()):
+        return False
+    if add:
+        for offset, mask in masks.items():
+            bits[offset] |= mask
+        conn.execute("UPDATE supporter_blooms SET bits = ? WHERE rowid = ?", (bytes(bits), rowid))
+    return True
+
+
+# ---------------------------
+# Backend selection
+# ---------------------------
+_store = None
+_store_lock = threading.Lock()
+
+
+def open_store(backend=None, path=None, write_behind=None, archive_ttl_days=None):
+    """Open a store; backend is 'sqlite' (default), 'json' or 'events'.
+
+    With write_behind (or WISH_WRITE_BEHIND=1) supports are buffered in
+    memory and flushed in batches, see wish_writebehind. With
+    archive_ttl_days (or WISH_TTL_DAYS) wishes idle that long move to the
+    cold archive and are still served from there, see wish_archive. With
+    WISH_PUBSUB set, every write is announced to the other replicas, see
+    wish_pubsub.
+    """
+    backend = (backend or os.environ.get('WISH_STORE_BACKEND', 'sqlite')).lower()
+    path = path or os.environ.get('WISH_STORE_PATH')
+    if write_behind is None:
+        write_behind = os.environ.get('WISH_WRITE_BEHIND', '') not in ('', '0')
+    if backend == 'json':
+        store = JsonWishStore(path or WISHES_FILE)
+    elif backend == 'sqlite':
+        path = path or WISHES_DB
+        # Only the default database imports the legacy JSON file
+        store = SqliteWishStore(path, json_path=WISHES_FILE if path == WISHES_DB else None)
+    elif backend == 'events':
+        from wish_events import EVENTS_DIR, EventLogWishStore
+        store = EventLogWishStore(path or EVENTS_DIR)
+    else:
+        raise ValueError(f"unknown wish store backend: {backend}")
+    if archive_ttl_days is None:
+        archive_ttl_days = float(os.environ.get('WISH_TTL_DAYS', '0') or 0)
+    if archive_ttl_days > 0:
+        from wish_archive import ArchivingStore
+        store = ArchivingStore(store, ttl_days=archive_ttl_days)
+    if os.environ.get('WISH_PUBSUB'):
+        # Below the write-behind buffer, so replicas hear about supports once they are stored
+        from wish_pubsub import NotifyingStore, get_notifier
+        store = NotifyingStore(store, get_notifier())
+    if write_behind:
+        from wish_writebehind import WriteBehindStore
+        store = WriteBehindStore(store)
+    return store
+
+
+def get_store():
+    """Process-wide store shared by all sessions."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = open_store()
+    return _store
@@ -0,0 +1,78 @@
+"""Compact supporter membership: hashed supporter keys and Bloom filters."""
+import hashlib
+import math
+
+# Supporter ids are never stored verbatim, only an 8-byte digest of them.
+KEY_BYTES = 8
+
+
+def supporter_key(supporter_id):
+    """Signed 64-bit key for a supporter id (fits an SQLite INTEGER)."""
+    digest = hashlib.blake2b(str(supporter_id).encode(), digest_size=KEY_BYTES).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def supporter_key_hex(supporter_id):
+    """Hex form of supporter_key, used by the JSON store."""
+    return hashlib.blake2b(str(supporter_id).encode(), digest_size=KEY_BYTES).hexdigest()
+
+
+def key_to_hex(key):
+    """Hex form of a signed 64-bit supporter key (inverse of the SQLite encoding)."""
+    return int(key).to_bytes(KEY_BYTES, 'big', signed=True).hex()
+
+
+def is_supporter_key_hex(value):
+    if len(value) != KEY_BYTES * 2:
+        return False
+    try:
+        int(value, 16)
+    except ValueError:
+        return False
+    return True
+
+
+def bloom_geometry(capacity, error_rate):
+    """(num_bytes, num_hashes) of an optimal Bloom filter."""
+    nbits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+    nbytes = max(1, (nbits + 7) // 8)
+    num_hashes = max(1, int(round(nbytes * 8 / capacity * math.log(2))))
+    return nbytes, num_hashes
+
+
+def bloom_positions(key, num_bits, num_hashes):
+    """Bit positions of a supporter key (double hashing)."""
+    digest = hashlib.blake2b(int(key).to_bytes(KEY_BYTES, 'big', signed=True), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'big')
+    h2 = int.from_bytes(digest[8:], 'big') | 1
+    return [(h1 + i * h2) % num_bits for i in range(num_hashes)]
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over supporter keys.
+
+    Membership answers may be false positives (a new supporter is taken for
+    a repeat one) with probability ``error_rate`` at ``capacity`` items, but
+    never false negatives, so nobody can support twice.
+    """
+
+    def __init__(self, capacity, error_rate=0.001, bits=None):
+        self.capacity = int(capacity)
+        self.error_rate = float(error_rate)
+        nbytes, self.num_hashes = bloom_geometry(self.capacity, self.error_rate)
+        self.num_bits = nbytes * 8
+        if bits is None:
+            bits = bytearray(nbytes)
+        elif len(bits) != nbytes:
+            raise ValueError(f"bloom filter expects {nbytes} bytes, got {len(bits)}")
+        self.bits = bytearray(bits)
+
+    def positions(self, key):
+        return bloom_positions(key, self.num_bits, self.num_hashes)
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self.positions(key))
+
+    def add(self, key):
+        for p in self.positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
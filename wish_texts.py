@@ -0,0 +1,19 @@
+"""Content hashing of wish texts.
+
+Many users submit the same wish ("I wish for health and happiness"). The
+SQLite store keeps one copy of each distinct text, exactly as typed.
+Sentiment does not depend on case or spacing, so sentiment results are
+remembered under the hash of the normalised form.
+"""
+import hashlib
+
+
+def normalize_wish(wish_text):
+    """Lower-cased with whitespace collapsed."""
+    return ' '.join(wish_text.lower().split())
+
+
+def text_hash(wish_text):
+    """16-byte content hash of the normalised wish text."""
+    return hashlib.blake2b(normalize_wish(wish_text).encode(), digest_size=16).digest()
+
@@ -0,0 +1,81 @@
+"""The page theme, as cached static assets instead of inline CSS.
+
+The stylesheets in static/ are served by Streamlit when
+``server.enableStaticServing`` is on (see .streamlit/config.toml) at
+``app/static/...``:
+
+  theme.css        every page
+  wish_input.css   the wish input page (snowy textarea, snow.svg)
+
+Each render emits one ``<link>`` per stylesheet, versioned with a hash of
+the theme files, so browsers keep the CSS until it changes instead of
+receiving it with every rerun. Streamlit serves them with validators only;
+for a year-long ``immutable`` lifetime point WISH_STATIC_URL at wish_api's
+``/static`` (or a CDN in front of it).
+
+With WISH_INLINE_THEME=1, when static serving is off, or on Streamlit
+before 1.56 (which serves .css and .svg as text/plain with nosniff, so
+browsers would ignore them), the stylesheets are inlined as before, with
+the SVG turned back into a data URI.
+"""
+import functools
+import hashlib
+import os
+import urllib.parse
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+STATIC_URL = os.environ.get('WISH_STATIC_URL', 'app/static').rstrip('/')
+THEME_CSS = 'theme.css'
+WISH_INPUT_CSS = 'wish_input.css'
+THEME_FILES = (THEME_CSS, WISH_INPUT_CSS, 'snow.svg')
+INLINE_THEME = os.environ.get('WISH_INLINE_THEME', '') not in ('', '0')
+# First Streamlit whose static serving sends text/css and image/svg+xml
+STATIC_TYPES_SINCE = (1, 56)
+
+
+@functools.lru_cache(maxsize=None)
+def read_asset(name):
+    """Contents of one of THEME_FILES."""
+    with open(os.path.join(STATIC_DIR, name), 'rb') as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def theme_version():
+    """Short hash of the theme files; changes whenever any of them does."""
+    digest = hashlib.blake2b(digest_size=6)
+    for name in THEME_FILES:
+        digest.update(name.encode())
+        digest.update(read_asset(name))
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def inline_stylesheet(name):
+    """A stylesheet as a <style> block, for when static files are not served."""
+    css = read_asset(name).decode('utf-8')
+    for image in THEME_FILES:
+        if image.endswith('.svg') and f'url("{image}")' in css:
+            data = urllib.parse.quote(read_asset(image).decode('utf-8').strip(), safe=" '=/:;,.-")
+            css = css.replace(f'url("{image}")', f'url("data:image/svg+xml,{data}")')
+    return f"<style>\n{css}</style>"
+
+
+def serves_stylesheets(streamlit_version):
+    """Whether this Streamlit version serves static/ with usable content types."""
+    try:
+        release = tuple(int(part) for part in streamlit_version.split('.')[:2])
+    except ValueError:
+        return False
+    return release >= STATIC_TYPES_SINCE
+
+
+def stylesheet_link(name):
+    return f'<link rel="stylesheet" href="{STATIC_URL}/{name}?v={theme_version()}">'
+
+
+def theme_markup(static_serving, name=THEME_CSS):
+    """HTML that applies a stylesheet: a versioned <link> if static files are served, else inline CSS."""
+    if static_serving and not INLINE_THEME:
+        return stylesheet_link(name)
+    return inline_stylesheet(name)
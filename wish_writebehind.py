@@ -0,0 +1,196 @@
+"""Write-behind buffering of support clicks.
+
+WriteBehindStore wraps another store. Supports are accepted into an
+in-memory buffer that merges them per wish and flushes each wish's pending
+supports to the wrapped store as one batch. A flush happens every
+``flush_interval_ms``, as soon as ``max_pending`` supports are waiting, and
+at interpreter exit, so at most ``flush_interval_ms`` of clicks are lost if
+the process dies. Reads overlay the pending supports, so they are visible
+immediately; only a read of the very wish being flushed waits for it.
+
+If flushes keep failing the buffer stops growing at ``max_buffered``
+supports: further supports are written straight through to the wrapped
+store, so its errors reach the caller instead of piling up in memory.
+"""
+import atexit
+import os
+import threading
+from collections import OrderedDict
+
+from wish_store import MAX_PROBABILITY, VersionConflict, WishStore, top_records
+from wish_supporters import supporter_key_hex
+
+FLUSH_INTERVAL_MS = float(os.environ.get('WISH_FLUSH_MS', '200'))
+MAX_PENDING = int(os.environ.get('WISH_FLUSH_EVENTS', '500'))
+MAX_BUFFERED = int(os.environ.get('WISH_FLUSH_MAX_BUFFERED', '50000'))
+_STRIPES = 64
+
+
+class WriteBehindStore(WishStore):
+    """Buffers add_support calls in memory and flushes them in batches."""
+
+    def __init__(self, store, flush_interval_ms=FLUSH_INTERVAL_MS, max_pending=MAX_PENDING,
+                 max_buffered=MAX_BUFFERED):
+        self.store = store
+        self.flush_interval = max(0.001, float(flush_interval_ms) / 1000.0)
+        self.max_pending = max(1, int(max_pending))
+        self.max_buffered = max(self.max_pending, int(max_buffered))
+        # wish_id -> OrderedDict(supporter_key -> (supporter_id, increment))
+        self._pending = {}
+        self._pending_count = 0
+        self._local_version = 0
+        # The wish a flush is writing, and per stripe of wish ids a count of
+        # flushes started or finished; reads retry if theirs moved under them
+        self._flushing = None
+        self._flush_seqs = [0] * _STRIPES
+        self._lock = threading.Lock()
+        self._flush_done = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        threading.Thread(target=self._flush_loop, name="wish-write-behind", daemon=True).start()
+        atexit.register(self.flush)
+
+    def get(self, wish_id):
+        # Reads overlay what is still buffered
+        stripe = hash(wish_id) % _STRIPES
+        while True:
+            with self._lock:
+                # Only while this wish is written can the store and the buffer both hold its supports
+                while self._flushing == wish_id:
+                    self._flush_done.wait()
+                seq = self._flush_seqs[stripe]
+            record = self.store.get(wish_id)
+            with self._lock:
+                if seq != self._flush_seqs[stripe]:
+                    continue
+                pending = self._pending.get(wish_id)
+                if not pending or record is None:
+                    return record
+                record = dict(record)
+                for _, increment in pending.values():
+                    record['current_probability'] = min(MAX_PROBABILITY, float(record['current_probability']) + increment)
+                    record['total_luck_added'] = float(record['total_luck_added']) + increment
+                record['supporters_count'] = int(record['supporters_count']) + len(pending)
+                record['version'] = int(record['version']) + len(pending)
+                return record
+
+    def create_or_update(self, wish_id, wish_text, initial_probability):
+        self.store.create_or_update(wish_id, wish_text, initial_probability)
+        return self.get(wish_id)
+
+    def create(self, wish_id, wish_text, initial_probability):
+        return self.store.create(wish_id, wish_text, initial_probability)
+
+    def wish_ids_between(self, start_time, end_time, limit=None):
+        return self.store.wish_ids_between(start_time, end_time, limit)
+
+    def top_wishes(self, metric, limit):
+        # Buffered supports can lift other wishes into the top; rank them all with the overlay applied
+        with self._lock:
+            candidates = set(self._pending)
+        candidates.update(wish_id for wish_id, _ in self.store.top_wishes(metric, limit))
+        return top_records(((wish_id, self.get(wish_id)) for wish_id in candidates), metric, limit)
+
+    def updated_wishes(self, since):
+        # Buffered supports have not reached the store yet, but they are changes all the same
+        with self._lock:
+            candidates = set(self._pending)
+        candidates.update(wish_id for wish_id, _ in self.store.updated_wishes(since))
+        return [(wish_id, record) for wish_id, record in ((w, self.get(w)) for w in candidates) if record is not None]
+
+    def get_sentiment(self, wish_text, scorer):
+        return self.store.get_sentiment(wish_text, scorer)
+
+    def put_sentiment(self, wish_text, scorer, label, score):
+        self.store.put_sentiment(wish_text, scorer, label, score)
+
+    def add_support(self, wish_id, increment, supporter_id, expected_version=None):
+        record = self.get(wish_id)
+        if record is None:
+            return False, None
+        if expected_version is not None and record['version'] != expected_version:
+            raise VersionConflict(wish_id, expected_version, record['version'])
+        key = supporter_key_hex(supporter_id)
+        with self._lock:
+            pending = self._pending.get(wish_id)
+            if pending is not None and key in pending:
+                return False, record['current_probability']
+        if self.store.has_supporter(wish_id, supporter_id):
+            return False, record['current_probability']
+
+        with self._lock:
+            full = self._pending_count >= self.max_buffered
+            if not full:
+                pending = self._pending.setdefault(wish_id, OrderedDict())
+                if key in pending:
+                    return False, record['current_probability']
+                pending[key] = (supporter_id, float(increment))
+                self._pending_count += 1
+                self._local_version += 1
+            if self._pending_count >= self.max_pending:
+                self._wake.set()
+        if full:
+            # Flushes are failing or falling behind: write through rather than buffer more
+            success, _ = self.store.add_support(wish_id, increment, supporter_id)
+            if not success:
+                return False, record['current_probability']
+            with self._lock:
+                self._local_version += 1
+        return True, self.get(wish_id)['current_probability']
+
+    def has_supporter(self, wish_id, supporter_id):
+        with self._lock:
+            pending = self._pending.get(wish_id)
+            if pending is not None and supporter_key_hex(supporter_id) in pending:
+                return True
+        return self.store.has_supporter(wish_id, supporter_id)
+
+    def data_version(self):
+        version = self.store.data_version()
+        if version is None:
+            return None
+        with self._lock:
+            return (version, self._local_version)
+
+    def flush(self):
+        """Write all buffered supports to the wrapped store; returns how many were accepted."""
+        with self._flush_lock:
+            with self._lock:
+                batches = list(self._pending.items())
+            accepted = 0
+            for wish_id, pending in batches:
+                stripe = hash(wish_id) % _STRIPES
+                with self._lock:
+                    supports = list(pending.items())
+                    self._flushing = wish_id
+                    self._flush_seqs[stripe] += 1
+                try:
+                    accepted += self.store.add_support_batch(wish_id, [value for _, value in supports])
+                except Exception as e:
+                    # Keep them buffered and retry on the next flush
+                    print(f"write-behind flush error: {e}")
+                    supports = []
+                with self._lock:
+                    for key, _ in supports:
+                        pending.pop(key, None)
+                    self._pending_count -= len(supports)
+                    self._local_version += 1
+                    if not pending and self._pending.get(wish_id) is pending:
+                        del self._pending[wish_id]
+                    self._flushing = None
+                    self._flush_seqs[stripe] += 1
+                    self._flush_done.notify_all()
+            return accepted
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        self.store.close()